@@ -1,50 +1,57 @@
 # app.py
 import os
 import secrets
+import json
+import datetime
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
 from dotenv import load_dotenv
-import smtplib
-from email.message import EmailMessage
 
 from utils.data_utils import (
-    read_users, write_user, verify_user_credentials, get_user_role,
-    is_user_activated, set_user_activation, get_activation_code,
-    log_expense, expenses_df, totals_by_category, total_spent_month,
-    write_feedback, read_feedback
+    read_users, get_user, user_exists, has_users, write_user,
+    set_user_activation, get_activation_code,
+    log_expense, query_expenses, recent_expenses,
+    totals_by_category, total_spent_month, monthly_totals, spending_insights,
+    write_feedback, feedback_summary, queue_email, email_status
 )
+from utils import data_utils
+from utils.auth import authenticate, issue_session_token, verify_session_token
+from utils.compaction import start_compactor
+from utils.mailer import SmtpSettings, start_sender
 from utils.tips import get_ai_tip, generate_tip
-from utils.config import CATEGORIES
+from utils.config import CATEGORIES, CHART_RENDERER, MAX_EXPENSE_AMOUNT
+from utils.perf import timer
 
 load_dotenv()
 
-# SMTP config (optional)
-SMTP_HOST = os.getenv("SMTP_HOST", "")
-SMTP_PORT = int(os.getenv("SMTP_PORT", "587") or 587)
-SMTP_USER = os.getenv("SMTP_USER", "")
-SMTP_PASS = os.getenv("SMTP_PASS", "")
-FROM_EMAIL = os.getenv("FROM_EMAIL", SMTP_USER)
+# SMTP config (optional): SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASS, FROM_EMAIL
+SMTP = SmtpSettings.from_env()
+# Activation emails go through the outbox; this process's sender drains it.
+start_sender(data_utils.mail_outbox(), SMTP)
+# Snapshots the busiest CSV ledgers so cold reads parse only their new tail.
+start_compactor()
 
 st.set_page_config(page_title="Spendwise", page_icon="💸", layout="centered")
 
 # ---- UI helpers ----
+def export_button(label: str, stem: str, build, key: str):
+    """Format picker plus a download button; `build(fmt)` streams the export and runs only on click."""
+    from utils import exports
+    c1, c2 = st.columns([1, 3])
+    fmt = c1.selectbox("Format", exports.formats(), key=f"{key}_fmt", label_visibility="collapsed")
+    c2.download_button(f"⬇ {label}", data=lambda: exports.to_file(build(fmt)), file_name=exports.file_name(stem, fmt),
+                       mime=exports.mime(fmt), on_click="ignore", key=key)
+
 def send_activation_email(to_email: str, username: str, activation_code: str):
-    if not (SMTP_HOST and SMTP_USER and SMTP_PASS):
+    """Queue the activation email; the background sender delivers it and retries on failure."""
+    if not SMTP.configured:
         return False, "SMTP not configured"
-    try:
-        msg = EmailMessage()
-        msg['Subject'] = 'Spendwise - Activate your account'
-        msg['From'] = FROM_EMAIL
-        msg['To'] = to_email
-        msg.set_content(f"Hi {username},\n\nYour Spendwise activation code is: {activation_code}\n\nEnter this code in the app to activate your account.")
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=10) as server:
-            server.starttls()
-            server.login(SMTP_USER, SMTP_PASS)
-            server.send_message(msg)
-        return True, "Email sent"
-    except Exception as e:
-        return False, str(e)
+    queue_email(
+        to_email,
+        'Spendwise - Activate your account',
+        f"Hi {username},\n\nYour Spendwise activation code is: {activation_code}\n\nEnter this code in the app to activate your account.",
+        tag=f"activation:{username}",
+    )
+    return True, "Email queued"
 
 def generate_activation_code():
     return secrets.token_hex(3)
@@ -60,14 +67,16 @@ def strong_password_ok(password: str):
         return False, "Include a number."
     return True, ""
 
-def login_and_reload(username: str):
+def login_and_reload(username: str, role: str):
     st.session_state['user'] = username
-    st.session_state['role'] = get_user_role(username)
+    st.session_state['role'] = role
+    st.session_state['token'] = issue_session_token(username, role)
     st.rerun()
 
 def logout_and_reload():
     st.session_state.pop('user', None)
     st.session_state.pop('role', None)
+    st.session_state.pop('token', None)
     st.rerun()
 
 def login_page():
@@ -78,32 +87,21 @@ def login_page():
     password = st.text_input("Password", type="password", key="login_pass")
 
     if st.button("Login", key="login_btn"):
-        users = read_users()
-
-        if username == "demo" and password == "demo123":
-            if username in users:
-                login_and_reload(username)
-            else:
-                st.error("Demo account missing. Run demo_fixtures.py.")
-            return
-
-        if username == "admin" and password == "admin123":
-            if username in users:
-                login_and_reload(username)
+        if (username, password) in (("demo", "demo123"), ("admin", "admin123")):
+            user = get_user(username)
+            if user is not None:
+                login_and_reload(username, user["role"])
             else:
-                st.error("Admin account missing. Run demo_fixtures.py.")
+                st.error(f"{username.capitalize()} account missing. Run demo_fixtures.py.")
             return
 
-        if username not in users:
+        result = authenticate(username, password)
+        if result.ok:
+            login_and_reload(username, result.user["role"])
+        elif result.reason == "not_found":
             st.error("User not found. Please register.")
-            return
-
-        if not is_user_activated(username):
+        elif result.reason == "not_activated":
             st.warning("Account not activated. Activate from email.")
-            return
-
-        if verify_user_credentials(username, password):
-            login_and_reload(username)
         else:
             st.error("Invalid credentials.")
 
@@ -118,8 +116,7 @@ def register_page():
         if not username or not email or not password:
             st.error("Username, email and password required.")
             return
-        users = read_users()
-        if username in users:
+        if user_exists(username):
             st.error("Username exists.")
             return
         ok, reason = strong_password_ok(password)
@@ -139,7 +136,7 @@ def register_page():
         })
         ok_email, msg = send_activation_email(email, username, activation_code)
         if ok_email:
-            st.success("Account created. Activation code sent to your email.")
+            st.success("Account created. Activation code is on its way to your email.")
         else:
             st.warning(f"Account created but failed to send email: {msg}. Activation code: {activation_code}")
         st.session_state['pending_activation'] = username
@@ -149,6 +146,11 @@ def activation_page():
     st.header("Activate your account")
     pending = st.session_state.get('pending_activation', '')
     st.write(f"Activating: **{pending}**")
+    mail = email_status(f"activation:{pending}")
+    if mail is not None and mail["status"] == "failed":
+        st.warning(f"We couldn't deliver the activation email ({mail['error']}). Activation code: {get_activation_code(pending)}")
+    elif mail is not None and mail["status"] != "sent":
+        st.caption("Activation email queued; it can take a minute to arrive.")
     code = st.text_input("Enter activation code", key="act_code")
     if st.button("Activate", key="act_btn"):
         expected = get_activation_code(pending)
@@ -170,8 +172,7 @@ def topbar(username: str):
 
 def profile_page(username: str):
     st.header("Profile & Goal")
-    users = read_users()
-    u = users.get(username, {})
+    u = get_user(username) or {}
     st.write(f"**Purpose:** {u.get('purpose','')}")
     st.write(f"**Email:** {u.get('email','')}")
     curr_goal = float(u.get('goal',0.0))
@@ -183,51 +184,109 @@ def profile_page(username: str):
         st.success("Goal updated.")
     st.rerun()
 
+EXPENSE_PAGE_SIZE = 50
+
 def expenses_page(username: str):
     st.header("Log Expense")
-    date = st.date_input("Date", value=pd.Timestamp.today().date(), key=f"date_{username}")
+    date = st.date_input("Date", value=datetime.date.today(), key=f"date_{username}")
     category = st.selectbox("Category", CATEGORIES, key=f"cat_{username}")
-    amount = st.number_input("Amount ($)", min_value=0.0, step=0.01, key=f"amt_{username}")
+    amount = st.number_input("Amount ($)", min_value=0.0, max_value=MAX_EXPENSE_AMOUNT, step=0.01, key=f"amt_{username}")
     desc = st.text_input("Description", key=f"desc_{username}")
     if st.button("Add Expense", key=f"add_{username}"):
         try:
             log_expense(username, str(date), category, float(amount), desc)
+            if desc.strip():
+                from utils.categorizer import learn_category
+                learn_category(username, desc, category)
             st.success("Logged.")
             st.rerun()
         except Exception as e:
             st.error(f"Failed: {e}")
+    with st.expander("Import bank statement"):
+        upload = st.file_uploader("CSV or OFX export", type=["csv", "ofx", "qfx"], key=f"import_{username}")
+        signed = st.checkbox("Negative amounts are spending (skip credits)", key=f"import_signed_{username}")
+        if upload is not None and st.button("Import", key=f"import_btn_{username}"):
+            from utils.importer import import_statement
+            fmt = upload.name.rsplit(".", 1)[-1].lower()
+            status = st.empty()
+            try:
+                report = import_statement(
+                    username, upload, fmt=fmt, signed=signed,
+                    progress=lambda r: status.write(f"Imported {r['imported']} of {r['read']} rows read..."),
+                )
+                status.success(
+                    f"Imported {report['imported']} rows "
+                    f"({report['duplicates']} duplicates skipped, {report['rejected']} invalid)."
+                )
+            except Exception as e:
+                status.error(f"Import failed: {e}")
     st.markdown("---")
-    df = expenses_df(username)
-    if df.empty:
+    _, has_any = query_expenses(username, limit=0)
+    if not has_any:
         st.info("No expenses yet.")
     else:
         st.subheader("Your expenses")
-        st.dataframe(df)
-        csv = df.to_csv(index=False).encode('utf-8')
-        st.download_button("⬇ Export expenses CSV", data=csv, file_name=f"{username}_expenses.csv", mime="text/csv")
-        month_start = pd.Timestamp.today().replace(day=1).date()
+        f1, f2, f3 = st.columns(3)
+        start = f1.date_input("From", value=None, key=f"q_from_{username}")
+        end = f2.date_input("To", value=None, key=f"q_to_{username}")
+        cats = f3.multiselect("Categories", CATEGORIES, key=f"q_cats_{username}")
+        s1, s2 = st.columns(2)
+        sort = s1.selectbox("Sort by", ["date", "amount"], key=f"q_sort_{username}")
+        descending = s2.checkbox("Newest / largest first", value=True, key=f"q_desc_{username}")
+        end_excl = end + datetime.timedelta(days=1) if end else None
+        _, matches = query_expenses(username, start, end_excl, cats, limit=0)
+        pages = max(1, (matches - 1) // EXPENSE_PAGE_SIZE + 1)
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key=f"q_page_{username}")
+        rows, _ = query_expenses(username, start, end_excl, cats, sort, descending,
+                                 limit=EXPENSE_PAGE_SIZE, offset=(page - 1) * EXPENSE_PAGE_SIZE)
+        st.caption(f"{matches} matching expenses")
+        st.dataframe(rows)
+        from utils import exports
+        export_button("Export expenses", f"{username}_expenses", lambda fmt: exports.expenses(username, fmt),
+                      key=f"export_{username}")
+        month_start = datetime.date.today().replace(day=1)
         total = total_spent_month(username, month_start)
-        users = read_users()
-        goal = float(users.get(username, {}).get('goal',0.0))
-        c1,c2 = st.columns(2)
+        goal = float((get_user(username) or {}).get('goal',0.0))
+        from utils.forecast import month_forecast
+        fc = month_forecast(username)
+        c1,c2,c3 = st.columns(3)
         c1.metric("Spent this month", f"${total:.2f}")
         c2.metric("Goal", f"${goal:.2f}")
+        c3.metric("Projected month-end", f"${fc['projected']:.2f}",
+                  delta=f"${fc['projected'] - goal:+.2f} vs goal" if goal > 0 else None, delta_color="inverse")
+        if fc["history_days"]:
+            pace = f"Likely range ${fc['low']:.2f} – ${fc['high']:.2f}"
+            if fc["p_within_goal"] is not None:
+                pace += f" · {fc['p_within_goal']:.0%} chance of staying within your goal"
+            st.caption(pace)
+        found = spending_insights(username)
+        if found["recurring"]:
+            with st.expander(f"Recurring charges ({len(found['recurring'])})"):
+                st.dataframe([
+                    {"Merchant": r["label"], "Every": r["cycle"], "Amount": r["amount"], "Next": r["next"], "Per month": r["monthly"]}
+                    for r in found["recurring"]
+                ])
+        if found["anomalies"]:
+            with st.expander(f"Unusual expenses ({len(found['anomalies'])})"):
+                st.dataframe([
+                    {"Date": a["date"], "Category": a["category"], "Amount": a["amount"], "Description": a["description"]}
+                    for a in found["anomalies"]
+                ])
         if st.button("Show graphs", key=f"graphs_{username}"):
             totals = totals_by_category(username, since_date=month_start)
             if totals:
-                cats = list(totals.keys()); vals = [totals[k] for k in cats]
                 col1,col2 = st.columns(2)
-                with col1:
-                    fig, ax = plt.subplots(figsize=(5,3))
-                    ax.bar(cats, vals)
-                    ax.set_title("Spending by category (this month)")
-                    plt.xticks(rotation=30)
-                    st.pyplot(fig)
-                with col2:
-                    fig2, ax2 = plt.subplots(figsize=(4,4))
-                    ax2.pie(vals, labels=cats, autopct="%1.1f%%", startangle=90)
-                    ax2.set_title("Spending distribution")
-                    st.pyplot(fig2)
+                if CHART_RENDERER == "native":
+                    col1.bar_chart({"Spent": totals})
+                    col2.dataframe({"Category": list(totals), "Share": [f"{v / sum(totals.values()):.1%}" for v in totals.values()]})
+                else:
+                    # Plotting stack is loaded on first use, not at app start.
+                    from utils.charts import category_charts
+                    bar, pie = category_charts(username, f"{month_start:%Y-%m}", totals, fmt=CHART_RENDERER)
+                    if CHART_RENDERER == "svg":
+                        bar, pie = bar.decode("utf-8"), pie.decode("utf-8")
+                    col1.image(bar)
+                    col2.image(pie)
             else:
                 st.info("No data for graphs.")
 
@@ -263,35 +322,138 @@ def feedback_page(username: str):
                 write_feedback(username, text.strip(), rating)
                 st.success("Thanks for your feedback!")
 
+FEEDBACK_PAGE_SIZE = 50
+
 def admin_feedback_view():
     st.header("Admin - Feedback")
-    rows = read_feedback()
-    if not rows:
+    summary = feedback_summary()
+    if not summary["count"]:
         st.info("No feedback yet.")
         return
-    df = pd.DataFrame(rows)
-    if 'timestamp' not in df.columns:
-        df['timestamp'] = ""
-    try:
-        df['ts'] = pd.to_datetime(df['timestamp'], errors='coerce')
-        df = df.sort_values('ts', ascending=False)
-    except Exception:
-        pass
-    st.dataframe(df.drop(columns=['ts'], errors='ignore'))
-    csv = df.to_csv(index=False).encode('utf-8')
-    st.download_button("⬇ Export feedback CSV", data=csv, file_name="feedback.csv", mime="text/csv")
+    c1, c2 = st.columns(2)
+    c1.metric("Feedback received", f"{summary['count']:,}")
+    c2.metric("Average rating", f"{summary['average']:.2f}" if summary["average"] is not None else "—")
+    st.bar_chart({"Responses": {k: summary["ratings"][k] for k in ("1", "2", "3", "4", "5")}})
+    pages = (summary["count"] - 1) // FEEDBACK_PAGE_SIZE + 1
+    page = st.number_input("Page (newest first)", min_value=1, max_value=pages, value=1, step=1, key="fb_page")
+    st.dataframe(data_utils.feedback_page((page - 1) * FEEDBACK_PAGE_SIZE, FEEDBACK_PAGE_SIZE))
+    from utils import exports
+    export_button("Export feedback", "feedback", exports.feedback, key="fb_export")
 
 def admin_users_view():
+    import pandas as pd
     st.header("Admin - Users")
     users = read_users()
     df = pd.DataFrame([u for u in users.values()])
     st.dataframe(df)
-    # export
-    csv = df.to_csv(index=False).encode('utf-8')
-    st.download_button("⬇ Export users CSV", data=csv, file_name="users.csv", mime="text/csv")
+    from utils import exports
+    export_button("Export users", "users", exports.users, key="users_export")
+    st.subheader("Ledgers")
+    catalog = data_utils.ledger_manifest()
+    st.write(f"{catalog['ledgers']:,} ledgers · {catalog['rows']:,} expenses · {catalog['bytes'] / 2**20:,.1f} MiB")
+    if not catalog["complete"]:
+        st.caption("Indexing ledgers in the background; totals cover the ledgers indexed so far.")
+    st.dataframe(pd.DataFrame(catalog["largest"], columns=["username", "rows", "bytes", "compacted", "min_date", "max_date", "path"]))
+    st.subheader("Export everything")
+    st.caption("Every ledger into one tar archive, built in the background; you can leave this page meanwhile.")
+    c1, c2, c3 = st.columns([1, 2, 1])
+    fmt = c1.selectbox("Format", exports.formats(), index=exports.formats().index("csv.gz"), key="export_all_fmt",
+                       label_visibility="collapsed")
+    if c2.button("Start export", key="export_all"):
+        exports.start_export_all(fmt)
+    c3.button("Refresh", key="export_all_refresh")
+    job = exports.job_status()
+    if job is not None:
+        done, total = job["users_done"], job["users_total"]
+        if job["state"] == "running":
+            st.progress(done / total if total else 0.0,
+                        text=f"{done:,} / {total if total is not None else '?'} ledgers · {job['bytes'] / 2**20:,.1f} MiB")
+        elif job["state"] == "done" and os.path.exists(job["path"]):
+            st.download_button(f"⬇ {job['name']} ({os.path.getsize(job['path']) / 2**20:,.1f} MiB, {done:,} ledgers)",
+                               data=lambda: open(job["path"], "rb"), file_name=job["name"], mime="application/x-tar",
+                               on_click="ignore", key="export_all_download")
+        else:
+            st.warning(f"Last export {job['state']}" + (f": {job['error']}" if job["error"] else "."))
+
+def admin_analytics_view():
+    st.header("Admin - Global Analytics")
+    from utils.analytics import global_analytics
+    with st.spinner("Aggregating ledgers..."):
+        stats = global_analytics()
+    if not stats["users"]:
+        st.info("No expense ledgers yet.")
+        return
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Users with expenses", f"{stats['users']}")
+    c2.metric("Total spent", f"${stats['total']:,.2f}")
+    c3.metric("Expenses logged", f"{stats['rows']:,}")
+    pct = stats["user_percentiles"]
+    st.write("**Spend per user:** " + " · ".join(f"{k} ${v:,.2f}" for k, v in pct.items()))
+    st.subheader("By category")
+    st.bar_chart({"Spent": stats["by_category"]})
+    st.subheader("By month")
+    st.line_chart({"Spent": stats["by_month"]})
+    st.subheader("Top spenders")
+    st.dataframe(stats["top_users"])
+    st.subheader("Goal pace")
+    if st.button("Recompute forecasts for all users", key="forecast_all"):
+        from utils.forecast import forecast_all
+        with st.spinner("Forecasting..."):
+            forecasts = forecast_all()
+        rows = [
+            {"username": u, "spent": f["spent"], "projected": f["projected"], "goal": f["goal"], "p_within_goal": f["p_within_goal"]}
+            for u, f in forecasts.items() if f["p_within_goal"] is not None
+        ]
+        at_risk = sorted((r for r in rows if r["p_within_goal"] < 0.5), key=lambda r: r["p_within_goal"])
+        st.write(f"{len(rows)} users with a goal; {len(at_risk)} likely to go over.")
+        st.dataframe(at_risk)
+
+def admin_performance_view():
+    from utils import perf
+    st.header("Admin - Performance")
+    snap = perf.snapshot()
+    if not snap["enabled"]:
+        st.info("Instrumentation is off (SPENDWISE_PERF=0).")
+        return
+    st.caption(f"Server process {snap['pid']}; figures cover this process since it started.")
+    ops = snap["operations"]
+    if not ops:
+        st.info("Nothing recorded yet.")
+        return
+    pages = {op: r for op, r in ops.items() if op.startswith("page.")}
+    if pages:
+        st.subheader("Page renders")
+        st.dataframe([{"page": op[5:], **r} for op, r in pages.items()])
+    st.subheader("Operations")
+    st.dataframe([{"operation": op, **r} for op, r in ops.items() if op not in pages])
+    if snap["counters"]:
+        st.write(" · ".join(f"**{k}** {v:,}" for k, v in snap["counters"].items()))
+    mail = data_utils.outbox_stats()
+    st.write(f"**Outbox:** {mail['queued'] + mail['sending']:,} waiting ({mail['due']:,} due, oldest {mail['oldest_s']:,.0f}s) · "
+             f"{mail['sent']:,} sent · {mail['failed']:,} failed")
+    shared = data_utils.shared_cache()
+    if shared is not None:
+        sc = shared.stats()
+        st.write(f"**Shared cache:** {sc['entries']:,} entries · {sc['bytes'] / 2**20:,.1f} MiB · "
+                 f"{sc['hit_rate']:.0%} hit rate in this process")
+    from utils.ai_helper import tip_service_stats
+    tips = tip_service_stats()
+    if tips:
+        st.write(f"**AI tips:** {tips['hit_rate']:.0%} cache hit rate ({tips['hits']:,} hits, {tips['misses']:,} misses, "
+                 f"{tips['coalesced']:,} coalesced) · p95 {tips['p95_ms']:,.0f} ms · {tips['timeouts']:,} timeouts · "
+                 f"{tips['fallbacks']:,} fallbacks · breaker {tips['breaker']} · {tips['cached']:,} cached")
+    st.subheader("Slowest users (mean page render)")
+    st.dataframe(snap["slow_users"][:20])
+    st.subheader("Recent slow events")
+    st.dataframe([{**e, "at": datetime.datetime.fromtimestamp(e["at"]).strftime("%Y-%m-%d %H:%M:%S")}
+                  for e in snap["slow_events"]])
+    c1, c2 = st.columns(2)
+    c1.download_button("⬇ Prometheus metrics", data=perf.prometheus_text(), file_name="spendwise.prom", mime="text/plain")
+    c2.download_button("⬇ JSON snapshot", data=json.dumps(snap, indent=2), file_name="spendwise-perf.json",
+                       mime="application/json")
 
 def main():
-    if not read_users():
+    if not has_users():
         try:
             import demo_fixtures
             demo_fixtures.seed_demo()
@@ -311,8 +473,13 @@ def main():
         activation_page()
         return
 
-    username = st.session_state['user']
-    role = st.session_state.get('role', get_user_role(username))
+    # Reruns trust the signed session token instead of re-reading the user.
+    session = verify_session_token(st.session_state.get('token'))
+    if session is None or session['username'] != st.session_state['user']:
+        logout_and_reload()
+        return
+    username = session['username']
+    role = session['role']
     topbar(username)
 
     nav_items = {
@@ -326,38 +493,52 @@ def main():
     if role == 'admin':
         nav_items.update({
             "Admin Feedback": "🗂️ Admin Feedback",
-            "Admin Users": "👥 Admin Users"
+            "Admin Users": "👥 Admin Users",
+            "Global Analytics": "📈 Global Analytics",
+            "Performance": "⏱️ Performance"
         })
 
     choice = st.sidebar.radio("Navigate", list(nav_items.values()))
     selected_page = [k for k, v in nav_items.items() if v == choice][0]
 
-    if selected_page == "Home":
-        st.title("Spendwise Dashboard")
-        df = expenses_df(username)
-        if df.empty:
-            st.info("No expenses — add one.")
-        else:
-            st.subheader("Recent expenses")
-            st.dataframe(df.sort_values(by='date', ascending=False).head(5))
+    # Per-page render time, attributed to the user, for the Performance page.
+    with timer(f"page.{selected_page.lower().replace(' ', '_')}", user=username):
+        if selected_page == "Home":
+            st.title("Spendwise Dashboard")
+            recent = recent_expenses(username, 5)
+            if recent.empty:
+                st.info("No expenses — add one.")
+            else:
+                st.subheader("Recent expenses")
+                st.dataframe(recent)
+                monthly = monthly_totals(username)
+                if monthly:
+                    st.subheader("Monthly spending")
+                    st.bar_chart({"Spent": monthly})
+
+        elif selected_page == "Log Expense":
+            expenses_page(username)
+
+        elif selected_page == "AI Tip":
+            tips_page(username)
 
-    elif selected_page == "Log Expense":
-        expenses_page(username)
+        elif selected_page == "Feedback":
+            feedback_page(username)
 
-    elif selected_page == "AI Tip":
-        tips_page(username)
+        elif selected_page == "Profile":
+            profile_page(username)
 
-    elif selected_page == "Feedback":
-        feedback_page(username)
+        elif selected_page == "Admin Feedback" and role == 'admin':
+            admin_feedback_view()
 
-    elif selected_page == "Profile":
-        profile_page(username)
+        elif selected_page == "Admin Users" and role == 'admin':
+            admin_users_view()
 
-    elif selected_page == "Admin Feedback" and role == 'admin':
-        admin_feedback_view()
+        elif selected_page == "Global Analytics" and role == 'admin':
+            admin_analytics_view()
 
-    elif selected_page == "Admin Users" and role == 'admin':
-        admin_users_view()
+        elif selected_page == "Performance" and role == 'admin':
+            admin_performance_view()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
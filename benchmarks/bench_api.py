@@ -0,0 +1,172 @@
+# benchmarks/bench_api.py
+"""
+Load test for the HTTP API (utils/api.py) on seeded synthetic data.
+
+Starts `spendwise serve` on a scratch data directory, then keeps
+--concurrency keep-alive connections busy for --seconds with a read-heavy
+mix (expense pages, category totals, monthly totals, forecasts) plus
+batched POST /v1/expenses writes, each request as a random synthetic user.
+Reports requests per second and p50/p99 latency per endpoint and overall.
+
+    python -m benchmarks.bench_api --users 200 --expenses 500 --concurrency 32 --seconds 10 --workers 2
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import datetime
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Read mix as (name, weight); "log" posts --batch expenses per request and
+# gets --writes percent of requests.
+READS = [("expenses", 35), ("totals", 35), ("monthly", 18), ("forecast", 12)]
+
+
+def _pct(values, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+
+
+class Connection:
+    """Minimal HTTP/1.1 keep-alive client: fixed-length and chunked bodies."""
+
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, token: str, body: bytes = b"") -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nAuthorization: Bearer {token}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+        self.writer.write(head.encode("ascii") + body)
+        status_line = await self.reader.readline()
+        status = int(status_line.split()[1])
+        length, chunked = 0, False
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "transfer-encoding" and "chunked" in value.lower():
+                chunked = True
+        if chunked:
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await self.reader.readexactly(length)
+        return status
+
+
+def _wait_for(host: str, port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("API server did not start")
+
+
+async def _load(host, port, tokens, args):
+    names, weights = zip(*[(n, w * (100 - args.writes) / 100) for n, w in READS], ("log", args.writes))
+    stats = {name: [] for name in names}
+    errors = {}
+    cats = ["Food", "Groceries", "Transport", "Shopping", "Bills"]
+    today = datetime.date.today()
+    stop = time.perf_counter() + args.seconds
+
+    async def client(seed):
+        rng = random.Random(seed)
+        conn = Connection(host, port)
+        while time.perf_counter() < stop:
+            user = rng.randrange(len(tokens))
+            name = rng.choices(names, weights)[0]
+            body = b""
+            if name == "expenses":
+                method, path = "GET", f"/v1/expenses?limit=50&offset={rng.randrange(4) * 50}"
+            elif name == "totals":
+                method, path = "GET", f"/v1/totals?since={today.replace(day=1)}"
+            elif name == "log":
+                method, path = "POST", "/v1/expenses"
+                body = json.dumps({"expenses": [
+                    {"date": str(today - datetime.timedelta(days=rng.randrange(30))), "category": rng.choice(cats),
+                     "amount": round(rng.uniform(1, 80), 2), "description": "bench"}
+                    for _ in range(args.batch)
+                ]}).encode("utf-8")
+            else:
+                method, path = "GET", f"/v1/{name}"
+            t0 = time.perf_counter()
+            status = await conn.request(method, path, tokens[user], body)
+            stats[name].append((time.perf_counter() - t0) * 1000)
+            if status >= 400:
+                errors[status] = errors.get(status, 0) + 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(args.concurrency)))
+    return stats, errors, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--expenses", type=int, default=500, help="expenses per user")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--writes", type=float, default=15.0, help="percent of requests that POST expenses")
+    parser.add_argument("--batch", type=int, default=20, help="expenses per POST")
+    parser.add_argument("--workers", type=int, default=1, help="server processes")
+    parser.add_argument("--port", type=int, default=18600)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="spendwise-api-")
+    os.environ["SPENDWISE_DATA_DIR"] = data_dir
+    os.environ.setdefault("SPENDWISE_BCRYPT_ROUNDS", "4")
+    from benchmarks.synthetic import populate
+    from utils.auth import issue_session_token
+    t0 = time.perf_counter()
+    names = populate(args.users, args.expenses, feedback=0)
+    print(f"data:    {args.users} users x {args.expenses} expenses in {time.perf_counter() - t0:.1f}s")
+    tokens = [issue_session_token(u, "user") for u in names]
+
+    host = "127.0.0.1"
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "spendwise"), "serve", "--host", host, "--port", str(args.port),
+         "--workers", str(args.workers)],
+        env=dict(os.environ), cwd=ROOT,
+    )
+    try:
+        _wait_for(host, args.port)
+        stats, errors, elapsed = asyncio.run(_load(host, args.port, tokens, args))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    total = sum(len(v) for v in stats.values())
+    print(f"load:    {args.concurrency} connections, {args.workers} server process(es), {elapsed:.1f}s")
+    for name, lat in stats.items():
+        print(f"{name:9s} {len(lat) / elapsed:8.1f} req/s  p50 {_pct(lat, 50):7.2f} ms  p99 {_pct(lat, 99):7.2f} ms")
+    every = [ms for lat in stats.values() for ms in lat]
+    print(f"{'overall':9s} {total / elapsed:8.1f} req/s  p50 {_pct(every, 50):7.2f} ms  p99 {_pct(every, 99):7.2f} ms"
+          f"  ({len(stats['log']) * args.batch / elapsed:.0f} expenses/s written)")
+    if errors:
+        print(f"errors:  {errors}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
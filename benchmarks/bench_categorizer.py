@@ -0,0 +1,41 @@
+# benchmarks/bench_categorizer.py
+"""
+Auto-categorization throughput on synthetic bank descriptions.
+
+    python -m benchmarks.bench_categorizer --rows 100000 --merchants 5000
+"""
+import time
+import random
+import argparse
+
+import pandas as pd
+
+from utils import categorizer
+from utils.config import CATEGORY_KEYWORDS
+
+_NOISE = ["card payment", "pos", "debit", "contactless", "online", "purchase", "ref"]
+
+
+def synthetic_descriptions(rows: int, merchants: int, seed: int = 0) -> pd.Series:
+    rng = random.Random(seed)
+    keywords = [kw for kws in CATEGORY_KEYWORDS.values() for kw in kws]
+    names = []
+    for i in range(merchants):
+        base = rng.choice(keywords) if rng.random() < 0.7 else f"vendor{chr(97 + i % 26)}{chr(97 + i // 26 % 26)}"
+        names.append(f"{rng.choice(_NOISE).upper()} {base.upper()} {rng.choice(['LONDON', 'NYC', 'ONLINE', ''])}")
+    return pd.Series([f"{rng.choice(names)} #{rng.randrange(10000)}" for _ in range(rows)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--merchants", type=int, default=5000)
+    args = parser.parse_args()
+    descriptions = synthetic_descriptions(args.rows, args.merchants)
+
+    for label in ("cold", "warm"):
+        t0 = time.perf_counter()
+        cats = categorizer.categorize(descriptions)
+        elapsed = time.perf_counter() - t0
+        print(f"{label}: {args.rows / elapsed:12,.0f} descriptions/s  ({elapsed * 1000:.0f} ms)")
+    print(cats.value_counts().to_string())
@@ -0,0 +1,69 @@
+# benchmarks/bench_compaction.py
+"""
+Cold-read time of CSV ledgers with and without a compacted snapshot.
+
+Builds one ledger of --rows expenses, then times a cold read (empty ledger
+cache) as a full CSV parse, and from a snapshot taken --delta rows ago
+(snapshot load plus parsing the appended tail). Also times the compaction.
+
+    python -m benchmarks.bench_compaction --rows 200000 --delta 2000
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import datetime
+import statistics
+
+
+def _records(rng, n):
+    cats = ["Food", "Groceries", "Transport", "Shopping", "Bills", "Health"]
+    start = datetime.date(2023, 1, 1)
+    return [{"date": str(start + datetime.timedelta(days=rng.randrange(700))), "category": rng.choice(cats),
+             "amount": round(rng.uniform(1, 120), 2), "description": f"merchant {rng.randrange(5000)}"}
+            for _ in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--delta", type=int, default=2000, help="rows appended after the snapshot")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ["SPENDWISE_DATA_DIR"] = tempfile.mkdtemp(prefix="spendwise-compact-")
+    os.environ.setdefault("SPENDWISE_FSYNC", "0")
+    from utils import data_utils
+    from utils.expense_store import CsvExpenseStore
+    from utils.ledger_cache import LedgerCache
+
+    rng = random.Random(7)
+    user = "bench"
+    data_utils.log_expenses(user, _records(rng, args.rows - args.delta))
+    t0 = time.perf_counter()
+    data_utils.compact_ledger(user)
+    compact_s = time.perf_counter() - t0
+    data_utils.log_expenses(user, _records(rng, args.delta))
+    size = os.path.getsize(data_utils._expense_path(user))
+
+    def cold(snapshot_for):
+        times = []
+        for _ in range(args.repeat):
+            store = CsvExpenseStore(data_utils._expense_path, LedgerCache(1 << 30), snapshot_for)
+            t0 = time.perf_counter()
+            n = len(store.frame(user))
+            times.append(time.perf_counter() - t0)
+        return n, statistics.median(times) * 1000
+
+    n, full_ms = cold(None)
+    _, snap_ms = cold(data_utils._snapshot_path)
+    print(f"ledger:    {n:,} rows, {size / 2**20:.1f} MiB CSV, "
+          f"{os.path.getsize(data_utils._snapshot_path(user)) / 2**20:.1f} MiB snapshot")
+    print(f"compact:   {compact_s * 1000:8.1f} ms (cached parse + snapshot write)")
+    print(f"cold read: {full_ms:8.1f} ms full CSV parse")
+    print(f"cold read: {snap_ms:8.1f} ms snapshot + {args.delta:,}-row delta  ({full_ms / snap_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# benchmarks/bench_export.py
+"""
+Peak memory and time of a ledger export, streamed vs built whole.
+
+Builds ledgers of each --rows size, then exports each in every format
+through utils.exports (bounded chunks) and, for comparison, the old way:
+the whole ledger as one frame, then one to_csv string. Peak is traced
+Python/numpy allocation (tracemalloc) during the export, ledger cache
+excluded; streamed peaks should stay flat as the ledger grows.
+
+    python -m benchmarks.bench_export --rows 50000 200000 400000
+"""
+import os
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+from benchmarks.bench_compaction import _records
+
+
+def _measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[50000, 200000, 400000])
+    args = parser.parse_args()
+
+    os.environ["SPENDWISE_DATA_DIR"] = tempfile.mkdtemp(prefix="spendwise-export-")
+    os.environ.setdefault("SPENDWISE_FSYNC", "0")
+    import random
+    from utils import data_utils, exports
+    from utils.expense_schema import display
+
+    rng = random.Random(7)
+    for n in args.rows:
+        user = f"bench{n}"
+        for i in range(0, n, 100000):
+            data_utils.log_expenses(user, _records(rng, min(100000, n - i)))
+        data_utils._stores()[0].cache.clear()
+        mb = os.path.getsize(data_utils._expense_path(user)) / 2**20
+
+        def whole():
+            df = display(data_utils.expenses_df(user))
+            return len(df.to_csv(index=False).encode("utf-8"))
+
+        print(f"{n:,} rows ({mb:.1f} MiB CSV)")
+        results = [("whole csv", whole)]
+        results += [(f"streamed {fmt}", lambda fmt=fmt: sum(len(c) for c in exports.expenses(user, fmt)))
+                    for fmt in exports.formats()]
+        for label, fn in results:
+            data_utils._stores()[0].cache.clear()
+            size, peak, elapsed = _measure(fn)
+            print(f"  {label:18s} peak {peak / 2**20:7.1f} MiB  {elapsed * 1000:8.1f} ms  -> {size / 2**20:6.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
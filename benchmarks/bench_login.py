@@ -0,0 +1,70 @@
+# benchmarks/bench_login.py
+"""
+Login throughput: concurrent `authenticate` calls against a scratch data dir,
+plus the session-token check every rerun performs afterwards.
+
+    python -m benchmarks.bench_login --users 200 --threads 8 --seconds 5 --rounds 10
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8, help="concurrent sessions hammering login")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost")
+    parser.add_argument("--workers", type=int, default=4, help="bcrypt pool size")
+    args = parser.parse_args()
+
+    # Configure before utils is imported; these are read at import time.
+    os.environ["SPENDWISE_DATA_DIR"] = tempfile.mkdtemp(prefix="spendwise-login-")
+    os.environ["SPENDWISE_BCRYPT_ROUNDS"] = str(args.rounds)
+    os.environ["SPENDWISE_BCRYPT_WORKERS"] = str(args.workers)
+    from utils import data_utils
+    from utils.auth import authenticate, hash_password, issue_session_token, verify_session_token
+
+    pw_hash = hash_password("Password1")
+    for i in range(args.users):
+        data_utils.write_user({
+            "username": f"user{i}", "password_hash": pw_hash, "role": "user",
+            "activated": True, "email": f"user{i}@example.com",
+        })
+
+    done = []
+    stop = time.perf_counter() + args.seconds
+
+    def worker(seed):
+        rng = random.Random(seed)
+        n = 0
+        while time.perf_counter() < stop:
+            result = authenticate(f"user{rng.randrange(args.users)}", "Password1")
+            assert result.ok, result.reason
+            n += 1
+        done.append(n)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    print(f"logins:   {sum(done) / elapsed:10.1f} /s  (rounds={args.rounds}, pool={args.workers}, threads={args.threads})")
+
+    token = issue_session_token("user0", "user")
+    n = 20000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        verify_session_token(token)
+    print(f"sessions: {n / (time.perf_counter() - t0):10.1f} /s  (token check per rerun)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
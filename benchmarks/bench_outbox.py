@@ -0,0 +1,214 @@
+# benchmarks/bench_outbox.py
+"""
+Activation-email delivery against a local SMTP stand-in.
+
+The stand-in speaks just enough ESMTP for smtplib (EHLO, AUTH PLAIN/LOGIN,
+MAIL, RCPT, DATA, RSET, NOOP, QUIT) and sleeps to model the round trips a
+real server costs: --connect-ms for the TCP/TLS handshake and greeting,
+--auth-ms for the login, --data-ms per message. --fail-rate answers that
+share of RCPTs with a transient 451 to exercise retries.
+
+Reports the old inline path (a fresh connection and login per email, which
+a registration waited on) next to the outbox: enqueue latency, which is all
+a registration now waits for, then delivery throughput, connections opened
+and queue depth while the background sender drains a burst.
+
+    python -m benchmarks.bench_outbox --messages 2000 --connections 4 --connect-ms 40 --auth-ms 20
+"""
+import os
+import sys
+import time
+import base64
+import random
+import smtplib
+import argparse
+import tempfile
+import threading
+import socketserver
+from email.message import EmailMessage
+
+
+class SmtpStub(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, connect_ms: float, auth_ms: float, data_ms: float, fail_rate: float):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.delays = (connect_ms / 1000, auth_ms / 1000, data_ms / 1000)
+        self.fail_rate = fail_rate
+        self.connections = 0
+        self.logins = 0
+        self.delivered = 0
+        self.deferred = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(0)
+
+    def count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def defer(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.fail_rate
+
+
+class _StubHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        connect_s, auth_s, data_s = server.delays
+        server.count("connections")
+        time.sleep(connect_s)
+        self._reply("220 stub ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.decode("ascii", "replace").strip().split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.wfile.write(b"250-stub\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+            elif verb == "AUTH":
+                args = line.decode("ascii").split()[1:]
+                if args[0].upper() == "LOGIN":
+                    # Username may come as an initial response.
+                    for prompt in ("VXNlcm5hbWU6", "UGFzc3dvcmQ6")[len(args) - 1:]:
+                        self._reply(f"334 {prompt}")
+                        self.rfile.readline()
+                elif len(args) < 2:
+                    self._reply("334 ")
+                    base64.b64decode(self.rfile.readline().strip())
+                time.sleep(auth_s)
+                server.count("logins")
+                self._reply("235 2.7.0 Authentication successful")
+            elif verb == "RCPT" and server.defer():
+                server.count("deferred")
+                self._reply("451 4.3.0 Try again later")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                time.sleep(data_s)
+                server.count("delivered")
+                self._reply("250 OK queued")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+def _message(i: int) -> EmailMessage:
+    msg = EmailMessage()
+    msg['Subject'] = 'Spendwise - Activate your account'
+    msg['From'] = "noreply@example.com"
+    msg['To'] = f"user{i}@example.com"
+    msg.set_content(f"Hi user{i},\n\nYour Spendwise activation code is: {i:06x}\n")
+    return msg
+
+
+def _pct(values, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--inline", type=int, default=100, help="messages sent the old way, one connection each")
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=8, help="concurrent registrations enqueueing")
+    parser.add_argument("--connect-ms", type=float, default=40.0)
+    parser.add_argument("--auth-ms", type=float, default=20.0)
+    parser.add_argument("--data-ms", type=float, default=2.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = SmtpStub(args.connect_ms, args.auth_ms, args.data_ms, args.fail_rate)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    host, port = stub.server_address
+
+    # Configure before utils is imported; these are read at import time.
+    os.environ["SPENDWISE_DATA_DIR"] = tempfile.mkdtemp(prefix="spendwise-outbox-")
+    os.environ["SPENDWISE_OUTBOX_CONNECTIONS"] = str(args.connections)
+    os.environ["SPENDWISE_OUTBOX_BATCH"] = str(args.batch)
+    os.environ["SPENDWISE_OUTBOX_BACKOFF_S"] = "0.05"
+    os.environ["SPENDWISE_OUTBOX_BACKOFF_MAX_S"] = "0.5"
+    os.environ["SPENDWISE_OUTBOX_MAX_ATTEMPTS"] = "20"
+    from utils import data_utils, perf
+    from utils.mailer import SmtpSettings, start_sender
+
+    settings = SmtpSettings(host, port, "bench", "secret", "noreply@example.com", starttls=False)
+
+    # The old path: every registration opened, logged in and closed its own connection.
+    lat = []
+    t0 = time.perf_counter()
+    for i in range(args.inline):
+        t = time.perf_counter()
+        with smtplib.SMTP(host, port, timeout=10) as server:
+            server.login(settings.user, settings.password)
+            try:
+                server.send_message(_message(i))
+            except smtplib.SMTPRecipientsRefused:
+                pass
+        lat.append((time.perf_counter() - t) * 1000)
+    inline_s = time.perf_counter() - t0
+    if args.inline:
+        print(f"inline:  {args.inline / inline_s:8.1f} msg/s  registration waits p50 {_pct(lat, 50):6.1f} ms  p95 {_pct(lat, 95):6.1f} ms")
+
+    outbox = data_utils.mail_outbox()
+    base = (stub.connections, stub.logins, stub.delivered, stub.deferred)
+    sender = start_sender(outbox, settings)
+    lat = []
+    lat_lock = threading.Lock()
+
+    def register(ids):
+        mine = []
+        for i in ids:
+            t = time.perf_counter()
+            data_utils.queue_email(f"user{i}@example.com", "Spendwise - Activate your account",
+                                   f"Hi user{i},\n\nYour Spendwise activation code is: {i:06x}\n", tag=f"activation:user{i}")
+            mine.append((time.perf_counter() - t) * 1000)
+        with lat_lock:
+            lat.extend(mine)
+
+    threads = [threading.Thread(target=register, args=(range(k, args.messages, args.threads),)) for k in range(args.threads)]
+    depth = []
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    while True:
+        stats = outbox.stats()
+        waiting = stats["queued"] + stats["sending"]
+        depth.append((time.perf_counter() - t0, waiting))
+        if waiting == 0 and stats["sent"] + stats["failed"] >= args.messages:
+            break
+        time.sleep(0.05)
+    drain_s = time.perf_counter() - t0
+    for t in threads:
+        t.join()
+    sender.stop()
+
+    connections, logins, delivered, deferred = (
+        now - then for now, then in zip((stub.connections, stub.logins, stub.delivered, stub.deferred), base)
+    )
+    print(f"enqueue: registration waits p50 {_pct(lat, 50):6.2f} ms  p95 {_pct(lat, 95):6.2f} ms  ({args.threads} threads)")
+    print(f"outbox:  {args.messages / drain_s:8.1f} msg/s  drained {args.messages} in {drain_s:.2f}s over "
+          f"{connections} connections ({logins} logins), {delivered} delivered, {deferred} deferred and retried, "
+          f"{stats['failed']} failed")
+    peak = max(d for _, d in depth)
+    marks = [depth[min(len(depth) - 1, int(f * (len(depth) - 1)))] for f in (0.25, 0.5, 0.75)]
+    print(f"depth:   peak {peak}  " + "  ".join(f"t={t:.2f}s {d}" for t, d in marks))
+    ops = perf.snapshot()["operations"]
+    for op in ("mail.connect", "mail.send", "mail.batch"):
+        if op in ops:
+            r = ops[op]
+            print(f"{op:13s} n={r['count']:6d}  p50 {r['p50_ms']:7.2f} ms  p95 {r['p95_ms']:7.2f} ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
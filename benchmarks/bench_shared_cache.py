@@ -0,0 +1,79 @@
+# benchmarks/bench_shared_cache.py
+"""
+Hit rates across worker processes with and without the shared cache.
+
+Seeds --users synthetic users, then runs --workers processes one after the
+other (as after a rolling restart), each serving --views dashboard views
+(month forecast plus the category bar chart) for users drawn from the same
+skewed popularity. Without the shared cache every worker starts cold and
+rebuilds the same charts and forecasts; with it, each one preloads and
+reuses what earlier workers built.
+
+    python -m benchmarks.bench_shared_cache --users 100 --workers 4 --views 200
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _worker(args):
+    from utils import data_utils
+    from utils.charts import category_chart
+    from utils.forecast import month_forecast
+    from utils.perf import snapshot
+    rng = random.Random(args.seed)
+    users = data_utils.list_expense_users()
+    weights = [1 / (i + 1) for i in range(len(users))]  # a few users get most views
+    t0 = time.perf_counter()
+    for _ in range(args.views):
+        u = rng.choices(users, weights)[0]
+        month_forecast(u)
+        category_chart(u, "all", "bar", data_utils.totals_by_category(u), "Spending by category (all)")
+    elapsed = time.perf_counter() - t0
+    ops = snapshot()["operations"]
+    built = sum(ops.get(op, {}).get("count", 0) for op in ("chart.render", "forecast.user"))
+    print(f"{elapsed:.3f} {built}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--expenses", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--views", type=int, default=200)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--seed", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return _worker(args)
+
+    os.environ["SPENDWISE_DATA_DIR"] = tempfile.mkdtemp(prefix="spendwise-shared-")
+    os.environ.setdefault("SPENDWISE_FSYNC", "0")
+    from benchmarks.synthetic import populate
+    populate(args.users, args.expenses, feedback=0)
+
+    for enabled in ("0", "1"):
+        env = dict(os.environ, SPENDWISE_SHARED_CACHE=enabled)
+        total, built = 0.0, 0
+        for w in range(args.workers):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_shared_cache", "--worker", "--views", str(args.views),
+                 "--seed", str(w)], env=env, cwd=ROOT, capture_output=True, text=True, check=True,
+            ).stdout.split()
+            total += float(out[0])
+            built += int(out[1])
+        label = "shared" if enabled == "1" else "per-process"
+        views = args.workers * args.views
+        print(f"{label:12s} {args.workers} workers x {args.views} views: {total:6.2f}s serving "
+              f"({total / views * 1000:.2f} ms/view), {built} charts/forecasts built, "
+              f"{1 - built / (2 * views):.0%} served from cache")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
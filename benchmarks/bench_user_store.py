@@ -0,0 +1,69 @@
+# benchmarks/bench_user_store.py
+"""
+Per-operation latency of the user store as the user count grows.
+
+    python -m benchmarks.bench_user_store --sizes 1000 10000 100000 1000000
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+
+from utils.user_store import CsvUserStore, SqliteUserStore
+
+def _fake_user(i: int) -> dict:
+    return {
+        "username": f"user{i}",
+        "password_hash": "$2b$12$" + "x" * 53,
+        "salt": "",
+        "purpose": "bench",
+        "goal": 100.0,
+        "role": "user",
+        "activated": True,
+        "activation_code": "",
+        "email": f"user{i}@example.com",
+    }
+
+def _populate(store, n: int, batch: int = 50000):
+    if isinstance(store, SqliteUserStore):
+        for lo in range(0, n, batch):
+            store.put_many(_fake_user(i) for i in range(lo, min(n, lo + batch)))
+    else:
+        import csv
+        from utils.user_store import USER_FIELDS
+        with open(store.path, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=USER_FIELDS)
+            w.writeheader()
+            for i in range(n):
+                w.writerow(_fake_user(i))
+
+def _time_op(fn, keys) -> float:
+    t0 = time.perf_counter()
+    for k in keys:
+        fn(k)
+    return (time.perf_counter() - t0) / len(keys) * 1e6
+
+def run(backend: str, n: int, ops: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        if backend == "sqlite":
+            store = SqliteUserStore(os.path.join(tmp, "users.db"))
+        else:
+            store = CsvUserStore(os.path.join(tmp, "users.csv"))
+        _populate(store, n)
+        rng = random.Random(n)
+        keys = [f"user{rng.randrange(n)}" for _ in range(ops)]
+        get_us = _time_op(store.get, keys)
+        put_us = _time_op(lambda k: store.put({**_fake_user(0), "username": k, "goal": 200.0}), keys)
+        act_us = _time_op(lambda k: store.set_activation(k, True), keys)
+        print(f"{backend:>6} {n:>9} users | get {get_us:9.1f} us | put {put_us:9.1f} us | activate {act_us:9.1f} us")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--backend", choices=["sqlite", "csv"], default="sqlite")
+    args = parser.parse_args()
+    for n in args.sizes:
+        # The CSV backend rewrites the whole file per write; keep its op count small.
+        run(args.backend, n, args.ops if args.backend == "sqlite" else min(args.ops, 20))
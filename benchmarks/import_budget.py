@@ -0,0 +1,78 @@
+# benchmarks/import_budget.py
+"""
+Cold-start guard for the login path.
+
+Imports `app` and the lightweight `utils` modules in fresh interpreters
+under `python -X importtime`, and exits non-zero if
+
+- a heavy dependency (pandas, numpy, matplotlib, cohere client code) is
+  loaded at import time, or
+- the cumulative import time exceeds its budget.
+
+    python -m benchmarks.import_budget [--runs 5] [--scale 1.0]
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Modules the login/registration render imports, with a cumulative budget in
+# milliseconds on top of the bare `import streamlit` baseline.
+BUDGETS_MS = {
+    "app": 250,
+    "utils.config": 10,
+    "utils.user_store": 30,
+    "utils.data_utils": 60,
+    "utils.ai_helper": 30,
+    "utils.tips": 60,
+}
+FORBIDDEN = ("pandas", "numpy", "matplotlib", "cohere")
+
+
+def _import_profile(module: str):
+    """Return (cumulative_us per module, loaded module names) for importing `module`."""
+    code = (
+        "import sys, streamlit\n"
+        f"import {module}\n"
+        "print('\\n'.join(sorted(sys.modules)))"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        if parts[1].isdigit():
+            cumulative[parts[2].strip()] = int(parts[1])
+    return cumulative, set(proc.stdout.split())
+
+
+def check(runs: int, scale: float) -> int:
+    failures = 0
+    for module, budget in BUDGETS_MS.items():
+        best = None
+        loaded = set()
+        for _ in range(runs):
+            cumulative, loaded = _import_profile(module)
+            us = cumulative.get(module, 0)
+            best = us if best is None else min(best, us)
+        ms = best / 1000
+        heavy = sorted(m for m in FORBIDDEN if m in loaded)
+        ok = ms <= budget * scale and not heavy
+        failures += not ok
+        note = f" loads {', '.join(heavy)}" if heavy else ""
+        print(f"{'ok  ' if ok else 'FAIL'} {module:<20} {ms:8.1f} ms (budget {budget * scale:.0f} ms){note}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5, help="take the best of N fresh interpreters")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply budgets, e.g. for slow CI machines")
+    args = parser.parse_args()
+    sys.exit(1 if check(args.runs, args.scale) else 0)
@@ -0,0 +1,152 @@
+# benchmarks/stress_writes.py
+"""
+Multi-process write stress: several processes, each with several threads,
+append expenses (single rows and small frames), feedback and user records to
+one shared scratch data dir as fast as they can. Afterwards every write must
+be present exactly once, every ledger line must parse, and the rollup must
+agree with the ledger. Exits non-zero on any lost or torn row.
+
+    python -m benchmarks.stress_writes --procs 4 --threads 4 --writes 500
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+USER = "shared"
+CATS = ["Food", "Transport", "Shopping", "Bills"]
+
+
+def _amount(i: int) -> int:
+    return i % 7 + 1
+
+
+def _worker(proc: int, threads: int, writes: int):
+    import threading
+    import pandas as pd
+    from utils import data_utils
+    from utils.file_io import append_stats
+
+    def run(t):
+        for i in range(writes):
+            tag = f"p{proc}-t{t}-{i}"
+            if t == 0 and i % 10 == 0:
+                data_utils.log_expenses_frame(USER, pd.DataFrame({
+                    'date': pd.to_datetime([f"2024-{i % 12 + 1:02d}-15"] * 3),
+                    'category': [CATS[i % len(CATS)]] * 3,
+                    'amount': [float(_amount(i))] * 3,
+                    'description': [f"{tag}-b{j}" for j in range(3)],
+                }))
+            else:
+                data_utils.log_expense(USER, f"2024-{i % 12 + 1:02d}-15", CATS[i % len(CATS)], _amount(i), tag)
+            if i % 10 == 0:
+                data_utils.write_feedback(tag, "stress", i % 5 + 1)
+            if i % 25 == 0:
+                data_utils.write_user({"username": tag, "password_hash": "x", "role": "user"})
+
+    pool = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for th in pool:
+        th.start()
+    for th in pool:
+        th.join()
+    return append_stats()
+
+
+def _expected(procs: int, threads: int, writes: int):
+    rows, feedback, users = {}, 0, 0
+    for p in range(procs):
+        for t in range(threads):
+            for i in range(writes):
+                tag = f"p{p}-t{t}-{i}"
+                if t == 0 and i % 10 == 0:
+                    rows.update({f"{tag}-b{j}": _amount(i) for j in range(3)})
+                else:
+                    rows[tag] = _amount(i)
+                feedback += i % 10 == 0
+                users += i % 25 == 0
+    return rows, feedback, users
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--procs", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--writes", type=int, default=500, help="write rounds per thread")
+    parser.add_argument("--backend", default="csv", choices=["csv", "partitioned"])
+    parser.add_argument("--no-fsync", action="store_true")
+    args = parser.parse_args()
+
+    # Spawned workers inherit this environment; utils reads it at import time.
+    os.environ["SPENDWISE_DATA_DIR"] = tempfile.mkdtemp(prefix="spendwise-stress-")
+    os.environ["SPENDWISE_EXPENSE_BACKEND"] = args.backend
+    os.environ["SPENDWISE_USER_STORE"] = "csv"  # the read-modify-write backend
+    os.environ["SPENDWISE_FSYNC"] = "0" if args.no_fsync else "1"
+
+    from utils import data_utils
+    data_utils.rollup_cells(USER)  # start from a current (empty) rollup so appends fold into it
+
+    t0 = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(args.procs, mp_context=ctx) as pool:
+        futures = [pool.submit(_worker, p, args.threads, args.writes) for p in range(args.procs)]
+        stats = [f.result() for f in futures]
+    elapsed = time.perf_counter() - t0
+
+    want_rows, want_feedback, want_users = _expected(args.procs, args.threads, args.writes)
+    errors = []
+
+    if args.backend == "csv":
+        with open(data_utils._expense_path(USER), newline="", encoding="utf-8") as f:
+            lines = list(csv.reader(f))
+        if lines[0] != ['date', 'category', 'amount', 'description']:
+            errors.append(f"bad header: {lines[0]}")
+        torn = [r for r in lines[1:] if len(r) != 4 or r[0] in ("date", "")]
+        if torn:
+            errors.append(f"{len(torn)} torn rows, e.g. {torn[:3]}")
+    got = data_utils.read_expenses(USER)
+    descs = [r['description'] for r in got]
+    if len(descs) != len(set(descs)):
+        errors.append(f"{len(descs) - len(set(descs))} duplicated rows")
+    missing = set(want_rows) - set(descs)
+    if missing:
+        errors.append(f"{len(missing)} lost rows, e.g. {sorted(missing)[:3]}")
+
+    ledger_total = round(sum(float(r['amount']) for r in got), 2)
+    if ledger_total != float(sum(want_rows.values())):
+        errors.append(f"ledger total {ledger_total}, want {sum(want_rows.values())}")
+    # A rollup that claims to be current must match the ledger exactly; one
+    # left stale by a racing append is fine, it is rebuilt on the next read.
+    with open(data_utils._rollup_path(USER), encoding="utf-8") as f:
+        rollup = json.load(f)
+    current = rollup["signature"] == json.loads(json.dumps(data_utils.expense_signature(USER)))
+    folded = round(sum(a for cats in rollup["cells"].values() for a, _ in cats.values()), 2)
+    if current and folded != ledger_total:
+        errors.append(f"current rollup sums to {folded}, ledger to {ledger_total}")
+
+    n_feedback = data_utils.feedback_summary()["count"]
+    if n_feedback != want_feedback or len(data_utils.read_feedback()) != want_feedback:
+        errors.append(f"feedback: {n_feedback} indexed, {len(data_utils.read_feedback())} stored, want {want_feedback}")
+    n_users = len(data_utils.read_users())
+    if n_users != want_users:
+        errors.append(f"users: {n_users}, want {want_users}")
+
+    appends = sum(s["appends"] for s in stats)
+    commits = sum(s["commits"] for s in stats)
+    writes = len(want_rows) + want_feedback + want_users
+    print(f"{writes} writes from {args.procs}x{args.threads} writers in {elapsed:.2f}s "
+          f"({writes / elapsed:.0f}/s, backend={args.backend}, fsync={not args.no_fsync})")
+    print(f"rollup: {'current' if current else 'stale (rebuilt lazily)'}")
+    print(f"group commit: {appends} appends in {commits} commits ({appends / max(commits, 1):.2f} per fsync)")
+    for e in errors:
+        print("FAIL", e)
+    print("ok" if not errors else f"{len(errors)} check(s) failed")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+# benchmarks/suite.py
+"""
+Data-layer benchmark suite on seeded synthetic data (see synthetic.py).
+
+Times what each page actually calls (login, dashboard cold and warm, expense
+append, the admin views) and reports latency percentiles per scenario plus
+peak traced Python memory from a separate, shorter pass (tracemalloc slows
+the code it watches, so it never overlaps the timed pass).
+
+Results are compared against a local baseline for the same scale and
+backend, stored under benchmarks/baselines/ (git-ignored: baselines only
+mean something on the machine that recorded them). A scenario regresses when
+its p95 or peak memory exceeds the baseline by more than --tolerance.
+
+    python -m benchmarks.suite --users 200 --expenses 1000 --save-baseline
+    python -m benchmarks.suite --users 200 --expenses 1000        # exit 1 on regression
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import tempfile
+import tracemalloc
+from typing import Callable, Dict, List
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+# Ignore regressions smaller than these absolute amounts; they are noise.
+MIN_DELTA_MS = 1.0
+MIN_DELTA_KB = 1024
+
+
+def _percentile(sorted_ms: List[float], p: float) -> float:
+    i = min(len(sorted_ms) - 1, max(0, int(round(p / 100 * len(sorted_ms))) - 1))
+    return sorted_ms[i]
+
+
+def measure(fn: Callable[[int], object], iters: int, mem_iters: int) -> Dict:
+    """Time `fn(0..iters-1)`, then trace memory over `fn(iters..iters+mem_iters-1)`."""
+    lat = []
+    for i in range(iters):
+        t0 = time.perf_counter()
+        fn(i)
+        lat.append((time.perf_counter() - t0) * 1000)
+    lat.sort()
+    peak = None
+    if mem_iters:
+        tracemalloc.start()
+        try:
+            for i in range(iters, iters + mem_iters):
+                fn(i)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {
+        "n": iters,
+        "p50_ms": round(_percentile(lat, 50), 3),
+        "p95_ms": round(_percentile(lat, 95), 3),
+        "p99_ms": round(_percentile(lat, 99), 3),
+        "max_ms": round(lat[-1], 3),
+        "peak_kb": round(peak / 1024) if peak is not None else None,
+    }
+
+
+def scenarios(names: List[str], iters: int, seed: int):
+    """(name, fn(i), timed iterations, memory iterations) in run order; order matters for cold vs warm."""
+    from utils import data_utils
+    from utils.auth import authenticate
+    from utils.analytics import global_analytics
+    from benchmarks.synthetic import PASSWORD
+
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    month_start = today.replace(day=1)
+    pick = [rng.choice(names) for _ in range(4 * iters)]
+    # Cold touches each user once, in order; there must be enough of them
+    # for the timed pass and the memory pass.
+    cold = names[:]
+    rng.shuffle(cold)
+    cold_iters = max(1, min(iters, len(cold) * 4 // 5))
+    cold_mem = max(1, min(5, len(cold) - cold_iters))
+    warm = [rng.choice(cold[:cold_iters]) for _ in range(4 * iters)]
+
+    def login(i):
+        assert authenticate(pick[i], PASSWORD).ok
+
+    def dashboard(u):
+        # Home + Expenses page data calls, in page order.
+        data_utils.recent_expenses(u, 5)
+        data_utils.monthly_totals(u)
+        data_utils.query_expenses(u, limit=0)
+        data_utils.query_expenses(u, today - datetime.timedelta(days=30), today + datetime.timedelta(days=1), limit=50)
+        data_utils.total_spent_month(u, month_start)
+        data_utils.totals_by_category(u, since_date=month_start)
+
+    def append(u):
+        data_utils.log_expense(u, str(today), "Food", 9.5, "BENCH")
+
+    return [
+        ("login", login, iters, 5),
+        ("dashboard_cold", lambda i: dashboard(cold[i % len(cold)]), cold_iters, cold_mem),
+        ("dashboard_warm", lambda i: dashboard(warm[i]), iters, 5),
+        ("append", lambda i: append(warm[i]), iters, 5),
+        ("dashboard_after_append", lambda i: dashboard(warm[i]), iters, 5),
+        ("admin_users", lambda i: data_utils.read_users(), max(5, iters // 10), 2),
+        ("admin_feedback", lambda i: (data_utils.feedback_summary(), data_utils.feedback_page(0, 50)), iters, 5),
+        # First refresh reads every ledger's rollup; later ones only stat.
+        ("admin_analytics_cold", lambda i: global_analytics(), 1, 0),
+        ("admin_analytics", lambda i: global_analytics(), max(5, iters // 10), 2),
+    ]
+
+
+def _baseline_path(args) -> str:
+    return os.path.join(BASELINE_DIR, f"{args.users}x{args.expenses}-{args.backend}-{args.user_store}.json")
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    regressions = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if b is None:
+            continue
+        if r["p95_ms"] > b["p95_ms"] * tolerance and r["p95_ms"] - b["p95_ms"] > MIN_DELTA_MS:
+            regressions.append(f"{name}: p95 {b['p95_ms']:.2f} -> {r['p95_ms']:.2f} ms")
+        if r["peak_kb"] is not None and b.get("peak_kb") is not None \
+                and r["peak_kb"] > b["peak_kb"] * tolerance and r["peak_kb"] - b["peak_kb"] > MIN_DELTA_KB:
+            regressions.append(f"{name}: peak {b['peak_kb']} -> {r['peak_kb']} KiB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--expenses", type=int, default=1000, help="expenses per user")
+    parser.add_argument("--iters", type=int, default=100, help="timed iterations per scenario")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", default="csv", choices=["csv", "partitioned"])
+    parser.add_argument("--user-store", default="sqlite", choices=["sqlite", "csv"])
+    parser.add_argument("--rounds", type=int, default=4, help="bcrypt cost; low so login times the store, not bcrypt")
+    parser.add_argument("--data-dir", help="reuse a populated dir instead of generating a fresh one")
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    # Configure before utils is imported; these are read at import time.
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="spendwise-suite-")
+    os.environ["SPENDWISE_DATA_DIR"] = data_dir
+    os.environ["SPENDWISE_EXPENSE_BACKEND"] = args.backend
+    os.environ["SPENDWISE_USER_STORE"] = args.user_store
+    os.environ["SPENDWISE_BCRYPT_ROUNDS"] = str(args.rounds)
+    os.environ["SPENDWISE_ANALYTICS_WORKERS"] = "2"
+    from utils import data_utils
+    from benchmarks.synthetic import populate
+
+    if args.data_dir and os.listdir(data_dir):
+        names = sorted(u["username"] for u in data_utils.read_users().values() if u["role"] == "user")
+        print(f"reusing {data_dir} ({len(names)} users)")
+    else:
+        t0 = time.perf_counter()
+        names = populate(args.users, args.expenses, seed=args.seed)
+        print(f"generated {args.users} users x {args.expenses} expenses in {time.perf_counter() - t0:.1f}s ({data_dir})")
+
+    results = {}
+    print(f"{'scenario':<24}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'peak KiB':>10}")
+    for name, fn, iters, mem_iters in scenarios(names, args.iters, args.seed):
+        r = results[name] = measure(fn, iters, mem_iters)
+        print(f"{name:<24}{r['n']:>6}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r['max_ms']:>10.2f}{'-' if r['peak_kb'] is None else r['peak_kb']:>10}")
+    if sys.platform != "win32":
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(f"peak RSS: {rss / 1024 if sys.platform != 'darwin' else rss / 2**20:.0f} MiB")
+
+    path = _baseline_path(args)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"baseline saved: {path}")
+        return 0
+    if not os.path.exists(path):
+        print("no baseline for this configuration; rerun with --save-baseline")
+        return 0
+    with open(path, encoding="utf-8") as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for r in regressions:
+        print("REGRESSION", r)
+    print("ok" if not regressions else f"{len(regressions)} regression(s) vs {path}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
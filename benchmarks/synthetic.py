@@ -0,0 +1,131 @@
+# benchmarks/synthetic.py
+"""
+Seeded synthetic data for benchmarks: N users with M expenses each plus
+feedback, written through the normal data layer into whatever
+SPENDWISE_DATA_DIR points at. Same seed, same data (dates are relative
+to today).
+
+Ledgers follow a rough consumer-spending shape: a category mix dominated by
+food, groceries and transport; log-normal amounts per category; more spend
+on weekends; bills landing on one billing day per user each month; and
+merchant-style descriptions drawn from the categorizer's keyword lists.
+
+    SPENDWISE_DATA_DIR=/tmp/sw python -m benchmarks.synthetic --users 1000 --expenses 500
+"""
+import os
+import time
+import argparse
+import datetime
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.config import CATEGORY_KEYWORDS
+
+# category: (share of transactions, median amount, log-normal sigma)
+PROFILE = {
+    "Food": (0.27, 14.0, 0.6),
+    "Groceries": (0.18, 45.0, 0.5),
+    "Transport": (0.16, 12.0, 0.7),
+    "Shopping": (0.12, 40.0, 1.0),
+    "Entertainment": (0.08, 18.0, 0.8),
+    "Bills": (0.06, 90.0, 0.5),
+    "Health": (0.05, 35.0, 0.9),
+    "Education": (0.03, 60.0, 0.9),
+    "Other": (0.05, 25.0, 1.0),
+}
+# Mon..Sun relative spend frequency
+WEEKDAY_WEIGHTS = np.array([0.9, 0.9, 1.0, 1.0, 1.2, 1.5, 1.3])
+PASSWORD = "Password1"
+
+_CATS = list(PROFILE)
+_SHARE = np.array([PROFILE[c][0] for c in _CATS])
+_SHARE = _SHARE / _SHARE.sum()
+_MEDIAN = np.array([PROFILE[c][1] for c in _CATS])
+_SIGMA = np.array([PROFILE[c][2] for c in _CATS])
+_MERCHANTS = {c: [k.upper() for k in CATEGORY_KEYWORDS.get(c, ["misc"])] for c in _CATS}
+
+
+def ledger(rng: np.random.Generator, n: int, days: int = 365,
+           today: Optional[datetime.date] = None) -> pd.DataFrame:
+    """One user's ledger as a typed frame, ready for `log_expenses_frame`."""
+    today = today or datetime.date.today()
+    span = np.arange(days)
+    day_of = np.datetime64(today, "D") - span
+    weights = WEEKDAY_WEIGHTS[(day_of.astype(np.int64) + 3) % 7]  # 1970-01-01 was a Thursday
+    dates = rng.choice(day_of, size=n, p=weights / weights.sum())
+
+    cat_idx = rng.choice(len(_CATS), size=n, p=_SHARE)
+    amounts = np.round(rng.lognormal(np.log(_MEDIAN[cat_idx]), _SIGMA[cat_idx]), 2)
+
+    bills = cat_idx == _CATS.index("Bills")
+    if bills.any():
+        billing_day = int(rng.integers(1, 29))
+        months = dates[bills].astype("datetime64[M]")
+        dates[bills] = np.minimum(months.astype("datetime64[D]") + (billing_day - 1), day_of[0])
+
+    descriptions = np.empty(n, dtype=object)
+    store_no = rng.integers(1, 400, size=n)
+    for i, cat in enumerate(_CATS):
+        rows = np.flatnonzero(cat_idx == i)
+        names = np.array(_MERCHANTS[cat], dtype=object)[rng.integers(0, len(_MERCHANTS[cat]), size=rows.size)]
+        descriptions[rows] = [f"{m} #{s}" for m, s in zip(names, store_no[rows])]
+
+    order = np.argsort(dates, kind="stable")
+    return pd.DataFrame({
+        "date": pd.to_datetime(dates[order]),
+        "category": np.array(_CATS, dtype=object)[cat_idx[order]],
+        "amount": amounts[order],
+        "description": descriptions[order],
+    })
+
+
+def populate(users: int, expenses: int, feedback: Optional[int] = None, seed: int = 0, days: int = 365):
+    """Write users `user0..`, their ledgers and feedback. Returns the usernames."""
+    from utils import data_utils
+    from utils.auth import hash_password
+
+    rng = np.random.default_rng(seed)
+    names = [f"user{i}" for i in range(users)]
+    pw_hash = hash_password(PASSWORD)  # one hash shared by all; bcrypt per user is the slow part
+    records = [{
+        "username": u, "password_hash": pw_hash, "purpose": "bench", "goal": float(rng.integers(100, 2000)),
+        "role": "user", "activated": True, "email": f"{u}@example.com",
+    } for u in names]
+    records.append({"username": "admin", "password_hash": pw_hash, "role": "admin", "activated": True})
+    put_many = getattr(data_utils._users, "put_many", None)
+    if put_many is not None:
+        put_many(records)
+    else:
+        for r in records:
+            data_utils.write_user(r)
+
+    for u in names:
+        data_utils.log_expenses_frame(u, ledger(rng, expenses, days))
+
+    n_feedback = users if feedback is None else feedback
+    texts = ["Love the tips", "Charts are slow", "Please add budgets", "Great app", ""]
+    for i in range(n_feedback):
+        data_utils.write_feedback(names[i % users], texts[i % len(texts)], int(rng.integers(1, 6)))
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--expenses", type=int, default=500, help="expenses per user")
+    parser.add_argument("--feedback", type=int, default=None, help="feedback rows (default: one per user)")
+    parser.add_argument("--days", type=int, default=365, help="history length")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if not os.getenv("SPENDWISE_DATA_DIR"):
+        parser.error("set SPENDWISE_DATA_DIR to a scratch directory first")
+    t0 = time.perf_counter()
+    populate(args.users, args.expenses, args.feedback, args.seed, args.days)
+    print(f"{args.users} users x {args.expenses} expenses in {time.perf_counter() - t0:.1f}s "
+          f"-> {os.environ['SPENDWISE_DATA_DIR']}")
+
+
+if __name__ == "__main__":
+    main()
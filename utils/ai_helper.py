@@ -1,42 +1,73 @@
 # utils/ai_helper.py
+import os
 import logging
-import cohere
+import threading
 import streamlit as st
 
-COHERE_API_KEY = st.secrets["COHERE_API_KEY"]
+from .config import AI_TIP_BUDGET_S, AI_TIP_CACHE_TTL_S, AI_TIP_CACHE_SIZE
+from .perf import timed
+from .tip_service import TipService
 
-if not COHERE_API_KEY:
-    logging.warning("COHERE_API_KEY not set. AI tips will not work.")
+# The Cohere client is built on the first tip request, not at import time,
+# so pages that never ask for a tip don't pay for secrets lookup or SDK setup.
+_service = None
+_service_error = None
+_service_lock = threading.Lock()
 
-try:
-    co = cohere.Client(COHERE_API_KEY)
-    COHERE_AVAILABLE = True
-except Exception as e:
-    COHERE_AVAILABLE = False
-    logging.error(f"Cohere initialization failed: {e}")
 
+def _api_key() -> str:
+    try:
+        return st.secrets["COHERE_API_KEY"]
+    except Exception:
+        return os.getenv("COHERE_API_KEY", "")
+
+
+def _unavailable() -> str:
+    return "AI tip unavailable. Error: timeout or provider unavailable"
+
+
+def _get_service():
+    global _service, _service_error
+    if _service is not None or _service_error is not None:
+        return _service
+    with _service_lock:
+        if _service is None and _service_error is None:
+            api_key = _api_key()
+            if not api_key:
+                logging.warning("COHERE_API_KEY not set. AI tips will not work.")
+                _service_error = "AI unavailable. Please check your Cohere API key."
+                return None
+            try:
+                import cohere
+                client = cohere.Client(api_key, timeout=AI_TIP_BUDGET_S)
+            except Exception as e:
+                logging.error(f"Cohere initialization failed: {e}")
+                _service_error = "AI unavailable. Cohere not initialized."
+                return None
+            _service = TipService(
+                client,
+                fallback=_unavailable,
+                budget=AI_TIP_BUDGET_S,
+                ttl=AI_TIP_CACHE_TTL_S,
+                maxsize=AI_TIP_CACHE_SIZE,
+            )
+    return _service
 
+
+@timed("ai.suggestion")
 def get_ai_suggestion(prompt: str, context: str = None, temperature: float = 0.7) -> str:
     """Return AI suggestion using Cohere Chat API."""
-    if not COHERE_AVAILABLE:
-        return "AI unavailable. Cohere not initialized."
-    if not COHERE_API_KEY:
-        return "AI unavailable. Please check your Cohere API key."
+    service = _get_service()
+    if service is None:
+        return _service_error
 
     full_prompt = prompt
     if context:
         full_prompt += f"\nUser context: {context}"
 
-    try:
-        response = co.chat(
-            model="command-r-08-2024", 
-            message=full_prompt,
-            temperature=temperature,
-        )
-        return response.text.strip()
-    except cohere.error.CohereError as e:
-        logging.error(f"Cohere Chat API call failed: {e.status_code}, body: {e.body}")
-        return f"AI tip unavailable. Error: {e.status_code}"
-    except Exception as e:
-        logging.error(f"Unexpected Cohere error: {e}")
-        return f"AI tip unavailable. Error: {e}"
+    return service.suggest(full_prompt, temperature=temperature)
+
+
+def tip_service_stats() -> dict:
+    """TipService.stats() for the admin Performance page; empty until the first tip is requested."""
+    return _service.stats() if _service is not None else {}
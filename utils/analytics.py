@@ -0,0 +1,131 @@
+# utils/analytics.py
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .config import ANALYTICS_WORKERS, ANALYTICS_BATCH, ANALYTICS_INLINE_MAX
+from .data_utils import expense_signature, list_expense_users, rollup_cells
+
+Cells = Dict[Tuple[str, str], List[int]]  # (month, category) -> [cents, count]
+
+
+def _flatten(cells: Dict[str, Dict[str, List]]) -> Cells:
+    return {(month, cat): [cents, count] for month, cats in cells.items() for cat, (cents, count) in cats.items()}
+
+
+def ledger_partials(usernames: List[str]) -> List[Tuple[str, object, Cells]]:
+    """
+    Worker task: (username, ledger signature, (month, category) cells) for a
+    batch of users. Reads each user's rollup, which is O(months), rebuilding
+    it from the ledger only when stale.
+    """
+    out = []
+    for username in usernames:
+        sig = expense_signature(username)
+        out.append((username, sig, _flatten(rollup_cells(username))))
+    return out
+
+
+class GlobalAnalytics:
+    """
+    Cross-user spend totals for the admin console.
+
+    Per-user partials are kept keyed on each ledger's signature (size/mtime).
+    A refresh stats every ledger, recomputes only the ones that changed (fanned
+    out over a process pool when there are many) and patches the merged totals
+    by subtracting the old partial and adding the new one. With nothing
+    changed, the previous result is returned as is.
+    """
+
+    def __init__(self, workers: int = ANALYTICS_WORKERS):
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+        self._partials: Dict[str, Tuple[object, Cells, float]] = {}
+        self._merged: Cells = {}
+        self._result = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a threaded Streamlit server is not safe.
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _compute(self, usernames: List[str]):
+        if len(usernames) <= ANALYTICS_INLINE_MAX:
+            return ledger_partials(usernames)
+        batches = [usernames[i:i + ANALYTICS_BATCH] for i in range(0, len(usernames), ANALYTICS_BATCH)]
+        return [p for batch in self._executor().map(ledger_partials, batches) for p in batch]
+
+    def _apply(self, cells: Cells, sign: int):
+        merged = self._merged
+        for key, (cents, count) in cells.items():
+            cell = merged.setdefault(key, [0, 0])
+            cell[0] += sign * cents
+            cell[1] += sign * count
+            if cell[1] <= 0:
+                del merged[key]
+
+    def refresh(self) -> Dict:
+        with self._lock:
+            usernames = list_expense_users()
+            current = {u: expense_signature(u) for u in usernames}
+            removed = [u for u in self._partials if u not in current]
+            changed = [u for u, sig in current.items() if u not in self._partials or self._partials[u][0] != sig]
+            if self._result is not None and not removed and not changed:
+                return self._result
+
+            for u in removed:
+                self._apply(self._partials.pop(u)[1], -1)
+            for username, sig, cells in self._compute(changed):
+                old = self._partials.get(username)
+                if old is not None:
+                    self._apply(old[1], -1)
+                self._apply(cells, +1)
+                self._partials[username] = (sig, cells, sum(a for a, _ in cells.values()))
+            self._result = self._summarize()
+            return self._result
+
+    def _summarize(self) -> Dict:
+        # Cells hold integer cents; dollars only at the edge.
+        by_category: Dict[str, float] = {}
+        by_month: Dict[str, float] = {}
+        for (month, cat), (cents, _count) in self._merged.items():
+            by_category[cat] = by_category.get(cat, 0) + cents
+            if month != "undated":
+                by_month[month] = by_month.get(month, 0) + cents
+        by_category = {k: v / 100 for k, v in by_category.items()}
+        by_month = {k: v / 100 for k, v in by_month.items()}
+        names = list(self._partials)
+        totals = np.array([self._partials[u][2] for u in names], dtype=float) / 100
+        percentiles = {}
+        top = []
+        if len(totals):
+            for p in (50, 75, 90, 99):
+                percentiles[f"p{p}"] = round(float(np.percentile(totals, p)), 2)
+            for i in np.argsort(totals)[::-1][:10]:
+                top.append({"username": names[i], "total": round(float(totals[i]), 2)})
+        return {
+            "users": len(names),
+            "total": round(float(totals.sum()), 2) if len(totals) else 0.0,
+            "rows": int(sum(c for _, c in self._merged.values())),
+            "by_category": dict(sorted(by_category.items(), key=lambda kv: kv[1], reverse=True)),
+            "by_month": dict(sorted(by_month.items())),
+            "user_percentiles": percentiles,
+            "top_users": top,
+        }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def global_analytics() -> Dict:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = GlobalAnalytics()
+    return _engine.refresh()
@@ -0,0 +1,238 @@
+# utils/api.py
+"""
+HTTP API over data_utils for scripts and integrations, without Streamlit
+reruns. An ASGI app (Starlette); serve it with
+
+    ./spendwise serve --port 8600        # or: uvicorn utils.api:app --port 8600
+
+It opens the same data directory and goes through the same stores as the
+app: ledgers, rollups, insights and the manifest stay consistent whichever
+side writes. Blocking data-layer calls run in the threadpool, so the event
+loop keeps accepting requests.
+
+Authenticate with POST /v1/token, then send `Authorization: Bearer <token>`
+(the app's session token). Admins may add `?user=<name>` to act for anyone.
+
+    POST /v1/token              {"username", "password"} -> {"token", "role"}
+    POST /v1/expenses           {"expenses": [{"date", "category", "amount", "description"}, ...]}
+    GET  /v1/expenses           ?start&end (exclusive)&category&sort&desc&limit&offset
+    GET  /v1/totals             ?since=YYYY-MM-DD  (by category)
+    GET  /v1/monthly
+    GET  /v1/forecast
+    GET  /v1/insights
+    GET  /v1/export             ?format=csv|csv.gz|parquet, streamed
+    GET  /v1/admin/analytics
+    GET  /v1/admin/ledgers      ?limit
+    GET  /v1/health
+"""
+import json
+import datetime
+import functools
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from . import data_utils
+from .auth import authenticate, issue_session_token, verify_session_token
+from .config import API_MAX_BATCH, SESSION_TTL_S
+from .perf import timer
+
+
+def _plain(value):
+    # numpy scalars from the aggregates
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class _JSON(JSONResponse):
+    def render(self, content) -> bytes:
+        return json.dumps(content, default=_plain, separators=(",", ":")).encode("utf-8")
+
+
+def _error(status: int, message: str) -> JSONResponse:
+    return _JSON({"error": message}, status_code=status)
+
+
+class _HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _date(request: Request, name: str):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be YYYY-MM-DD")
+
+
+def _int(request: Request, name: str, default: int, lo: int = 0, hi: int = 10000) -> int:
+    try:
+        value = int(request.query_params.get(name, default))
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if not lo <= value <= hi:
+        raise ValueError(f"{name} must be between {lo} and {hi}")
+    return value
+
+
+def _records(df):
+    """Display frame -> JSON rows with ISO dates."""
+    return [
+        {"date": d.isoformat() if isinstance(d, datetime.date) and d == d else None,  # NaT != NaT
+         "category": c, "amount": a, "description": t}
+        for d, c, a, t in zip(df['date'], df['category'], df['amount'].tolist(), df['description'])
+    ]
+
+
+def endpoint(op: str, admin: bool = False):
+    """
+    Wrap a handler `fn(request, username)`: check the bearer token, resolve
+    the user acted for, time the call as `api.<op>` and map ValueError to 400.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def handler(request: Request):
+            with timer(f"api.{op}"):
+                auth = request.headers.get("authorization", "")
+                session = verify_session_token(auth[7:] if auth[:7].lower() == "bearer " else "")
+                if session is None:
+                    return _error(401, "missing or invalid token")
+                if admin and session["role"] != "admin":
+                    return _error(403, "admin only")
+                username = request.query_params.get("user") or session["username"]
+                if username != session["username"]:
+                    if session["role"] != "admin":
+                        return _error(403, "only admins may act for other users")
+                    if not await run_in_threadpool(data_utils.user_exists, username):
+                        return _error(404, f"no such user: {username}")
+                try:
+                    return await fn(request, username)
+                except _HTTPError as e:
+                    return _error(e.status, str(e))
+                except ValueError as e:
+                    return _error(400, str(e))
+        return handler
+    return decorate
+
+
+async def health(request: Request):
+    return _JSON({"ok": True})
+
+
+async def token(request: Request):
+    with timer("api.token"):
+        try:
+            body = await request.json()
+            username, password = str(body["username"]), str(body["password"])
+        except (ValueError, KeyError, TypeError):
+            return _error(400, 'expected {"username": ..., "password": ...}')
+        result = await run_in_threadpool(authenticate, username, password)
+        if not result.ok:
+            return _error(401, "account not activated" if result.reason == "not_activated" else "invalid credentials")
+        role = result.user["role"]
+        return _JSON({"token": issue_session_token(username, role), "role": role, "expires_in": SESSION_TTL_S})
+
+
+@endpoint("expenses.log")
+async def log_expenses(request: Request, username: str):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise ValueError("body must be JSON")
+    records = body.get("expenses") if isinstance(body, dict) else body
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        raise ValueError('expected {"expenses": [{"date", "category", "amount", "description"}, ...]}')
+    if len(records) > API_MAX_BATCH:
+        raise _HTTPError(413, f"at most {API_MAX_BATCH} expenses per request")
+    logged = await run_in_threadpool(data_utils.log_expenses, username, records)
+    return _JSON({"logged": logged}, status_code=201)
+
+
+@endpoint("expenses.query")
+async def query_expenses(request: Request, username: str):
+    start, end = _date(request, "start"), _date(request, "end")
+    categories = request.query_params.getlist("category") or None
+    sort = request.query_params.get("sort", "date")
+    if sort not in ("date", "amount"):
+        raise ValueError("sort must be date or amount")
+    descending = request.query_params.get("desc", "1") != "0"
+    limit, offset = _int(request, "limit", 50), _int(request, "offset", 0, hi=10**9)
+    rows, total = await run_in_threadpool(
+        data_utils.query_expenses, username, start, end, categories, sort, descending, limit, offset,
+    )
+    return _JSON({"total": total, "expenses": _records(rows)})
+
+
+@endpoint("totals")
+async def totals(request: Request, username: str):
+    since = _date(request, "since")
+    by_category = await run_in_threadpool(data_utils.totals_by_category, username, since)
+    return _JSON({
+        "since": since.isoformat() if since else None,
+        "total": round(sum(by_category.values()), 2),
+        "by_category": by_category,
+    })
+
+
+@endpoint("monthly")
+async def monthly(request: Request, username: str):
+    return _JSON({"monthly": await run_in_threadpool(data_utils.monthly_totals, username)})
+
+
+@endpoint("forecast")
+async def forecast(request: Request, username: str):
+    from .forecast import month_forecast
+    return _JSON(await run_in_threadpool(month_forecast, username))
+
+
+@endpoint("insights")
+async def insights(request: Request, username: str):
+    result = await run_in_threadpool(data_utils.spending_insights, username)
+    return _JSON(result)
+
+
+@endpoint("export")
+async def export(request: Request, username: str):
+    from . import exports
+    fmt = request.query_params.get("format", "csv")
+    if fmt not in exports.formats():
+        raise ValueError(f"format must be one of {', '.join(exports.formats())}")
+    return StreamingResponse(
+        exports.expenses(username, fmt), media_type=exports.mime(fmt),
+        headers={"Content-Disposition": f'attachment; filename="{exports.file_name(f"{username}_expenses", fmt)}"'},
+    )
+
+
+@endpoint("admin.analytics", admin=True)
+async def admin_analytics(request: Request, username: str):
+    from .analytics import global_analytics
+    return _JSON(await run_in_threadpool(global_analytics))
+
+
+@endpoint("admin.ledgers", admin=True)
+async def admin_ledgers(request: Request, username: str):
+    limit = _int(request, "limit", 100)
+    return _JSON(await run_in_threadpool(data_utils.ledger_manifest, limit))
+
+
+app = Starlette(routes=[
+    Route("/v1/health", health),
+    Route("/v1/token", token, methods=["POST"]),
+    Route("/v1/expenses", log_expenses, methods=["POST"]),
+    Route("/v1/expenses", query_expenses, methods=["GET"]),
+    Route("/v1/totals", totals),
+    Route("/v1/monthly", monthly),
+    Route("/v1/forecast", forecast),
+    Route("/v1/insights", insights),
+    Route("/v1/export", export),
+    Route("/v1/admin/analytics", admin_analytics),
+    Route("/v1/admin/ledgers", admin_ledgers),
+])
@@ -0,0 +1,162 @@
+# utils/auth.py
+import os
+import hmac
+import time
+import base64
+import hashlib
+import secrets
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, NamedTuple, Optional
+
+import bcrypt
+
+from .config import BCRYPT_ROUNDS, BCRYPT_WORKERS, SESSION_TTL_S
+from .data_utils import DATA_DIR, get_user, write_user
+from .file_io import file_lock
+from .perf import timer
+
+SESSION_KEY_PATH = os.path.join(DATA_DIR, "session.key")
+KEY_BYTES = 32  # shortest HMAC key accepted, from the env or the key file
+
+# bcrypt releases the GIL, so a small pool lets a login hash in the
+# background while other sessions' reruns keep running, and caps how many
+# CPU-heavy hashes can run at once.
+_bcrypt_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+
+_secret = None
+_secret_lock = threading.Lock()
+
+
+class AuthResult(NamedTuple):
+    ok: bool
+    reason: str  # "ok", "not_found", "not_activated", "invalid"
+    user: Optional[Dict]
+
+
+def _read_key() -> Optional[bytes]:
+    try:
+        with open(SESSION_KEY_PATH, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _publish_key():
+    # Written and fsynced under a temp name, then linked into place: the key
+    # file never exists half-written, and a process that loses the race to
+    # link just reads the winner's key.
+    fd, tmp = tempfile.mkstemp(prefix="session.key.", suffix=".tmp", dir=os.path.dirname(SESSION_KEY_PATH))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(secrets.token_bytes(KEY_BYTES))
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.link(tmp, SESSION_KEY_PATH)
+        except FileExistsError:
+            pass
+    finally:
+        os.unlink(tmp)
+
+
+def _session_secret() -> bytes:
+    """HMAC key shared by every server process: env var, else a key file created once. Never shorter than KEY_BYTES."""
+    global _secret
+    if _secret is None:
+        with _secret_lock:
+            if _secret is None:
+                env = os.getenv("SPENDWISE_SESSION_SECRET")
+                if env:
+                    if len(env.encode("utf-8")) < KEY_BYTES:
+                        raise RuntimeError(f"SPENDWISE_SESSION_SECRET must be at least {KEY_BYTES} bytes")
+                    _secret = env.encode("utf-8")
+                    return _secret
+                for _ in range(3):
+                    key = _read_key()
+                    if key is not None and len(key) >= KEY_BYTES:
+                        _secret = key
+                        return _secret
+                    if key is not None:
+                        # Short or empty: left by an older build that crashed
+                        # between creating and writing it. Replace it.
+                        with file_lock(SESSION_KEY_PATH):
+                            key = _read_key()
+                            if key is not None and len(key) < KEY_BYTES:
+                                os.unlink(SESSION_KEY_PATH)
+                    _publish_key()
+                raise RuntimeError(f"could not establish a session key in {SESSION_KEY_PATH}")
+    return _secret
+
+
+def hash_rounds(password_hash: str) -> int:
+    """Cost factor encoded in a $2b$NN$ hash, or 0 if unparseable."""
+    try:
+        return int(password_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+def check_password(password: str, password_hash: str) -> bool:
+    def _check():
+        try:
+            return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
+        except Exception:
+            return False
+    # Includes time queued for a pool worker, which is what a login waits on.
+    with timer("auth.bcrypt_verify"):
+        return _bcrypt_pool.submit(_check).result()
+
+
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    def _hash():
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+    with timer("auth.bcrypt_hash"):
+        return _bcrypt_pool.submit(_hash).result()
+
+
+def authenticate(username: str, password: str) -> AuthResult:
+    """Resolve the user once, then verify the password off the script thread."""
+    user = get_user(username)
+    if user is None:
+        return AuthResult(False, "not_found", None)
+    if not user.get("activated", False):
+        return AuthResult(False, "not_activated", user)
+    if not check_password(password, user.get("password_hash", "")):
+        return AuthResult(False, "invalid", user)
+    if hash_rounds(user["password_hash"]) != BCRYPT_ROUNDS:
+        # Cost setting changed since this hash was made; upgrade it now that
+        # we hold the plaintext.
+        user = {**user, "password_hash": hash_password(password), "salt": ""}
+        write_user(user)
+    return AuthResult(True, "ok", user)
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def issue_session_token(username: str, role: str, ttl: int = SESSION_TTL_S) -> str:
+    payload = f"{username}|{role}|{int(time.time()) + ttl}"
+    sig = hmac.new(_session_secret(), payload.encode("utf-8"), hashlib.sha256).digest()
+    return f"{_b64(payload.encode('utf-8'))}.{_b64(sig)}"
+
+
+def verify_session_token(token: str) -> Optional[Dict]:
+    """Return {'username', 'role'} for a valid unexpired token, else None. No storage reads."""
+    if not token or "." not in token:
+        return None
+    body, sig = token.split(".", 1)
+    try:
+        payload = base64.urlsafe_b64decode(body + "=" * (-len(body) % 4))
+        given = base64.urlsafe_b64decode(sig + "=" * (-len(sig) % 4))
+    except ValueError:
+        return None
+    expected = hmac.new(_session_secret(), payload, hashlib.sha256).digest()
+    if not hmac.compare_digest(expected, given):
+        return None
+    username, role, expires = payload.decode("utf-8").rsplit("|", 2)
+    if int(expires) < time.time():
+        return None
+    return {"username": username, "role": role}
@@ -0,0 +1,107 @@
+# utils/categorizer.py
+import os
+import re
+import json
+import threading
+from typing import Dict, Optional
+
+import pandas as pd
+from cachetools import LRUCache
+
+from .config import CATEGORIES, CATEGORY_KEYWORDS
+from .data_utils import user_path
+from .file_io import atomic_write, file_lock
+
+DEFAULT_CATEGORY = "Other"
+
+# token -> category, and one alternation regex so a whole batch is matched in
+# a single vectorized str.extract pass.
+KEYWORD_INDEX: Dict[str, str] = {
+    kw: cat for cat, kws in CATEGORY_KEYWORDS.items() for kw in kws
+}
+_KEYWORD_RE = re.compile(
+    r"\b(" + "|".join(sorted(map(re.escape, KEYWORD_INDEX), key=len, reverse=True)) + r")\b"
+)
+
+_merchant_cache = LRUCache(maxsize=100000)
+_overrides = LRUCache(maxsize=1024)
+_lock = threading.Lock()
+
+
+def merchant_keys(descriptions: pd.Series) -> pd.Series:
+    """'STARBUCKS #1234 Seattle' -> 'starbucks seattle': letters only, so store numbers collapse."""
+    return (descriptions.astype(str).str.lower()
+            .str.replace(r"[^a-z]+", " ", regex=True)
+            .str.strip())
+
+
+def _overrides_path(username: str) -> str:
+    return user_path(username, "_category_overrides.json")
+
+
+def user_overrides(username: str) -> Dict[str, str]:
+    path = _overrides_path(username)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return {}
+    # Rewrites are renames, so the inode tells apart saves within one mtime tick.
+    version = (st.st_ino, st.st_mtime_ns)
+    with _lock:
+        cached = _overrides.get(username)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    with open(path, encoding="utf-8") as f:
+        table = json.load(f)
+    with _lock:
+        _overrides[username] = (version, table)
+    return table
+
+
+def learn_category(username: str, description: str, category: str):
+    """Remember a user's choice so future imports of the same merchant follow it."""
+    key = merchant_keys(pd.Series([description])).iloc[0]
+    if not key or category not in CATEGORIES:
+        return
+    path = _overrides_path(username)
+    with file_lock(path):
+        table = dict(user_overrides(username))
+        if table.get(key) == category:
+            return
+        table[key] = category
+        with atomic_write(path, encoding="utf-8") as f:
+            json.dump(table, f)
+
+
+def _keyword_categories(keys: pd.Series) -> pd.Series:
+    matched = keys.str.extract(_KEYWORD_RE, expand=False)
+    return matched.map(KEYWORD_INDEX).fillna(DEFAULT_CATEGORY)
+
+
+def categorize(descriptions: pd.Series, username: Optional[str] = None) -> pd.Series:
+    """
+    Categorize a batch of descriptions. Per-user overrides win, then the
+    merchant cache, then the keyword index for whatever is still unknown.
+    Work is done once per distinct merchant, not per row.
+    """
+    keys = merchant_keys(descriptions)
+    unique = pd.Series(keys.unique())
+
+    with _lock:
+        known = {k: _merchant_cache[k] for k in unique if k in _merchant_cache}
+    misses = unique[~unique.isin(known.keys())]
+    if not misses.empty:
+        fresh = dict(zip(misses, _keyword_categories(misses)))
+        with _lock:
+            for k, cat in fresh.items():
+                _merchant_cache[k] = cat
+        known.update(fresh)
+
+    if username is not None:
+        known.update({k: v for k, v in user_overrides(username).items() if k in known})
+    return pd.Series(keys.map(known).to_numpy(), index=descriptions.index)
+
+
+def categorize_frame(username: str, df: pd.DataFrame) -> pd.Series:
+    """Adapter for importer.import_statement(categorize=...)."""
+    return categorize(df["description"], username)
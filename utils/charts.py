@@ -0,0 +1,114 @@
+# utils/charts.py
+import io
+import json
+import hashlib
+import threading
+from typing import Dict, Tuple
+
+from cachetools import LRUCache
+
+from .config import CHART_CACHE_SIZE, SHARED_CACHE_WARM
+from .perf import incr, timed
+
+_cache = LRUCache(maxsize=CHART_CACHE_SIZE)
+_lock = threading.Lock()
+hits = 0
+misses = 0
+_warmed = False
+
+
+def totals_hash(totals: Dict[str, float]) -> str:
+    return hashlib.sha1(json.dumps(sorted(totals.items())).encode("utf-8")).hexdigest()
+
+
+@timed("chart.render")
+def _render(kind: str, totals: Dict[str, float], title: str, fmt: str) -> bytes:
+    # Figure() directly rather than pyplot: nothing is registered in pyplot's
+    # global figure manager, so nothing can leak if a caller forgets to close.
+    from matplotlib.figure import Figure
+    cats = list(totals.keys())
+    vals = [totals[k] for k in cats]
+    if kind == "bar":
+        fig = Figure(figsize=(5, 3))
+        ax = fig.subplots()
+        ax.bar(cats, vals)
+        ax.tick_params(axis="x", labelrotation=30)
+    else:
+        fig = Figure(figsize=(4, 4))
+        ax = fig.subplots()
+        ax.pie(vals, labels=cats, autopct="%1.1f%%", startangle=90)
+    ax.set_title(title)
+    fig.tight_layout()
+    buf = io.BytesIO()
+    try:
+        fig.savefig(buf, format=fmt)
+    finally:
+        fig.clear()
+    return buf.getvalue()
+
+
+def category_chart(username: str, period: str, kind: str, totals: Dict[str, float], title: str,
+                   fmt: str = "png") -> bytes:
+    """
+    PNG/SVG bytes for a bar or pie chart of `totals`, rendered once per
+    (user, period, kind, format, totals hash) and served from an LRU cache
+    afterwards, and from the shared cache by every other worker.
+    """
+    global hits, misses
+    if not _warmed:
+        warm(SHARED_CACHE_WARM)
+    key = (username, period, kind, fmt, totals_hash(totals))
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            hits += 1
+            incr("chart.cache_hit")
+            return cached
+        misses += 1
+    incr("chart.cache_miss")
+    shared = _shared()
+    # The totals hash is the version: a chart of other totals is another entry.
+    name = "|".join(key[:4])
+    data = shared.get("chart", name, key[4]) if shared is not None else None
+    if data is None:
+        data = _render(kind, totals, title, fmt)
+        if shared is not None:
+            shared.put("chart", name, data, key[4], owner=username)
+    with _lock:
+        _cache[key] = data
+    return data
+
+
+def _shared():
+    from .data_utils import shared_cache
+    return shared_cache()
+
+
+def warm(limit: int) -> int:
+    """
+    Fill this process's cache with the most recently used shared charts, so
+    a fresh worker starts where its siblings are. Runs on first use; returns
+    entries loaded.
+    """
+    global _warmed
+    _warmed = True
+    shared = _shared()
+    if shared is None:
+        return 0
+    rows = shared.hottest("chart", limit)
+    with _lock:
+        for name, version, data in rows:
+            _cache.setdefault((*name.rsplit("|", 3), version), data)
+    return len(rows)
+
+
+def category_charts(username: str, period: str, totals: Dict[str, float], fmt: str = "png") -> Tuple[bytes, bytes]:
+    return (
+        category_chart(username, period, "bar", totals, f"Spending by category ({period})", fmt),
+        category_chart(username, period, "pie", totals, "Spending distribution", fmt),
+    )
+
+
+def cache_stats() -> Dict:
+    with _lock:
+        return {"hits": hits, "misses": misses, "entries": len(_cache)}
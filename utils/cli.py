@@ -0,0 +1,195 @@
+# utils/cli.py
+"""
+`spendwise` command line: the data_utils operations without the app, on
+the same data directory (SPENDWISE_DATA_DIR), plus `serve` for the HTTP API.
+
+    ./spendwise log alice 2024-05-01 Food 12.50 "Lunch"
+    ./spendwise log alice --file expenses.jsonl     # one JSON object per line, one batched write
+    ./spendwise import alice statement.csv
+    ./spendwise expenses alice --start 2024-05-01 --limit 20
+    ./spendwise totals alice --since 2024-05-01
+    ./spendwise monthly alice
+    ./spendwise forecast alice
+    ./spendwise export alice -o alice.csv.gz --format csv.gz
+    ./spendwise export-all --format parquet        # every ledger into one tar archive
+    ./spendwise users
+    ./spendwise serve --port 8600 --workers 4
+"""
+import sys
+import json
+import argparse
+import datetime
+from contextlib import nullcontext
+
+from .config import API_HOST, API_PORT
+
+
+def _date(value: str) -> datetime.date:
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {value!r}")
+
+
+def _print_json(data):
+    json.dump(data, sys.stdout, indent=2, default=lambda v: v.item() if hasattr(v, "item") else str(v))
+    sys.stdout.write("\n")
+
+
+def cmd_log(args):
+    from .data_utils import log_expenses
+    if args.file:
+        f = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+        with f:
+            records = [json.loads(line) for line in f if line.strip()]
+    elif args.date and args.category and args.amount is not None:
+        records = [{"date": args.date, "category": args.category, "amount": args.amount,
+                    "description": args.description or ""}]
+    else:
+        raise SystemExit("log: give DATE CATEGORY AMOUNT [DESCRIPTION], or --file")
+    try:
+        print(f"logged {log_expenses(args.username, records)} expenses")
+    except ValueError as e:
+        raise SystemExit(f"log: {e}")
+
+
+def cmd_import(args):
+    from .importer import import_statement
+    fmt = args.format or args.path.rsplit(".", 1)[-1].lower()
+    with open(args.path, "rb") as f:
+        report = import_statement(args.username, f, fmt=fmt, signed=args.signed, dayfirst=args.dayfirst)
+    _print_json(report)
+
+
+def cmd_expenses(args):
+    from .data_utils import query_expenses
+    end = args.end + datetime.timedelta(days=1) if args.end else None  # inclusive on the command line
+    rows, total = query_expenses(args.username, args.start, end, args.category, args.sort,
+                                 not args.ascending, args.limit, args.offset)
+    rows.to_csv(sys.stdout, index=False)
+    print(f"{len(rows)} of {total} matching expenses", file=sys.stderr)
+
+
+def cmd_totals(args):
+    from .data_utils import totals_by_category
+    _print_json(totals_by_category(args.username, args.since))
+
+
+def cmd_monthly(args):
+    from .data_utils import monthly_totals
+    _print_json(monthly_totals(args.username))
+
+
+def cmd_forecast(args):
+    from .forecast import month_forecast
+    _print_json(month_forecast(args.username))
+
+
+def cmd_insights(args):
+    from .data_utils import spending_insights
+    _print_json(spending_insights(args.username))
+
+
+def cmd_export(args):
+    from . import exports
+    out = nullcontext(sys.stdout.buffer) if args.output == "-" else open(args.output, "wb")
+    with out as f:
+        for chunk in exports.expenses(args.username, args.format):
+            f.write(chunk)
+
+
+def cmd_export_all(args):
+    from . import exports
+    exports.start_export_all(args.format)
+    status = exports.follow()
+    if status["state"] != "done":
+        raise SystemExit(status["error"] or status["state"])
+    print(status["path"])
+
+
+def cmd_users(args):
+    from .data_utils import list_expense_users
+    for u in list_expense_users():
+        print(u)
+
+
+def cmd_serve(args):
+    import uvicorn
+    uvicorn.run("utils.api:app", host=args.host, port=args.port, workers=args.workers,
+                log_level=args.log_level, access_log=args.access_log)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="spendwise", description="Spendwise data from the command line.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("log", help="log one expense, or a batch from --file")
+    p.add_argument("username")
+    p.add_argument("date", nargs="?")
+    p.add_argument("category", nargs="?")
+    p.add_argument("amount", nargs="?", type=float)
+    p.add_argument("description", nargs="?")
+    p.add_argument("--file", help="JSON lines of {date, category, amount, description}; - for stdin")
+    p.set_defaults(fn=cmd_log)
+
+    p = sub.add_parser("import", help="import a bank statement (CSV/OFX)")
+    p.add_argument("username")
+    p.add_argument("path")
+    p.add_argument("--format", choices=["csv", "ofx", "qfx"], help="default: from file extension")
+    p.add_argument("--signed", action="store_true", help="negative amounts are spending; drop credits")
+    p.add_argument("--dayfirst", action="store_true", help="parse 03/04/2024 as 3 April")
+    p.set_defaults(fn=cmd_import)
+
+    p = sub.add_parser("expenses", help="one page of expenses as CSV")
+    p.add_argument("username")
+    p.add_argument("--start", type=_date)
+    p.add_argument("--end", type=_date, help="inclusive")
+    p.add_argument("--category", action="append")
+    p.add_argument("--sort", choices=["date", "amount"], default="date")
+    p.add_argument("--ascending", action="store_true")
+    p.add_argument("--limit", type=int, default=50)
+    p.add_argument("--offset", type=int, default=0)
+    p.set_defaults(fn=cmd_expenses)
+
+    p = sub.add_parser("totals", help="spend by category")
+    p.add_argument("username")
+    p.add_argument("--since", type=_date)
+    p.set_defaults(fn=cmd_totals)
+
+    for name, fn, text in [("monthly", cmd_monthly, "spend per month"),
+                           ("forecast", cmd_forecast, "month-end forecast"),
+                           ("insights", cmd_insights, "recurring charges and unusual expenses")]:
+        p = sub.add_parser(name, help=text)
+        p.add_argument("username")
+        p.set_defaults(fn=fn)
+
+    p = sub.add_parser("export", help="whole ledger, streamed")
+    p.add_argument("username")
+    p.add_argument("-o", "--output", default="-")
+    p.add_argument("--format", choices=["csv", "csv.gz", "parquet"], default="csv")
+    p.set_defaults(fn=cmd_export)
+
+    p = sub.add_parser("export-all", help="every ledger into a tar archive under DATA_DIR/exports")
+    p.add_argument("--format", choices=["csv", "csv.gz", "parquet"], default="csv.gz")
+    p.set_defaults(fn=cmd_export_all)
+
+    p = sub.add_parser("users", help="users with a ledger")
+    p.set_defaults(fn=cmd_users)
+
+    p = sub.add_parser("serve", help="run the HTTP API (utils/api.py)")
+    p.add_argument("--host", default=API_HOST)
+    p.add_argument("--port", type=int, default=API_PORT)
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--log-level", default="warning")
+    p.add_argument("--access-log", action="store_true")
+    p.set_defaults(fn=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()
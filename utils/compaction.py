@@ -0,0 +1,122 @@
+# utils/compaction.py
+"""
+Snapshot-plus-delta compaction for CSV expense ledgers.
+
+Ledgers only ever grow, and a cold read (a ledger cache miss: a new
+process, an evicted user) used to parse the CSV from its first line. A
+compaction writes the parsed ledger as typed arrays to
+`<username>_expenses.snap` next to it, with the byte offset it covers. Cold
+reads then load the snapshot and parse only the CSV appended since.
+
+Snapshots are swapped in with atomic_write, so a crash leaves the previous
+snapshot or the new one. Because the ledger is append-only, a snapshot of a
+prefix stays correct as the ledger grows; each one also fingerprints the
+bytes before its checkpoint and is ignored, falling back to a full parse,
+if the ledger was replaced. The manifest records each ledger's checkpoint.
+
+The background job (`start_compactor`) wakes every COMPACT_INTERVAL_S and
+compacts up to COMPACT_BATCH ledgers with COMPACT_MIN_DELTA_BYTES or more
+past their checkpoint, hottest and largest first (compaction_candidates).
+Partitioned ledgers are stored typed already and are left alone.
+
+    python -m utils.compaction                    # one pass over every ledger due
+    python -m utils.compaction --user alice       # just these users, due or not
+    python -m utils.compaction --min-bytes 0      # snapshot every ledger
+"""
+import time
+import logging
+import argparse
+import threading
+from typing import Dict, Optional
+
+from .config import COMPACT_BATCH, COMPACT_INTERVAL_S, COMPACT_MIN_DELTA_BYTES, EXPENSE_BACKEND
+from .perf import incr, timer
+
+log = logging.getLogger(__name__)
+
+
+def compact_pass(limit: int = COMPACT_BATCH, min_bytes: int = COMPACT_MIN_DELTA_BYTES) -> Dict:
+    """Compact up to `limit` due ledgers; returns counts and bytes checkpointed."""
+    from .data_utils import compact_ledger, compaction_candidates
+    done = {"ledgers": 0, "bytes": 0, "failed": 0}
+    for entry in compaction_candidates(min_bytes, limit):
+        try:
+            with timer("ledger.compact"):
+                done["bytes"] += compact_ledger(entry["username"])
+            done["ledgers"] += 1
+        except Exception:
+            log.exception("compaction of %s failed", entry["username"])
+            done["failed"] += 1
+    incr("ledger.compactions", done["ledgers"])
+    return done
+
+
+class Compactor:
+    """Runs compact_pass on a background thread every `interval` seconds."""
+
+    def __init__(self, interval: float = COMPACT_INTERVAL_S, batch: int = COMPACT_BATCH,
+                 min_bytes: int = COMPACT_MIN_DELTA_BYTES):
+        self.interval = interval
+        self.batch = batch
+        self.min_bytes = min_bytes
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                done = compact_pass(self.batch, self.min_bytes)
+                if done["ledgers"]:
+                    log.info("compacted %d ledgers (%d bytes checkpointed)", done["ledgers"], done["bytes"])
+            except Exception:
+                log.exception("compaction pass failed")
+
+    def start(self) -> "Compactor":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ledger-compactor", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+_compactor = None
+_compactor_lock = threading.Lock()
+
+
+def start_compactor() -> Optional[Compactor]:
+    """This process's background compactor, started on first call; None for partitioned ledgers."""
+    global _compactor
+    if EXPENSE_BACKEND != "csv" or COMPACT_INTERVAL_S <= 0:
+        return None
+    with _compactor_lock:
+        if _compactor is None:
+            _compactor = Compactor().start()
+    return _compactor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot CSV expense ledgers so cold reads parse only the new tail.")
+    parser.add_argument("--user", action="append", help="compact these users regardless of size")
+    parser.add_argument("--min-bytes", type=int, default=COMPACT_MIN_DELTA_BYTES,
+                        help="bytes appended since the last snapshot before a ledger is due")
+    parser.add_argument("--limit", type=int, default=1 << 30, help="at most this many ledgers, hottest and largest first")
+    args = parser.parse_args()
+    if EXPENSE_BACKEND != "csv":
+        parser.error("compaction applies to the csv expense backend only")
+    from .data_utils import compact_ledger
+
+    t0 = time.perf_counter()
+    if args.user:
+        total = {"ledgers": len(args.user), "bytes": sum(compact_ledger(u) for u in args.user), "failed": 0}
+    else:
+        total = compact_pass(args.limit, max(1, args.min_bytes))
+    print(f"compacted {total['ledgers']} ledgers, {total['bytes']:,} bytes checkpointed, "
+          f"{total['failed']} failed in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
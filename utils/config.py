@@ -1,3 +1,5 @@
+import os
+
 CATEGORIES = [
     "Food",
     "Transport",
@@ -8,4 +10,123 @@ CATEGORIES = [
     "Education",
     "Shopping",
     "Other"
-]
\ No newline at end of file
+]
+
+# Largest amount one expense may hold. Stored as int64 cents, so even
+# millions of rows at this size sum far inside int64.
+MAX_EXPENSE_AMOUNT = 1_000_000_000.0
+
+# Storage backends
+USER_STORE_BACKEND = os.getenv("SPENDWISE_USER_STORE", "sqlite")  # "sqlite" or "csv"
+EXPENSE_BACKEND = os.getenv("SPENDWISE_EXPENSE_BACKEND", "csv")  # "csv" or "partitioned"
+
+# Per-user files: "sharded" (DATA_DIR/shards/<xx>/, see utils/shards.py) or
+# "flat" (all in DATA_DIR, the original layout)
+DATA_LAYOUT = os.getenv("SPENDWISE_DATA_LAYOUT", "sharded")
+
+# Parsed-ledger cache budget, in rows across all users
+LEDGER_CACHE_MAX_ROWS = int(os.getenv("SPENDWISE_LEDGER_CACHE_ROWS", "5000000"))
+
+# Ledger compaction (utils/compaction.py): every COMPACT_INTERVAL_S the
+# background job snapshots up to COMPACT_BATCH CSV ledgers that have at least
+# COMPACT_MIN_DELTA_BYTES appended since their last snapshot.
+COMPACT_INTERVAL_S = float(os.getenv("SPENDWISE_COMPACT_INTERVAL_S", "300"))
+COMPACT_MIN_DELTA_BYTES = int(os.getenv("SPENDWISE_COMPACT_MIN_DELTA_BYTES", str(256 << 10)))
+COMPACT_BATCH = int(os.getenv("SPENDWISE_COMPACT_BATCH", "20"))
+
+# Cache shared by all server processes on the host (utils/shared_cache.py):
+# charts, forecasts and CSV user records, bounded in size, and how many of
+# its most recently used entries a starting worker preloads.
+SHARED_CACHE_ENABLED = os.getenv("SPENDWISE_SHARED_CACHE", "1") != "0"
+SHARED_CACHE_MAX_BYTES = int(os.getenv("SPENDWISE_SHARED_CACHE_MB", "256")) << 20
+SHARED_CACHE_WARM = int(os.getenv("SPENDWISE_SHARED_CACHE_WARM", "256"))
+
+# fsync appends (once per group commit) and atomic rewrites. Turning it off
+# trades crash durability for write latency, e.g. on throwaway benchmark dirs.
+STORAGE_FSYNC = os.getenv("SPENDWISE_FSYNC", "1") != "0"
+
+# AI tips
+AI_TIP_BUDGET_S = float(os.getenv("SPENDWISE_AI_TIP_BUDGET_S", "8"))
+AI_TIP_CACHE_TTL_S = float(os.getenv("SPENDWISE_AI_TIP_CACHE_TTL_S", "3600"))
+AI_TIP_CACHE_SIZE = int(os.getenv("SPENDWISE_AI_TIP_CACHE_SIZE", "1024"))
+
+# Auth
+BCRYPT_ROUNDS = int(os.getenv("SPENDWISE_BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.getenv("SPENDWISE_BCRYPT_WORKERS", "4"))
+SESSION_TTL_S = int(os.getenv("SPENDWISE_SESSION_TTL_S", str(7 * 24 * 3600)))
+
+# Keyword/merchant index used to auto-categorize imported descriptions.
+# Matched as whole words against the lowercased description; first match wins.
+CATEGORY_KEYWORDS = {
+    "Food": ["restaurant", "cafe", "coffee", "starbucks", "mcdonalds", "burger", "pizza", "sushi",
+             "lunch", "dinner", "breakfast", "bakery", "deliveroo", "doordash", "ubereats", "grubhub", "kfc", "subway"],
+    "Transport": ["uber", "lyft", "taxi", "bus", "metro", "train", "rail", "fuel", "gas", "petrol",
+                  "shell", "parking", "toll", "airline", "flight"],
+    "Entertainment": ["netflix", "spotify", "cinema", "movie", "theatre", "concert", "steam", "playstation",
+                      "xbox", "hulu", "disney", "ticketmaster"],
+    "Groceries": ["grocery", "groceries", "supermarket", "walmart", "costco", "aldi", "lidl", "tesco",
+                  "safeway", "kroger", "wholefoods", "trader"],
+    "Bills": ["electric", "electricity", "water", "internet", "broadband", "phone", "mobile", "rent",
+              "insurance", "utility", "verizon", "comcast", "mortgage"],
+    "Health": ["pharmacy", "doctor", "dentist", "hospital", "clinic", "gym", "cvs", "walgreens", "medical"],
+    "Education": ["tuition", "school", "university", "college", "course", "udemy", "coursera", "books", "bookstore"],
+    "Shopping": ["amazon", "ebay", "target", "ikea", "zara", "nike", "apple", "bestbuy", "mall", "store"],
+}
+
+# Admin global analytics
+ANALYTICS_WORKERS = int(os.getenv("SPENDWISE_ANALYTICS_WORKERS", str(os.cpu_count() or 2)))
+ANALYTICS_BATCH = 500        # ledgers per worker task
+ANALYTICS_INLINE_MAX = 200   # below this many changed ledgers, skip the process pool
+
+# Month-end forecasts (utils/forecast.py): history window in days, bootstrap
+# draws for the goal probability, and processes for the all-users batch job.
+FORECAST_WINDOW_DAYS = int(os.getenv("SPENDWISE_FORECAST_WINDOW_DAYS", "91"))
+FORECAST_SIMULATIONS = int(os.getenv("SPENDWISE_FORECAST_SIMULATIONS", "2000"))
+FORECAST_WORKERS = int(os.getenv("SPENDWISE_FORECAST_WORKERS", str(os.cpu_count() or 2)))
+FORECAST_CACHE_SIZE = int(os.getenv("SPENDWISE_FORECAST_CACHE_SIZE", "4096"))
+
+# Recurring-charge and anomaly detection (utils/insights.py): an expense is
+# unusual at this z-score against at least this many earlier ones in its category.
+INSIGHT_Z = float(os.getenv("SPENDWISE_INSIGHT_Z", "3.0"))
+INSIGHT_MIN_HISTORY = int(os.getenv("SPENDWISE_INSIGHT_MIN_HISTORY", "10"))
+INSIGHT_WORKERS = int(os.getenv("SPENDWISE_INSIGHT_WORKERS", str(os.cpu_count() or 2)))
+
+# Email outbox (utils/outbox.py): SMTP connections kept open by the sender,
+# messages claimed per batch, and retry schedule (exponential from
+# OUTBOX_BACKOFF_S, capped at OUTBOX_BACKOFF_MAX_S) before a message fails.
+OUTBOX_CONNECTIONS = int(os.getenv("SPENDWISE_OUTBOX_CONNECTIONS", "2"))
+OUTBOX_BATCH = int(os.getenv("SPENDWISE_OUTBOX_BATCH", "50"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("SPENDWISE_OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_S = float(os.getenv("SPENDWISE_OUTBOX_BACKOFF_S", "15"))
+OUTBOX_BACKOFF_MAX_S = float(os.getenv("SPENDWISE_OUTBOX_BACKOFF_MAX_S", "3600"))
+OUTBOX_POLL_S = float(os.getenv("SPENDWISE_OUTBOX_POLL_S", "5"))
+# Reconnect after this many messages on one connection (servers cap it)
+OUTBOX_MESSAGES_PER_CONNECTION = int(os.getenv("SPENDWISE_OUTBOX_MESSAGES_PER_CONNECTION", "100"))
+
+# HTTP API (utils/api.py): listen address for `spendwise serve`, and the
+# largest batch one POST /v1/expenses may carry
+API_HOST = os.getenv("SPENDWISE_API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("SPENDWISE_API_PORT", "8600"))
+API_MAX_BATCH = int(os.getenv("SPENDWISE_API_MAX_BATCH", "10000"))
+
+# Exports (utils/exports.py): ledger CSV bytes or user rows encoded per
+# chunk, and how many "export everything" archives to keep
+EXPORT_CHUNK_BYTES = int(os.getenv("SPENDWISE_EXPORT_CHUNK_BYTES", str(4 << 20)))
+EXPORT_CHUNK_ROWS = int(os.getenv("SPENDWISE_EXPORT_CHUNK_ROWS", "20000"))
+EXPORT_KEEP = int(os.getenv("SPENDWISE_EXPORT_KEEP", "3"))
+
+# Feedback log segments rotate once they reach this size
+FEEDBACK_SEGMENT_BYTES = int(os.getenv("SPENDWISE_FEEDBACK_SEGMENT_BYTES", str(1 << 20)))
+
+# Spending charts: "png" or "svg" (rendered server-side and cached) or
+# "native" (Streamlit's client-side vector charts, no server rendering)
+CHART_RENDERER = os.getenv("SPENDWISE_CHART_RENDERER", "png")
+CHART_CACHE_SIZE = int(os.getenv("SPENDWISE_CHART_CACHE_SIZE", "256"))
+
+# Performance instrumentation (utils/perf.py). Disabled, timers are no-ops and
+# decorated functions are left unwrapped. The export path may contain {pid};
+# a .prom suffix writes Prometheus text, anything else JSON.
+PERF_ENABLED = os.getenv("SPENDWISE_PERF", "1") != "0"
+PERF_SLOW_MS = float(os.getenv("SPENDWISE_PERF_SLOW_MS", "500"))
+PERF_EXPORT_PATH = os.getenv("SPENDWISE_PERF_EXPORT", "")
+PERF_EXPORT_INTERVAL_S = float(os.getenv("SPENDWISE_PERF_EXPORT_INTERVAL_S", "60"))
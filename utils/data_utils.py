@@ -1,62 +1,108 @@
 # utils/data_utils.py
 import os
-import csv
+import json
+import logging
 import datetime
-from typing import Dict, List, Optional
+import threading
+from typing import Dict, Iterator, List, Optional
 import bcrypt
-import pandas as pd
+
+from .config import (
+    USER_STORE_BACKEND, EXPENSE_BACKEND, LEDGER_CACHE_MAX_ROWS, BCRYPT_ROUNDS,
+    FEEDBACK_SEGMENT_BYTES, DATA_LAYOUT, SHARED_CACHE_ENABLED, SHARED_CACHE_MAX_BYTES,
+)
+from .feedback_log import FeedbackLog
+from .outbox import Outbox
+from .perf import timed, timer
+from .shards import LEDGER_SUFFIXES, SNAPSHOT_SUFFIX, Layout, Manifest
+from .shared_cache import SharedCache
+from .user_store import open_user_store
+
+log = logging.getLogger(__name__)
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-USERS_CSV = os.path.join(BASE_DIR, "users.csv")
-DATA_DIR = os.path.join(BASE_DIR, "data")
+DATA_DIR = os.getenv("SPENDWISE_DATA_DIR") or os.path.join(BASE_DIR, "data")
+# users.csv historically sits at the repo root; an explicit data dir keeps everything together.
+USERS_CSV = os.path.join(DATA_DIR if os.getenv("SPENDWISE_DATA_DIR") else BASE_DIR, "users.csv")
 os.makedirs(DATA_DIR, exist_ok=True)
 
-FEEDBACK_CSV = os.path.join(DATA_DIR, "feedback.csv")
+FEEDBACK_CSV = os.path.join(DATA_DIR, "feedback.csv")  # legacy single-file log
+FEEDBACK_DIR = os.path.join(DATA_DIR, "feedback")
+USERS_DB = os.path.join(DATA_DIR, "users.db")
+MANIFEST_DB = os.path.join(DATA_DIR, "manifest.db")
+OUTBOX_DB = os.path.join(DATA_DIR, "outbox.db")
+CACHE_DB = os.path.join(DATA_DIR, "cache.db")
+
+_users = open_user_store(USER_STORE_BACKEND, USERS_CSV, USERS_DB)
+_layout = Layout(DATA_DIR, sharded=DATA_LAYOUT == "sharded")
+_manifest = Manifest(MANIFEST_DB)
+_feedback = FeedbackLog(FEEDBACK_DIR, FEEDBACK_CSV, FEEDBACK_SEGMENT_BYTES)
+_outbox = Outbox(OUTBOX_DB)
+_shared = SharedCache(CACHE_DB, SHARED_CACHE_MAX_BYTES) if SHARED_CACHE_ENABLED else None
 
-# Ensure users CSV exists with headers
-def _ensure_users_csv():
-    if not os.path.exists(USERS_CSV):
-        with open(USERS_CSV, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=[
-                "username","password_hash","salt","purpose","goal","role","activated","activation_code","email"
-            ])
-            writer.writeheader()
+def shared_cache() -> Optional[SharedCache]:
+    """The cross-process cache, or None when SPENDWISE_SHARED_CACHE=0."""
+    return _shared
+
+def _invalidate_shared(username: str):
+    if _shared is not None:
+        _shared.invalidate(username)
+
+def _users_version() -> Optional[str]:
+    # Only users.csv is worth sharing parsed: every lookup would otherwise
+    # read the whole file, where SQLite reads one indexed row.
+    if _shared is None or USER_STORE_BACKEND != "csv":
+        return None
+    try:
+        st = os.stat(USERS_CSV)
+    except FileNotFoundError:
+        return None
+    return f"{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
 
 def read_users() -> Dict[str, Dict]:
-    _ensure_users_csv()
-    users = {}
-    with open(USERS_CSV, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            users[row["username"]] = {
-                "username": row["username"],
-                "password_hash": row.get("password_hash",""),
-                "salt": row.get("salt",""),
-                "purpose": row.get("purpose",""),
-                "goal": float(row.get("goal","0") or 0),
-                "role": row.get("role","user"),
-                "activated": row.get("activated","False") == "True",
-                "activation_code": row.get("activation_code",""),
-                "email": row.get("email","")
-            }
-    return users
+    return _users.read_all()
+
+def iter_users(chunk: int) -> Iterator[List[Dict]]:
+    return _users.iter_chunks(chunk)
+
+def get_user(username: str) -> Optional[Dict]:
+    version = _users_version()
+    if version is None:
+        return _users.get(username)
+    cached = _shared.get_json("user", username, version)
+    if cached is not None:
+        return cached or None  # {}: known not to exist at this version
+    users = _users.read_all()
+    # One parse stores every record at this version, for every process.
+    _shared.put_many("user", (
+        (name, json.dumps(u).encode("utf-8"), version, name) for name, u in users.items()
+    ))
+    if username not in users:
+        _shared.put_json("user", username, {}, version, owner=username)
+    return users.get(username)
+
+def user_exists(username: str) -> bool:
+    if _users_version() is not None:
+        return get_user(username) is not None
+    return _users.exists(username)
+
+def has_users() -> bool:
+    return _users.has_any()
 
 def write_user(user: Dict):
     """
     Accepts either raw 'password' to hash, or precomputed password_hash+salt.
     Stores activated flag and activation_code.
     """
-    _ensure_users_csv()
-    users = read_users()
     username = user["username"]
     if "password" in user and user["password"]:
-        salt = bcrypt.gensalt()
+        salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
         hashed = bcrypt.hashpw(user["password"].encode("utf-8"), salt).decode("utf-8")
         salt_str = salt.decode("utf-8")
     else:
         hashed = user.get("password_hash","")
         salt_str = user.get("salt","")
-    users[username] = {
+    _users.put({
         "username": username,
         "password_hash": hashed,
         "salt": salt_str,
@@ -66,138 +112,351 @@ def write_user(user: Dict):
         "activated": user.get("activated", False),
         "activation_code": user.get("activation_code",""),
         "email": user.get("email","")
-    }
-    with open(USERS_CSV, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=[
-            "username","password_hash","salt","purpose","goal","role","activated","activation_code","email"
-        ])
-        writer.writeheader()
-        for u in users.values():
-            writer.writerow({
-                "username": u["username"],
-                "password_hash": u.get("password_hash",""),
-                "salt": u.get("salt",""),
-                "purpose": u.get("purpose",""),
-                "goal": u.get("goal",0.0),
-                "role": u.get("role","user"),
-                "activated": str(u.get("activated", False)),
-                "activation_code": u.get("activation_code",""),
-                "email": u.get("email","")
-            })
+    })
+    _invalidate_shared(username)
 
 def verify_user_credentials(username: str, password: str) -> bool:
-    users = read_users()
-    if username not in users:
+    u = get_user(username)
+    if u is None:
         return False
-    u = users[username]
     if not u.get("activated", False):
         return False
     stored_hash = u.get("password_hash","").encode("utf-8")
     try:
-        return bcrypt.checkpw(password.encode("utf-8"), stored_hash)
+        with timer("auth.bcrypt_verify"):
+            return bcrypt.checkpw(password.encode("utf-8"), stored_hash)
     except Exception:
         return False
 
 def get_user_role(username: str) -> str:
-    return read_users().get(username, {}).get("role", "user")
+    return (get_user(username) or {}).get("role", "user")
 
 def is_user_activated(username: str) -> bool:
-    return read_users().get(username, {}).get("activated", False)
+    return (get_user(username) or {}).get("activated", False)
 
 def set_user_activation(username: str, activated: bool):
-    users = read_users()
-    if username in users:
-        users[username]["activated"] = activated
-        users[username]["activation_code"] = ""
-        write_user(users[username])
+    _users.set_activation(username, activated)
+    _invalidate_shared(username)
 
 def get_activation_code(username: str) -> str:
-    return read_users().get(username, {}).get("activation_code","")
+    return (get_user(username) or {}).get("activation_code","")
 
 # Expense helpers
+def user_path(username: str, suffix: str) -> str:
+    """Path of a per-user file, e.g. user_path(u, "_rollup.json"), in the active layout."""
+    return _layout.path(username, suffix)
+
 def _expense_path(username: str) -> str:
-    return os.path.join(DATA_DIR, f"{username}_expenses.csv")
+    return user_path(username, LEDGER_SUFFIXES[EXPENSE_BACKEND])
+
+def _rollup_path(username: str) -> str:
+    return user_path(username, "_rollup.json")
+
+def _insights_path(username: str) -> str:
+    return user_path(username, "_insights.json")
+
+def _snapshot_path(username: str) -> str:
+    return user_path(username, SNAPSHOT_SUFFIX)
+
+_expense_stores = None
+_expense_lock = threading.Lock()
+
+def _stores():
+    """
+    Expense store, rollups and insights, built on first use. They pull in pandas/numpy,
+    which the login and registration pages never need.
+    """
+    global _expense_stores
+    if _expense_stores is None:
+        with _expense_lock:
+            if _expense_stores is None:
+                from .expense_store import open_expense_store
+                from .ledger_cache import LedgerCache
+                from .rollups import RollupStore
+                from .insights import InsightStore
+                expenses = open_expense_store(EXPENSE_BACKEND, _expense_path, LedgerCache(LEDGER_CACHE_MAX_ROWS),
+                                              _snapshot_path)
+                _expense_stores = (expenses, RollupStore(_rollup_path, expenses), InsightStore(_insights_path, expenses))
+                # A new manifest (or one listing the other backend's ledgers)
+                # is filled in the background; see manifest_complete.
+                start_reindex()
+    return _expense_stores
+
+def _index_append(username: str, dates, rows: int, before, after):
+    """Advance the user's manifest entry past an append, or recompute it if it was stale."""
+    from .expense_schema import to_dates
+    import numpy as np
+    expenses = _stores()[0]
+    days = to_dates(dates).astype('datetime64[D]')
+    days = days[~np.isnat(days)]
+    lo, hi = (str(days.min()), str(days.max())) if len(days) else (None, None)
+    if not _manifest.record(username, _expense_path(username), expenses.usage(before), expenses.usage(after), rows, lo, hi):
+        refresh_ledger_entry(username)
 
 def log_expense(username: str, date: str, category: str, amount: float, description: str):
-    path = _expense_path(username)
-    file_exists = os.path.exists(path)
-    fieldnames = ['date','category','amount','description']
-    with open(path, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow({
-            'date': date,
-            'category': category,
-            'amount': f"{amount:.2f}",
-            'description': description
-        })
+    rows = [{
+        'date': date,
+        'category': category,
+        'amount': amount,
+        'description': description
+    }]
+    expenses, rollups, insights = _stores()
+    before, after = expenses.append(username, rows)
+    rollups.record(username, rows, before, after)
+    insights.record(username, rows, before, after)
+    _index_append(username, [date], 1, before, after)
+    _invalidate_shared(username)
+
+def log_expenses_frame(username: str, df):
+    """Bulk append: `df` has datetime64 `date`, str `category`, float `amount`, str `description`."""
+    expenses, rollups, insights = _stores()
+    before, after = expenses.append_frame(username, df)
+    rollups.record_frame(username, df, before, after)
+    insights.record_frame(username, df, before, after)
+    _index_append(username, df['date'], len(df), before, after)
+    _invalidate_shared(username)
+
+def log_expenses(username: str, records: List[Dict]) -> int:
+    """
+    Validate a batch of {date: 'YYYY-MM-DD', category, amount, description}
+    and append it in one write. Raises ValueError on the first bad record,
+    before anything is written. Returns the number of rows logged.
+    """
+    import pandas as pd
+    from .config import CATEGORIES, MAX_EXPENSE_AMOUNT
+    if not records:
+        return 0
+    df = pd.DataFrame.from_records(records, columns=['date', 'category', 'amount', 'description'])
+    df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d', errors='coerce')
+    df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
+    df['description'] = df['description'].fillna('').astype(str)
+    checks = [
+        (df['date'].isna(), "date must be YYYY-MM-DD"),
+        (~df['category'].isin(CATEGORIES), f"category must be one of {', '.join(CATEGORIES)}"),
+        # between() is False for NaN and inf: nothing that overflows cents gets written.
+        (~df['amount'].between(0, MAX_EXPENSE_AMOUNT), f"amount must be a number from 0 to {MAX_EXPENSE_AMOUNT:,.0f}"),
+    ]
+    for bad, message in checks:
+        if bad.any():
+            i = int(bad.to_numpy().argmax())
+            raise ValueError(f"record {i}: {message}")
+    df['amount'] = df['amount'].round(2)
+    log_expenses_frame(username, df)
+    return len(df)
+
+def iter_expenses(username: str, chunk_bytes: int) -> Iterator:
+    """The whole ledger as canonical frames, a bounded chunk at a time (see utils/exports.py)."""
+    return _stores()[0].iter_frames(username, chunk_bytes)
 
 def read_expenses(username: str) -> List[Dict]:
-    path = _expense_path(username)
-    if not os.path.exists(path):
-        return []
-    rows = []
-    with open(path, newline='', encoding='utf-8') as f:
-        for r in csv.DictReader(f):
-            rows.append(r)
-    return rows
+    return _stores()[0].rows(username)
 
 def expenses_df(username: str):
-    rows = read_expenses(username)
-    if not rows:
-        return pd.DataFrame(columns=['date','category','amount','description'])
-    df = pd.DataFrame(rows)
-    df['amount'] = pd.to_numeric(df['amount'], errors='coerce').fillna(0.0)
-    df['date'] = pd.to_datetime(df['date'], errors='coerce').dt.date
-    return df
+    """
+    The whole ledger in the compact canonical schema (expense_schema):
+    datetime64 `date`, Categorical `category`, int64 `cents`, Categorical
+    `description`. Use `display_expenses` before showing it to people.
+    """
+    return _stores()[0].frame(username)
+
+def display_expenses(df):
+    """Canonical frame -> date / category / amount (dollars) / description."""
+    from .expense_schema import display
+    return display(df)
+
+@timed("data.query_expenses")
+def query_expenses(username: str, start=None, end=None, categories=None, sort: str = "date",
+                   descending: bool = True, limit: int = 50, offset: int = 0):
+    """
+    One page of a user's expenses (display columns) and the total number of matches.
+    `start` is inclusive, `end` exclusive; `sort` is "date" or "amount".
+    """
+    return _stores()[0].query(username, start, end, categories, sort, descending, limit, offset)
+
+def recent_expenses(username: str, k: int = 5):
+    return query_expenses(username, limit=k)[0]
 
+@timed("data.totals_by_category")
 def totals_by_category(username: str, since_date=None):
-    df = expenses_df(username)
-    if since_date is not None and not df.empty:
-        df = df[df['date'] >= since_date]
-    if df.empty:
-        return {}
-    return df.groupby('category')['amount'].sum().to_dict()
+    expenses, rollups = _stores()[:2]
+    totals = rollups.totals_by_category(username, since_date)
+    if totals is None:
+        totals = expenses.totals_by_category(username, since_date)
+    return totals
 
 def total_spent_month(username: str, month_start_date):
-    df = expenses_df(username)
-    if df.empty:
-        return 0.0
-    df = df[df['date'] >= month_start_date]
-    return float(df['amount'].sum())
+    expenses, rollups = _stores()[:2]
+    total = rollups.total_since(username, month_start_date)
+    if total is None:
+        total = expenses.total_since(username, month_start_date)
+    return total
+
+def monthly_totals(username: str) -> Dict[str, float]:
+    return _stores()[1].monthly_totals(username)
+
+def rollup_cells(username: str) -> Dict[str, Dict[str, List]]:
+    """{month: {category: [cents, count]}} for one user, rebuilt if stale."""
+    return _stores()[1].get(username)["cells"]
+
+def daily_spend(username: str) -> Dict[str, int]:
+    """{'YYYY-MM-DD': cents} over a user's dated expenses, from the rollup."""
+    return _stores()[1].daily_totals(username)
+
+def spending_insights(username: str, today=None) -> Dict:
+    """Active recurring charges and recent unusual expenses (see insights.summary)."""
+    from .insights import summary
+    return summary(_stores()[2].get(username), today or datetime.date.today())
+
+def expense_signature(username: str):
+    return _stores()[0].signature(username)
+
+def list_expense_users() -> List[str]:
+    """Usernames that have a ledger in the active backend: from the manifest, or a directory scan until it is complete."""
+    _stores()
+    if manifest_complete():
+        return _manifest.users()
+    return _layout.scan(LEDGER_SUFFIXES[EXPENSE_BACKEND])
+
+def _ledger_stats(username: str) -> Dict:
+    from .expense_schema import NAT, date_keys
+    import numpy as np
+    expenses = _stores()[0]
+    sig = expenses.signature(username)
+    df = expenses.frame(username)
+    keys = date_keys(df)
+    keys = keys[keys != NAT]
+    lo = hi = None
+    if len(keys):
+        lo, hi = (str(d) for d in np.array([keys.min(), keys.max()]).astype('datetime64[s]').astype('datetime64[D]'))
+    nbytes, mtime_ns = expenses.usage(sig)
+    return {
+        "username": username, "path": _expense_path(username), "rows": len(df), "bytes": nbytes,
+        "mtime_ns": mtime_ns, "min_date": lo, "max_date": hi,
+    }
+
+def refresh_ledger_entry(username: str):
+    """
+    Recompute a user's manifest entry from the ledger. Holds the ledger lock,
+    so no append lands between reading the ledger and storing the entry; an
+    append that already happened but has not recorded itself yet will find
+    the entry moved on and come back here.
+    """
+    from .file_io import file_lock
+    with file_lock(_expense_path(username)):
+        _manifest.put(_ledger_stats(username))
+
+def manifest_complete() -> bool:
+    """Whether a full reindex for the active backend has finished, so the manifest lists every ledger."""
+    return _manifest.indexed() == EXPENSE_BACKEND
+
+def reindex_ledgers(if_incomplete: bool = False) -> int:
+    """
+    Rebuild the manifest from every ledger on disk, flat or sharded. Returns
+    ledgers indexed. The manifest counts as complete only once this returns,
+    so a crash part way leaves readers scanning and the next start redoing it.
+    With `if_incomplete`, a manifest another process finished meanwhile is left as is.
+    """
+    from .file_io import file_lock
+    with file_lock(MANIFEST_DB + ".reindex"):
+        if if_incomplete and manifest_complete():
+            return 0
+        _manifest.set_indexed(None)
+        users = _layout.scan(LEDGER_SUFFIXES[EXPENSE_BACKEND])
+        for u in users:
+            refresh_ledger_entry(u)
+        _manifest.remove(set(_manifest.users()) - set(users))
+        _manifest.set_indexed(EXPENSE_BACKEND)
+    return len(users)
+
+def _reindex_if_needed():
+    try:
+        n = reindex_ledgers(if_incomplete=True)
+        if n:
+            log.info("indexed %d ledgers into the manifest", n)
+    except Exception:
+        log.exception("manifest reindex failed")
+
+_reindexer = None
+
+def start_reindex() -> Optional[threading.Thread]:
+    """Fill an incomplete manifest on a background thread, once per process."""
+    global _reindexer
+    if _reindexer is None and not manifest_complete():
+        _reindexer = threading.Thread(target=_reindex_if_needed, name="manifest-reindex", daemon=True)
+        _reindexer.start()
+    return _reindexer
+
+def ledger_manifest(limit: Optional[int] = 100) -> Dict:
+    """Catalog totals and the largest ledgers, for the admin console; `complete` is False while a reindex runs."""
+    _stores()
+    return {**_manifest.totals(), "largest": _manifest.entries(limit), "complete": manifest_complete()}
+
+def migrate_user(username: str) -> int:
+    """Move one user's flat files into the sharded layout (see shards.migrate_user)."""
+    from .expense_store import merge_ledger
+    from .shards import migrate_user as _migrate
+    moved = _migrate(_layout, username, EXPENSE_BACKEND, lambda src, dst: merge_ledger(EXPENSE_BACKEND, src, dst))
+    if moved and os.path.lexists(_expense_path(username)):
+        refresh_ledger_entry(username)
+    return moved
+
+def compaction_candidates(min_bytes: int, limit: int) -> List[Dict]:
+    """
+    Ledgers due for a snapshot: at least `min_bytes` past their checkpoint,
+    hottest and largest first. Heat is how often this process had to load
+    the ledger cold since its last compaction; each of those loads parses the
+    whole uncompacted delta, so they rank by delta * (1 + misses).
+    """
+    expenses = _stores()[0]
+    if not hasattr(expenses, "compact"):
+        return []  # partitioned ledgers are stored typed already
+    entries = _manifest.uncompacted(min_bytes, limit * 4)
+    for e in entries:
+        e["misses"] = expenses.cache.misses(e["username"])
+    entries.sort(key=lambda e: e["delta"] * (1 + e["misses"]), reverse=True)
+    return entries[:limit]
+
+def compact_ledger(username: str) -> int:
+    """Snapshot one user's CSV ledger (see utils/compaction.py); returns the checkpoint offset."""
+    expenses = _stores()[0]
+    if not hasattr(expenses, "compact"):
+        return 0
+    offset = expenses.compact(username)
+    _manifest.set_compacted(username, offset)
+    return offset
 
 # Feedback
 def write_feedback(username: str, feedback_text: str, rating: int):
-    file_exists = os.path.exists(FEEDBACK_CSV)
-    fieldnames = ['timestamp','username','rating','feedback']
-    with open(FEEDBACK_CSV, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow({
-            'timestamp': datetime.datetime.utcnow().isoformat(),
-            'username': username,
-            'rating': int(rating),
-            'feedback': feedback_text
-        })
+    _feedback.append({
+        'timestamp': datetime.datetime.utcnow().isoformat(),
+        'username': username,
+        'rating': int(rating),
+        'feedback': feedback_text
+    })
+
+def iter_feedback() -> Iterator[List[Dict]]:
+    return _feedback.iter_segments()
 
 def read_feedback() -> List[Dict]:
-    if not os.path.exists(FEEDBACK_CSV):
-        return []
-    rows = []
-    with open(FEEDBACK_CSV, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            # normalize keys
-            if 'timestamp' not in r:
-                r['timestamp'] = ''
-            if 'rating' in r and r['rating'] != '':
-                try:
-                    r['rating'] = int(r['rating'])
-                except:
-                    r['rating'] = None
-            else:
-                r['rating'] = None
-            rows.append(r)
-    return rows
\ No newline at end of file
+    """Every feedback row, oldest first. Prefer feedback_page for display."""
+    return _feedback.read_all()
+
+def feedback_page(offset: int = 0, limit: int = 50) -> List[Dict]:
+    return _feedback.page(offset, limit)
+
+def feedback_summary() -> Dict:
+    return _feedback.summary()
+
+# Outgoing email
+def queue_email(to_addr: str, subject: str, body: str, tag: str = "") -> int:
+    """Queue a message for the background sender (utils/mailer.py); returns at once."""
+    return _outbox.put(to_addr, subject, body, tag)
+
+def email_status(tag: str) -> Optional[Dict]:
+    return _outbox.status(tag)
+
+def outbox_stats() -> Dict:
+    return _outbox.stats()
+
+def mail_outbox() -> Outbox:
+    return _outbox
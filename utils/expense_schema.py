@@ -0,0 +1,107 @@
+# utils/expense_schema.py
+from typing import Dict, Iterable
+
+import numpy as np
+import pandas as pd
+
+from .config import CATEGORIES
+
+# Columns as stored in CSV ledgers and shown to users.
+EXPENSE_FIELDS = ['date','category','amount','description']
+
+# Canonical in-memory frame:
+#   date         datetime64[s], NaT where unparseable (pandas has no [D] unit;
+#                seconds is the coarsest it supports, values are whole days)
+#   category     Categorical over CATEGORIES, plus any legacy values found
+#   cents        int64, so totals are exact
+#   description  Categorical: each distinct text stored once, rows hold codes
+CANONICAL_FIELDS = ['date','category','cents','description']
+DATE_DTYPE = 'datetime64[s]'
+NAT = np.iinfo(np.int64).min  # NaT viewed as int64
+DAY_S = 86400
+
+
+def to_seconds(value) -> int:
+    """A date (or date string) as int64 seconds at midnight, comparable to `date_keys`."""
+    return int(np.datetime64(value, 'D').astype(np.int64)) * DAY_S
+
+
+def date_keys(df: pd.DataFrame) -> np.ndarray:
+    """The `date` column as int64 seconds, NaT -> NAT. A view, no copy."""
+    return df['date'].to_numpy().view(np.int64)
+
+
+def to_cents(amounts) -> np.ndarray:
+    a = pd.Series(amounts)
+    if a.dtype != np.float64:
+        a = pd.to_numeric(a, errors='coerce')
+    a = a.fillna(0.0).to_numpy(dtype=np.float64)
+    return np.rint(a * 100).astype(np.int64)
+
+
+def to_dates(dates) -> np.ndarray:
+    parsed = pd.to_datetime(pd.Series(dates), errors='coerce')
+    return parsed.to_numpy(dtype='datetime64[D]').astype(DATE_DTYPE)
+
+
+def category_dtype(values: Iterable = ()) -> pd.CategoricalDtype:
+    extra = sorted(set(values) - set(CATEGORIES))
+    return pd.CategoricalDtype(CATEGORIES + extra)
+
+
+def _categories(values) -> pd.Categorical:
+    c = pd.Categorical(pd.Series(values).fillna(''))
+    return c.set_categories(category_dtype(c.categories).categories)
+
+
+def _texts(values) -> pd.Categorical:
+    return pd.Categorical(pd.Series(values).fillna(''))
+
+
+def empty() -> pd.DataFrame:
+    return canonical([], [], [], [])
+
+
+def canonical(dates, categories, amounts, descriptions, cents=None) -> pd.DataFrame:
+    """Build a canonical frame from raw (text) or typed columns."""
+    return pd.DataFrame({
+        'date': to_dates(dates),
+        'category': _categories(categories),
+        'cents': to_cents(amounts) if cents is None else np.asarray(cents, dtype=np.int64),
+        'description': _texts(descriptions),
+    })
+
+
+def concat(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    """Append canonical `b` to `a`, merging category and description dictionaries."""
+    if b.empty:
+        return a
+    if a.empty:
+        return b
+    cats = category_dtype(list(a['category'].cat.categories) + list(b['category'].cat.categories))
+    return pd.DataFrame({
+        'date': np.concatenate([a['date'].to_numpy(), b['date'].to_numpy()]),
+        'category': pd.Categorical.from_codes(np.concatenate([
+            a['category'].astype(cats).cat.codes.to_numpy(), b['category'].astype(cats).cat.codes.to_numpy(),
+        ]), dtype=cats),
+        'cents': np.concatenate([a['cents'].to_numpy(), b['cents'].to_numpy()]),
+        'description': pd.api.types.union_categoricals([a['description'], b['description']]),
+    })
+
+
+def display(df: pd.DataFrame) -> pd.DataFrame:
+    """Canonical -> EXPENSE_FIELDS with `date` objects, plain strings and float dollars, for small frames."""
+    return pd.DataFrame({
+        'date': pd.Series(df['date'].to_numpy()).dt.date.to_numpy(),
+        'category': df['category'].astype(str).to_numpy(),
+        'amount': df['cents'].to_numpy() / 100,
+        'description': df['description'].astype(str).to_numpy(),
+    }, columns=EXPENSE_FIELDS)
+
+
+def totals(codes: np.ndarray, cents: np.ndarray, categories) -> Dict[str, float]:
+    """{category: dollars} for categories with at least one row, summing exact cents."""
+    n = len(categories)
+    counts = np.bincount(codes, minlength=n)
+    sums = np.bincount(codes, weights=cents, minlength=n)
+    return {categories[i]: round(float(sums[i]) / 100, 2) for i in np.flatnonzero(counts)}
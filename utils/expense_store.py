@@ -0,0 +1,441 @@
+# utils/expense_store.py
+import io
+import os
+import csv
+import argparse
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .file_io import Signature, append_bytes, atomic_write, file_lock
+from . import expense_schema as schema
+from .expense_schema import CANONICAL_FIELDS, EXPENSE_FIELDS, NAT, date_keys, to_seconds
+from .ledger_cache import LedgerCache, parse_rows, record_end, write_snapshot
+
+UNDATED = "undated"
+_HEADER = (",".join(EXPENSE_FIELDS) + "\r\n").encode('utf-8')
+
+
+def _format_row(row: Dict) -> Dict:
+    return {
+        'date': row['date'],
+        'category': row['category'],
+        'amount': f"{float(row['amount']):.2f}",
+        'description': row.get('description', '')
+    }
+
+
+def select_page(dates: np.ndarray, amounts: np.ndarray, mask: np.ndarray, sort: str = "date",
+                descending: bool = True, limit: int = 50, offset: int = 0) -> Tuple[np.ndarray, int]:
+    """
+    Row positions of one sorted page among the rows where `mask` is set, and
+    the total match count. `dates` is any int64 date key with NaT as
+    int64 min; `amounts` any numeric column. Only the first `offset + limit` matches are ever
+    fully sorted (argpartition), so a top-k page costs O(n + k log k).
+    Undated rows sort last; ties go to the most recently appended row first
+    when descending.
+    """
+    idx = np.flatnonzero(mask)
+    total = int(idx.size)
+    want = offset + limit
+    if offset >= total or limit <= 0:
+        return idx[:0], total
+    if sort == "date":
+        key = dates[idx].astype(np.float64)
+        key[dates[idx] == NAT] = np.nan
+    elif sort == "amount":
+        key = amounts[idx].astype(np.float64)
+    else:
+        raise ValueError(f"Unsupported sort column: {sort}")
+    if descending:
+        key = -key
+    key[np.isnan(key)] = np.inf
+    pos = -idx if descending else idx
+    cand = np.arange(total)
+    if want < total:
+        # Keep everything tied with the k-th key so tie-breaking stays exact.
+        kth = key[np.argpartition(key, want - 1)[:want]].max()
+        cand = np.flatnonzero(key <= kth)
+    order = cand[np.lexsort((pos[cand], key[cand]))]
+    return idx[order[offset:want]], total
+
+
+class CsvExpenseStore:
+    """
+    Row-oriented `<username>_expenses.csv` files, read through the ledger
+    cache. With `snapshot_for`, cold reads start from the user's compacted
+    snapshot when there is one (see `compact`).
+    """
+
+    def __init__(self, path_for: Callable[[str], str], cache: LedgerCache,
+                 snapshot_for: Optional[Callable[[str], str]] = None):
+        self.path_for = path_for
+        self.cache = cache
+        self.snapshot_for = snapshot_for
+
+    def append(self, username: str, rows: Iterable[Dict]) -> Tuple[Signature, Signature]:
+        """Append rows; returns the ledger signature just before and after this write."""
+        buf = io.StringIO()
+        csv.DictWriter(buf, fieldnames=EXPENSE_FIELDS).writerows(_format_row(r) for r in rows)
+        return append_bytes(self.path_for(username), buf.getvalue().encode('utf-8'), _HEADER)
+
+    def append_frame(self, username: str, df: pd.DataFrame) -> Tuple[Signature, Signature]:
+        """Append a typed frame (datetime64 `date`, float `amount`) in one write."""
+        if df.empty:
+            sig = self.signature(username)
+            return sig, sig
+        out = pd.DataFrame({
+            'date': df['date'].dt.strftime('%Y-%m-%d').fillna(''),
+            'category': df['category'],
+            'amount': df['amount'].map('{:.2f}'.format),
+            'description': df['description'],
+        })
+        data = out.to_csv(header=False, index=False, lineterminator='\r\n')
+        return append_bytes(self.path_for(username), data.encode('utf-8'), _HEADER)
+
+    def signature(self, username: str):
+        try:
+            st = os.stat(self.path_for(username))
+        except FileNotFoundError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    @staticmethod
+    def usage(signature) -> Tuple[int, int]:
+        """(bytes, mtime_ns) of a ledger from its signature, zeros if there is none."""
+        return tuple(signature) if signature else (0, 0)
+
+    def _snapshot(self, username: str) -> Optional[str]:
+        return self.snapshot_for(username) if self.snapshot_for else None
+
+    def _cached(self, username: str) -> pd.DataFrame:
+        # Shared, read-only canonical frame; never hand it out without copying.
+        return self.cache.frame(username, self.path_for(username), self._snapshot(username))
+
+    def compact(self, username: str) -> int:
+        """
+        Snapshot the ledger as parsed so far. Returns the checkpoint offset in
+        bytes (0 if there is no ledger). Appends keep landing meanwhile; they
+        are past the checkpoint and stay in the CSV delta.
+        """
+        path, snapshot = self.path_for(username), self._snapshot(username)
+        if snapshot is None:
+            return 0
+        with file_lock(snapshot):
+            cp = self.cache.checkpoint(username, path, snapshot)
+            if cp is None:
+                return 0
+            offset, columns, df = cp
+            write_snapshot(snapshot, path, offset, columns, df)
+        self.cache.cool(username)
+        return offset
+
+    def iter_frames(self, username: str, chunk_bytes: int) -> Iterator[pd.DataFrame]:
+        """
+        The ledger as canonical frames of about `chunk_bytes` of CSV each,
+        parsed straight from the file so memory stays flat however large it
+        is. Bypasses the cache; ends at the last whole record.
+        """
+        try:
+            f = open(self.path_for(username), 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            header = f.readline()
+            if not header.endswith(b'\n'):
+                return
+            columns = header.decode('utf-8').strip().split(',')
+            while True:
+                parts = [f.read(chunk_bytes)]
+                quotes = parts[0].count(b'"')
+                # Extend to the end of a record: a line, unless a quoted
+                # description carries newlines (odd quotes so far).
+                while parts[-1] and not (parts[-1].endswith(b'\n') and quotes % 2 == 0):
+                    line = f.readline()
+                    if not line:
+                        break
+                    parts.append(line)
+                    quotes += line.count(b'"')
+                block = b"".join(parts)
+                end = record_end(block)  # short of len(block) only at a half-written append
+                if end:
+                    yield parse_rows(block[:end], names=columns)
+                if end < len(block) or not block:
+                    return
+
+    def rows(self, username: str) -> List[Dict]:
+        path = self.path_for(username)
+        if not os.path.exists(path):
+            return []
+        with open(path, newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+
+    def _date_mask(self, df: pd.DataFrame, since=None, until=None) -> np.ndarray:
+        key = date_keys(df)
+        mask = np.ones(len(key), dtype=bool)
+        if since is not None:
+            mask &= key >= to_seconds(since)
+        if until is not None:
+            mask &= (key < to_seconds(until)) & (key != NAT)
+        return mask
+
+    def frame(self, username: str, since=None, until=None) -> pd.DataFrame:
+        """Canonical frame (see expense_schema), optionally limited to [since, until)."""
+        df = self._cached(username)
+        if since is not None or until is not None:
+            df = df[self._date_mask(df, since, until)].reset_index(drop=True)
+        return df.copy()
+
+    def query(self, username: str, start=None, end=None, categories=None, sort: str = "date",
+              descending: bool = True, limit: int = 50, offset: int = 0) -> Tuple[pd.DataFrame, int]:
+        df = self._cached(username)
+        if df.empty:
+            return schema.display(df), 0
+        mask = self._date_mask(df, start, end)
+        if categories:
+            mask &= df['category'].isin(categories).to_numpy()
+        rows, total = select_page(date_keys(df), df['cents'].to_numpy(), mask,
+                                  sort, descending, limit, offset)
+        return schema.display(df.iloc[rows]), total
+
+    def totals_by_category(self, username: str, since=None) -> Dict[str, float]:
+        df = self._cached(username)
+        codes = df['category'].cat.codes.to_numpy()
+        cents = df['cents'].to_numpy()
+        if since is not None:
+            mask = self._date_mask(df, since)
+            codes, cents = codes[mask], cents[mask]
+        return schema.totals(codes, cents, df['category'].cat.categories)
+
+    def total_since(self, username: str, since) -> float:
+        df = self._cached(username)
+        return int(df['cents'].to_numpy()[self._date_mask(df, since)].sum()) / 100
+
+
+class PartitionedExpenseStore:
+    """
+    Columnar ledgers: one uncompressed `.npz` per user and year-month, e.g.
+    `data/<username>_expenses/2024-05.npz`, with one typed array per column.
+    `np.load` on an npz is lazy per array, so queries open only the months
+    they need and decode only the columns they touch.
+    """
+
+    def __init__(self, path_for: Callable[[str], str]):
+        self.path_for = path_for
+
+    def path(self, username: str) -> str:
+        return self.path_for(username)
+
+    def _partition_path(self, username: str, key: str) -> str:
+        return os.path.join(self.path(username), f"{key}.npz")
+
+    def _partitions(self, username: str, since=None, until=None) -> List[str]:
+        root = self.path(username)
+        if not os.path.isdir(root):
+            return []
+        lo = f"{since:%Y-%m}" if since is not None else None
+        hi = f"{until:%Y-%m}" if until is not None else None
+        keys = []
+        for name in sorted(os.listdir(root)):
+            if not name.endswith(".npz"):
+                continue
+            key = name[:-4]
+            if key == UNDATED:
+                # Unparseable dates never satisfy a date bound.
+                if lo is None and hi is None:
+                    keys.append(key)
+                continue
+            if (lo is None or key >= lo) and (hi is None or key <= hi):
+                keys.append(key)
+        return keys
+
+    def signature(self, username: str):
+        sig = []
+        for key in self._partitions(username):
+            st = os.stat(self._partition_path(username, key))
+            sig.append((key, st.st_size, st.st_mtime_ns))
+        return sig or None
+
+    @staticmethod
+    def usage(signature) -> Tuple[int, int]:
+        sig = signature or []
+        return sum(size for _, size, _ in sig), max((mtime for _, _, mtime in sig), default=0)
+
+    def _read(self, username: str, key: str, columns: List[str]) -> Dict[str, np.ndarray]:
+        with np.load(self._partition_path(username, key), allow_pickle=False) as npz:
+            cols = {c: npz[c] for c in columns if c != 'cents'}
+            if 'cents' in columns:
+                # Partitions written before amounts were stored as cents.
+                cols['cents'] = npz['cents'] if 'cents' in npz.files else schema.to_cents(npz['amount'])
+            return cols
+
+    def _write(self, username: str, key: str, cols: Dict[str, np.ndarray]):
+        with atomic_write(self._partition_path(username, key), 'wb') as f:
+            np.savez(f, **cols)
+
+    @staticmethod
+    def _columns(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        return {
+            'date': df['date'].to_numpy(dtype='datetime64[D]'),
+            'category': df['category'].astype(str).to_numpy(dtype=str),
+            'cents': schema.to_cents(df['amount']),
+            'description': df['description'].astype(str).to_numpy(dtype=str),
+        }
+
+    def append_frame(self, username: str, df: pd.DataFrame):
+        """
+        Append a typed frame (datetime64 `date`, float `amount`) partition by
+        partition. Partitions are rewritten, so the whole read-modify-write
+        runs under the user's lock; returns the signature before and after.
+        """
+        with file_lock(self.path(username)):
+            before = self.signature(username)
+            if df.empty:
+                return before, before
+            os.makedirs(self.path(username), exist_ok=True)
+            keys = df['date'].dt.strftime('%Y-%m').fillna(UNDATED)
+            for key, part in df.groupby(keys, sort=False):
+                new = self._columns(part)
+                if os.path.exists(self._partition_path(username, key)):
+                    old = self._read(username, key, CANONICAL_FIELDS)
+                    new = {c: np.concatenate([old[c], new[c]]) for c in CANONICAL_FIELDS}
+                self._write(username, key, new)
+            return before, self.signature(username)
+
+    def append(self, username: str, rows: Iterable[Dict]):
+        df = pd.DataFrame([_format_row(r) for r in rows], columns=EXPENSE_FIELDS)
+        df['amount'] = pd.to_numeric(df['amount'], errors='coerce').fillna(0.0)
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        return self.append_frame(username, df)
+
+    def _scan(self, username: str, columns: List[str], since=None, until=None) -> Dict[str, np.ndarray]:
+        parts = [self._read(username, k, columns) for k in self._partitions(username, since, until)]
+        if not parts:
+            return {}
+        cols = {c: np.concatenate([p[c] for p in parts]) for c in columns}
+        if since is not None or until is not None:
+            mask = np.ones(len(cols['date']), dtype=bool)
+            if since is not None:
+                mask &= cols['date'] >= np.datetime64(since, 'D')
+            if until is not None:
+                mask &= cols['date'] < np.datetime64(until, 'D')
+            cols = {c: v[mask] for c, v in cols.items()}
+        return cols
+
+    @staticmethod
+    def _canonical(cols: Dict[str, np.ndarray]) -> pd.DataFrame:
+        return schema.canonical(cols['date'], cols['category'], None, cols['description'], cents=cols['cents'])
+
+    def frame(self, username: str, since=None, until=None) -> pd.DataFrame:
+        """Canonical frame (see expense_schema), optionally limited to [since, until)."""
+        cols = self._scan(username, CANONICAL_FIELDS, since, until)
+        return self._canonical(cols) if cols else schema.empty()
+
+    def iter_frames(self, username: str, chunk_bytes: int = 0) -> Iterator[pd.DataFrame]:
+        """The ledger as canonical frames, one partition (month) at a time."""
+        for key in self._partitions(username):
+            yield self._canonical(self._read(username, key, CANONICAL_FIELDS))
+
+    def query(self, username: str, start=None, end=None, categories=None, sort: str = "date",
+              descending: bool = True, limit: int = 50, offset: int = 0) -> Tuple[pd.DataFrame, int]:
+        cols = self._scan(username, CANONICAL_FIELDS, start, end)
+        if not cols:
+            return schema.display(schema.empty()), 0
+        mask = np.ones(len(cols['cents']), dtype=bool)
+        if categories:
+            mask &= np.isin(cols['category'], list(categories))
+        rows, total = select_page(cols['date'].view(np.int64), cols['cents'], mask,
+                                  sort, descending, limit, offset)
+        return schema.display(self._canonical({c: cols[c][rows] for c in CANONICAL_FIELDS})), total
+
+    def rows(self, username: str) -> List[Dict]:
+        df = schema.display(self.frame(username))
+        df['amount'] = df['amount'].map(lambda a: f"{a:.2f}")
+        df['date'] = df['date'].map(lambda d: '' if pd.isna(d) else str(d))
+        return df.to_dict('records')
+
+    def totals_by_category(self, username: str, since=None) -> Dict[str, float]:
+        columns = ['category', 'cents'] if since is None else ['date', 'category', 'cents']
+        cols = self._scan(username, columns, since)
+        if not cols:
+            return {}
+        codes, uniques = pd.factorize(cols['category'])
+        return schema.totals(codes, cols['cents'], list(uniques))
+
+    def total_since(self, username: str, since) -> float:
+        cols = self._scan(username, ['date', 'cents'], since)
+        return int(cols['cents'].sum()) / 100 if cols else 0.0
+
+
+def open_expense_store(backend: str, path_for: Callable[[str], str], cache: LedgerCache,
+                       snapshot_for: Optional[Callable[[str], str]] = None):
+    """
+    `path_for(username)` is the ledger: a CSV file, or a directory of
+    partitions. `snapshot_for` places compacted CSV snapshots.
+    """
+    if backend == "csv":
+        return CsvExpenseStore(path_for, cache, snapshot_for)
+    if backend == "partitioned":
+        return PartitionedExpenseStore(path_for)
+    raise ValueError(f"Unknown expense backend: {backend}")
+
+
+def merge_ledger(backend: str, src: str, dst: str):
+    """Append every row of ledger `src` to ledger `dst` (same backend); `src` is left in place."""
+    if backend == "csv":
+        with open(src, 'rb') as f:
+            f.readline()  # header
+            data = f.read()
+        if data:
+            append_bytes(dst, data if data.endswith(b"\n") else data + b"\r\n", _HEADER)
+        return
+    df = PartitionedExpenseStore(lambda _: src).frame(None)
+    PartitionedExpenseStore(lambda _: dst).append_frame(None, pd.DataFrame({
+        'date': pd.to_datetime(df['date']),
+        'category': df['category'].astype(str),
+        'amount': df['cents'] / 100,
+        'description': df['description'].astype(str),
+    }))
+
+
+def convert_csv_ledger(csv_path: str, store: PartitionedExpenseStore, username: str, chunksize: int = 200000) -> int:
+    """Stream one legacy CSV ledger into the partitioned store. Returns rows converted."""
+    if os.path.exists(store.path(username)):
+        raise FileExistsError(f"{store.path(username)} already exists; refusing to convert twice")
+    converted = 0
+    for chunk in pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=chunksize):
+        chunk['amount'] = pd.to_numeric(chunk['amount'], errors='coerce').fillna(0.0)
+        chunk['date'] = pd.to_datetime(chunk['date'], errors='coerce')
+        store.append_frame(username, chunk[EXPENSE_FIELDS])
+        converted += len(chunk)
+    return converted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert CSV expense ledgers to the partitioned backend.")
+    parser.add_argument("data_dir", nargs="?", help="default: SPENDWISE_DATA_DIR")
+    args = parser.parse_args()
+    if args.data_dir:
+        os.environ["SPENDWISE_DATA_DIR"] = args.data_dir
+    from . import data_utils
+    from .shards import LEDGER_SUFFIXES
+    # Flat or sharded, wherever the layout puts each user's files.
+    csv_suffix, dir_suffix = LEDGER_SUFFIXES["csv"], LEDGER_SUFFIXES["partitioned"]
+    store = PartitionedExpenseStore(lambda u: data_utils.user_path(u, dir_suffix))
+    for username in data_utils._layout.scan(csv_suffix):
+        try:
+            n = convert_csv_ledger(data_utils.user_path(username, csv_suffix), store, username)
+            print(f"{username}: {n} rows")
+        except FileExistsError as e:
+            print(f"{username}: skipped ({e})")
+    if data_utils.EXPENSE_BACKEND == "partitioned":
+        print(f"indexed {data_utils.reindex_ledgers()} ledgers")
+    else:
+        # The manifest lists the CSV ledgers; processes on the partitioned
+        # backend see it as incomplete and reindex it on start.
+        print("set SPENDWISE_EXPENSE_BACKEND=partitioned to use the converted ledgers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+# utils/exports.py
+"""
+On-demand, streamed exports of ledgers, feedback and users.
+
+Each export is a generator of encoded bytes built from bounded chunks
+(a few MiB of ledger CSV, one feedback segment, EXPORT_CHUNK_ROWS users), so
+peak memory stays flat however large the data is:
+
+    csv       plain CSV, header first
+    csv.gz    the same through a streaming gzip compressor
+    parquet   one row group per chunk (needs pyarrow; offered only if installed)
+
+The HTTP API streams them straight to the client. Streamlit download buttons
+take a callable that builds the export into a temp file only when clicked.
+
+`start_export_all` runs the admin "export everything" job on a background
+thread: every user's ledger, in one format, as members of a tar archive in
+DATA_DIR/exports. Progress is kept in `exports/job.json`, so any worker can
+show it, and the archive appears under its final name only once complete.
+
+    python -m utils.exports all --format csv.gz      # run the job here, printing progress
+    python -m utils.exports status
+"""
+import os
+import json
+import time
+import zlib
+import tarfile
+import argparse
+import tempfile
+import threading
+import logging
+import importlib.util
+from typing import Dict, Iterable, Iterator, Optional
+
+from .config import EXPORT_CHUNK_BYTES, EXPORT_CHUNK_ROWS, EXPORT_KEEP
+from .file_io import atomic_write, file_lock
+from .perf import timed
+
+log = logging.getLogger(__name__)
+
+# name -> (file suffix, MIME type)
+FORMATS = {
+    "csv": (".csv", "text/csv"),
+    "csv.gz": (".csv.gz", "application/gzip"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+# A job whose status has not moved for this long died with its process.
+STALE_S = 120.0
+# Status is rewritten at most this often while a job runs.
+PROGRESS_EVERY_S = 1.0
+
+
+def formats():
+    """Formats this install can write."""
+    return [f for f in FORMATS if f != "parquet" or importlib.util.find_spec("pyarrow") is not None]
+
+
+def file_name(stem: str, fmt: str) -> str:
+    return stem + FORMATS[fmt][0]
+
+
+def mime(fmt: str) -> str:
+    return FORMATS[fmt][1]
+
+
+def _csv(frames) -> Iterator[bytes]:
+    header = True
+    for df in frames:
+        yield df.to_csv(index=False, header=header, date_format="%Y-%m-%d").encode("utf-8")
+        header = False
+
+
+def _gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
+
+
+class _Drain:
+    """Write-only file that hands over what was written since the last drain."""
+
+    def __init__(self):
+        self._parts = []
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _parquet(frames) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    sink, writer = _Drain(), None
+    for df in frames:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema, compression="zstd")
+        elif table.schema != writer.schema:
+            table = table.cast(writer.schema)  # e.g. an all-null column in one chunk
+        writer.write_table(table)
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+def encode(frames, fmt: str) -> Iterator[bytes]:
+    """Encode an iterable of same-column DataFrames in `fmt`, chunk by chunk."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    if fmt == "parquet":
+        if "parquet" not in formats():
+            raise ValueError("parquet exports need pyarrow installed")
+        return _parquet(frames)
+    chunks = _csv(frames)
+    return _gzip(chunks) if fmt == "csv.gz" else chunks
+
+
+def _expense_frames(username: str) -> Iterator:
+    import pandas as pd
+    from .data_utils import iter_expenses
+    from . import expense_schema as schema
+    empty = True
+    for df in iter_expenses(username, EXPORT_CHUNK_BYTES):
+        empty = False
+        yield pd.DataFrame({
+            'date': df['date'].to_numpy(),
+            'category': df['category'].astype(str).to_numpy(),
+            'amount': df['cents'].to_numpy() / 100,
+            'description': df['description'].astype(str).to_numpy(),
+        })
+    if empty:
+        yield pd.DataFrame({
+            'date': schema.empty()['date'], 'category': pd.Series([], dtype=object),
+            'amount': pd.Series([], dtype='float64'), 'description': pd.Series([], dtype=object),
+        })
+
+
+def _record_frames(chunks, columns, dtypes) -> Iterator:
+    import pandas as pd
+    empty = True
+    for rows in chunks:
+        empty = False
+        yield pd.DataFrame.from_records(rows, columns=columns).astype(dtypes)
+    if empty:
+        yield pd.DataFrame(columns=columns).astype(dtypes)
+
+
+def expenses(username: str, fmt: str = "csv") -> Iterator[bytes]:
+    """One user's ledger: date, category, amount, description."""
+    return encode(_expense_frames(username), fmt)
+
+
+def feedback(fmt: str = "csv") -> Iterator[bytes]:
+    from .data_utils import iter_feedback
+    from .feedback_log import FEEDBACK_FIELDS
+    return encode(_record_frames(iter_feedback(), FEEDBACK_FIELDS, {'rating': 'Int64'}), fmt)
+
+
+def users(fmt: str = "csv") -> Iterator[bytes]:
+    from .data_utils import iter_users
+    from .user_store import USER_FIELDS
+    return encode(_record_frames(iter_users(EXPORT_CHUNK_ROWS), USER_FIELDS,
+                                 {'goal': 'float64', 'activated': 'bool'}), fmt)
+
+
+def to_file(chunks: Iterable[bytes]):
+    """
+    Spool an export to an anonymous temp file; returns it open for reading
+    from the start. For st.download_button, which takes a file but no
+    iterator.
+    """
+    fd, path = tempfile.mkstemp(prefix="spendwise-export-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in chunks:
+                out.write(chunk)
+        return open(path, "rb")
+    finally:
+        os.unlink(path)  # the open reader keeps the data until it is closed
+
+
+# The "export everything" job
+def _exports_dir() -> str:
+    from .data_utils import DATA_DIR
+    path = os.path.join(DATA_DIR, "exports")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _status_path() -> str:
+    return os.path.join(_exports_dir(), "job.json")
+
+
+def _save_status(status: Dict):
+    status["updated"] = time.time()
+    with atomic_write(_status_path(), encoding="utf-8") as f:
+        json.dump(status, f)
+
+
+def job_status() -> Optional[Dict]:
+    """The latest job's progress, or None if none ever ran. A running job that stopped reporting shows as `interrupted`."""
+    try:
+        with open(_status_path(), encoding="utf-8") as f:
+            status = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if status["state"] == "running" and time.time() - status["updated"] > STALE_S:
+        status["state"] = "interrupted"
+    return status
+
+
+def _prune(keep: int):
+    root = _exports_dir()
+    archives = sorted(n for n in os.listdir(root) if n.startswith("spendwise-") and n.endswith(".tar"))
+    for name in archives[:-max(1, keep)]:
+        os.unlink(os.path.join(root, name))
+
+
+@timed("export.all")
+def _run_job(status: Dict):
+    from .data_utils import list_expense_users
+    fmt = status["format"]
+    final = os.path.join(_exports_dir(), status["name"])
+    partial = final + ".partial"
+    try:
+        names = list_expense_users()
+        status["users_total"] = len(names)
+        _save_status(status)
+        last = time.monotonic()
+        with tarfile.open(partial, "w") as tar:
+            for username in names:
+                # Each member is spooled to disk first: tar needs its size up front.
+                with to_file(expenses(username, fmt)) as member:
+                    info = tarfile.TarInfo(f"ledgers/{file_name(username, fmt)}")
+                    info.size = os.fstat(member.fileno()).st_size
+                    info.mtime = int(time.time())
+                    tar.addfile(info, member)
+                status["users_done"] += 1
+                status["bytes"] += info.size
+                if time.monotonic() - last >= PROGRESS_EVERY_S:
+                    last = time.monotonic()
+                    _save_status(status)
+        os.replace(partial, final)
+        status.update(state="done", finished=time.time(), path=final)
+        _prune(EXPORT_KEEP)
+    except Exception as e:
+        log.exception("export job failed")
+        status.update(state="failed", finished=time.time(), error=f"{type(e).__name__}: {e}")
+        try:
+            os.unlink(partial)
+        except FileNotFoundError:
+            pass
+    finally:
+        _save_status(status)
+
+
+def start_export_all(fmt: str = "csv.gz") -> Dict:
+    """
+    Start the export-everything job on a background thread unless one is
+    already running (in any process). Returns the job's status.
+    """
+    if fmt not in formats():
+        raise ValueError(f"format must be one of {', '.join(formats())}")
+    with file_lock(_status_path()):
+        current = job_status()
+        if current is not None and current["state"] == "running":
+            return current
+        started = time.time()
+        status = {
+            "id": int(started * 1000), "format": fmt, "state": "running", "pid": os.getpid(),
+            "name": f"spendwise-{time.strftime('%Y%m%d-%H%M%S', time.localtime(started))}-{fmt}.tar",
+            "users_done": 0, "users_total": None, "bytes": 0,
+            "started": started, "finished": None, "path": None, "error": None,
+        }
+        _save_status(status)
+    threading.Thread(target=_run_job, args=(status,), name="export-all", daemon=True).start()
+    return status
+
+
+def follow(every: float = 1.0) -> Dict:
+    """Print the running job's progress until it ends; returns its final status."""
+    while True:
+        time.sleep(every)
+        status = job_status()
+        print(f"{status['state']}: {status['users_done']}/{status['users_total'] or '?'} ledgers, "
+              f"{status['bytes'] / 2**20:.1f} MiB", flush=True)
+        if status["state"] != "running":
+            return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export every user's ledger into one tar archive.")
+    parser.add_argument("command", choices=["all", "status"])
+    parser.add_argument("--format", default="csv.gz", choices=list(FORMATS))
+    args = parser.parse_args()
+    if args.command == "all":
+        start_export_all(args.format)
+        status = follow()
+        if status["state"] != "done":
+            raise SystemExit(status["error"] or status["state"])
+        print(status["path"])
+    else:
+        print(json.dumps(job_status(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
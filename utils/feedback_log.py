@@ -0,0 +1,189 @@
+# utils/feedback_log.py
+import os
+import io
+import csv
+import json
+import threading
+from typing import Dict, Iterator, List, Optional
+
+from .file_io import append_bytes, atomic_write, file_lock
+
+FEEDBACK_FIELDS = ['timestamp','username','rating','feedback']
+RATING_KEYS = ["1", "2", "3", "4", "5", "none"]
+
+
+def _parse_rating(value) -> Optional[int]:
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _normalize(r: Dict) -> Dict:
+    r.setdefault('timestamp', '')
+    r['timestamp'] = r['timestamp'] or ''
+    r['rating'] = _parse_rating(r.get('rating'))
+    return r
+
+
+def _empty_index() -> Dict:
+    return {"count": 0, "bytes": 0, "t_min": None, "t_max": None, "ratings": {k: 0 for k in RATING_KEYS}}
+
+
+def _index_add(index: Dict, row: Dict):
+    index["count"] += 1
+    ts = row.get('timestamp') or None
+    if ts:
+        index["t_min"] = ts if index["t_min"] is None else min(index["t_min"], ts)
+        index["t_max"] = ts if index["t_max"] is None else max(index["t_max"], ts)
+    rating = _parse_rating(row.get('rating'))
+    key = str(rating) if rating is not None and str(rating) in index["ratings"] else "none"
+    index["ratings"][key] += 1
+
+
+class FeedbackLog:
+    """
+    Append-only feedback store split into size-rotated CSV segments
+    (`seg-000001.csv`, ...). Each segment has a small JSON index with its row
+    count, byte size, timestamp range and rating histogram, so the admin view
+    can summarize ratings and page newest-first by reading only the segments
+    a page actually falls in.
+    """
+
+    def __init__(self, root: str, legacy_csv: str, segment_bytes: int):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self._lock = threading.RLock()
+        self._sealed_totals = None  # (n_sealed, count, ratings) cache
+        os.makedirs(root, exist_ok=True)
+        if os.path.exists(legacy_csv) and not self.segments():
+            self._adopt(legacy_csv)
+
+    def _adopt(self, legacy_csv: str):
+        # One-time adoption of the old single feedback.csv as segment 0, under
+        # the append lock: workers starting together race to it, and the
+        # loser finds the file already moved.
+        with self._lock, file_lock(os.path.join(self.root, "append")):
+            if self.segments():
+                return
+            try:
+                os.replace(legacy_csv, self._seg_path(0))
+            except FileNotFoundError:
+                return
+            self._rebuild_index(0)
+
+    def _seg_path(self, n: int) -> str:
+        return os.path.join(self.root, f"seg-{n:06d}.csv")
+
+    def _idx_path(self, n: int) -> str:
+        return os.path.join(self.root, f"seg-{n:06d}.idx.json")
+
+    def segments(self) -> List[int]:
+        return sorted(
+            int(name[4:10]) for name in os.listdir(self.root)
+            if name.startswith("seg-") and name.endswith(".csv")
+        )
+
+    def _read_rows(self, n: int) -> List[Dict]:
+        with open(self._seg_path(n), newline='', encoding='utf-8') as f:
+            return [_normalize(r) for r in csv.DictReader(f)]
+
+    def _rebuild_index(self, n: int) -> Dict:
+        # Count exactly the bytes read, so an append racing this rebuild shows
+        # up as a size mismatch on the next lookup rather than a wrong count.
+        with open(self._seg_path(n), 'rb') as f:
+            data = f.read()
+        index = _empty_index()
+        for row in csv.DictReader(io.StringIO(data.decode('utf-8', errors='replace'), newline='')):
+            _index_add(index, _normalize(row))
+        index["bytes"] = len(data)
+        self._save_index(n, index)
+        return index
+
+    def _save_index(self, n: int, index: Dict):
+        with atomic_write(self._idx_path(n), encoding="utf-8") as f:
+            json.dump(index, f)
+
+    def index(self, n: int) -> Dict:
+        try:
+            with open(self._idx_path(n), encoding="utf-8") as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return self._rebuild_index(n)
+        if index.get("bytes") != os.path.getsize(self._seg_path(n)):
+            # Segment grew without its index being updated (e.g. another
+            # process crashed mid-append); segments are bounded, so rescan.
+            return self._rebuild_index(n)
+        return index
+
+    def append(self, row: Dict):
+        # Segment choice, the row write and the index update form one unit
+        # across processes, under a lock on the log directory.
+        with self._lock, file_lock(os.path.join(self.root, "append")):
+            segs = self.segments()
+            n = segs[-1] if segs else 1
+            if segs and os.path.getsize(self._seg_path(n)) >= self.segment_bytes:
+                n += 1
+            index = self.index(n) if os.path.exists(self._seg_path(n)) else _empty_index()
+            header = io.StringIO()
+            csv.DictWriter(header, fieldnames=FEEDBACK_FIELDS).writeheader()
+            buf = io.StringIO()
+            csv.DictWriter(buf, fieldnames=FEEDBACK_FIELDS).writerow(row)
+            _, after = append_bytes(self._seg_path(n), buf.getvalue().encode('utf-8'),
+                                    header.getvalue().encode('utf-8'))
+            _index_add(index, row)
+            index["bytes"] = after[0]
+            self._save_index(n, index)
+
+    def summary(self) -> Dict:
+        """Total count and rating histogram, from segment indexes only."""
+        with self._lock:
+            segs = self.segments()
+            sealed = segs[:-1]
+            if self._sealed_totals is None or self._sealed_totals[0] != len(sealed):
+                count, ratings = 0, {k: 0 for k in RATING_KEYS}
+                for n in sealed:
+                    idx = self.index(n)
+                    count += idx["count"]
+                    for k in RATING_KEYS:
+                        ratings[k] += idx["ratings"].get(k, 0)
+                self._sealed_totals = (len(sealed), count, ratings)
+            _, count, ratings = self._sealed_totals
+            ratings = dict(ratings)
+            if segs:
+                idx = self.index(segs[-1])
+                count += idx["count"]
+                for k in RATING_KEYS:
+                    ratings[k] += idx["ratings"].get(k, 0)
+        rated = sum(ratings[k] for k in RATING_KEYS[:5])
+        avg = sum(int(k) * ratings[k] for k in RATING_KEYS[:5]) / rated if rated else None
+        return {"count": count, "ratings": ratings, "average": avg}
+
+    def page(self, offset: int = 0, limit: int = 50) -> List[Dict]:
+        """Rows newest-first, skipping whole segments by their indexed counts."""
+        out = []
+        for n in reversed(self.segments()):
+            if len(out) >= limit:
+                break
+            count = self.index(n)["count"]
+            if offset >= count:
+                offset -= count
+                continue
+            rows = self._read_rows(n)[::-1]
+            take = rows[offset:offset + limit - len(out)]
+            out.extend(take)
+            offset = 0
+        return out
+
+    def iter_segments(self) -> Iterator[List[Dict]]:
+        """Rows oldest first, one segment (about segment_bytes) at a time, for exports."""
+        for n in self.segments():
+            yield self._read_rows(n)
+
+    def read_all(self) -> List[Dict]:
+        rows = []
+        for n in self.segments():
+            rows.extend(self._read_rows(n))
+        return rows
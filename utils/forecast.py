@@ -0,0 +1,234 @@
+# utils/forecast.py
+"""
+Month-end spend forecasts and goal pace.
+
+Works off the per-day totals the rollup keeps up to date on every append, so
+a forecast never rescans the ledger. For the current month it projects the
+remaining days two ways:
+
+  rolling  the mean daily spend over the last 7, 28 and 91 days
+  weekday  the mean spend per weekday over the history window, summed over
+           the weekdays still to come (the headline `projected` figure)
+
+and bootstraps the remaining days from past days with the same weekday to
+get a p10-p90 band and the probability of finishing within the profile
+goal (the dashboard treats `goal` as the month's spending limit).
+
+Results are cached per user on the ledger signature, goal and date, so they
+hold until the next write, in this process and in the shared cache other
+workers read. `forecast_all` recomputes every user over a process pool:
+
+    python -m utils.forecast --out forecasts.json
+"""
+import json
+import time
+import argparse
+import datetime
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from cachetools import LRUCache
+
+from .config import (
+    FORECAST_WINDOW_DAYS, FORECAST_SIMULATIONS, FORECAST_WORKERS, FORECAST_CACHE_SIZE, SHARED_CACHE_WARM,
+)
+from .data_utils import daily_spend, expense_signature, get_user, list_expense_users, shared_cache
+from .perf import timed
+
+ROLLING_WINDOWS = (7, 28, 91)
+
+
+def series(days: Dict[str, int], start: np.datetime64, end: np.datetime64) -> np.ndarray:
+    """Cents per day over [start, end), zero on days without expenses."""
+    out = np.zeros(max(0, int((end - start).astype(np.int64))), dtype=np.int64)
+    if days and len(out):
+        keys = (np.array(list(days), dtype='datetime64[D]') - start).astype(np.int64)
+        cents = np.fromiter(days.values(), dtype=np.int64, count=len(days))
+        inside = (keys >= 0) & (keys < len(out))
+        out[keys[inside]] = cents[inside]  # one entry per day, no collisions
+    return out
+
+
+def weekdays(start: np.datetime64, n: int) -> np.ndarray:
+    """Monday=0 weekday of `n` consecutive days from `start`."""
+    # 1970-01-01 was a Thursday.
+    return (start.astype(np.int64) + np.arange(n) + 3) % 7
+
+
+def forecast(days: Dict[str, int], goal: float, today: datetime.date,
+             window: int = FORECAST_WINDOW_DAYS, simulations: int = FORECAST_SIMULATIONS) -> Dict:
+    """Forecast for the month containing `today` from {'YYYY-MM-DD': cents}. Amounts in dollars."""
+    today = np.datetime64(today, 'D')
+    month = today.astype('datetime64[M]')
+    month_start = month.astype('datetime64[D]')
+    month_end = (month + 1).astype('datetime64[D]')
+
+    # History is complete days before today, no earlier than the first expense
+    # (days before someone started logging are not zero-spend days).
+    first = np.datetime64(min(days), 'D') if days else today
+    hist_start = max(today - window, first)
+    history = series(days, hist_start, today)
+    # Entries dated later this month count as already spent, as on the dashboard.
+    spent = int(series(days, month_start, month_end).sum())
+    remaining = int((month_end - today).astype(np.int64)) - 1
+    ahead = weekdays(today + 1, remaining)
+
+    n = len(history)
+    rolling = {}
+    if n:
+        recent = np.cumsum(history[::-1])
+        for w in ROLLING_WINDOWS:
+            k = min(w, n)
+            rolling[f"{w}d"] = round(float(spent + recent[k - 1] / k * remaining) / 100, 2)
+
+    result = {
+        "month": str(month),
+        "day": int((today - month_start).astype(np.int64)) + 1,
+        "days_in_month": int((month_end - month_start).astype(np.int64)),
+        "history_days": n,
+        "spent": spent / 100,
+        "projected": spent / 100,
+        "rolling": rolling,
+        "low": spent / 100,
+        "high": spent / 100,
+        "goal": goal,
+        "p_within_goal": None,
+    }
+    if not n or not remaining:
+        if goal > 0 and not remaining:
+            result["p_within_goal"] = float(spent <= goal * 100)
+        return result
+
+    hist_wd = weekdays(hist_start, n)
+    counts = np.bincount(hist_wd, minlength=7)
+    if not counts.all():
+        # Under a week of history: no per-weekday shape yet, pool every day.
+        hist_wd = np.zeros(n, dtype=np.int64)
+        ahead = np.zeros(remaining, dtype=np.int64)
+        counts = np.bincount(hist_wd, minlength=7)
+    means = np.bincount(hist_wd, weights=history, minlength=7) / np.maximum(counts, 1)
+    result["projected"] = round(float(spent + means[ahead].sum()) / 100, 2)
+
+    # Bootstrap: each remaining day draws a past day with the same weekday.
+    order = np.argsort(hist_wd, kind='stable')
+    pooled = history[order]
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rng = np.random.default_rng(0)  # fixed so a cached forecast is reproducible
+    picks = starts[ahead] + (rng.random((simulations, remaining)) * counts[ahead]).astype(np.int64)
+    totals = spent + pooled[picks].sum(axis=1)
+    low, high = np.percentile(totals, [10, 90])
+    result["low"] = round(float(low) / 100, 2)
+    result["high"] = round(float(high) / 100, 2)
+    if goal > 0:
+        result["p_within_goal"] = round(float(np.mean(totals <= round(goal * 100))), 3)
+    return result
+
+
+def _goal(username: str) -> float:
+    return float((get_user(username) or {}).get("goal", 0.0) or 0.0)
+
+
+def _key(username: str, today: datetime.date) -> Tuple:
+    return (json.dumps(expense_signature(username)), _goal(username), today)
+
+
+def _version(key: Tuple) -> str:
+    return json.dumps([key[0], key[1], key[2].isoformat()])
+
+
+_cache = LRUCache(maxsize=FORECAST_CACHE_SIZE)
+_cache_lock = threading.Lock()
+
+
+@timed("forecast.user")
+def _compute(username: str, key: Tuple) -> Dict:
+    return forecast(daily_spend(username), key[1], key[2])
+
+
+def month_forecast(username: str, today: Optional[datetime.date] = None) -> Dict:
+    """This month's forecast for one user, recomputed only after a write (or a goal/day change)."""
+    key = _key(username, today or datetime.date.today())
+    version = _version(key)
+    with _cache_lock:
+        cached = _cache.get(username)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    shared = shared_cache()
+    result = shared.get_json("forecast", username, version) if shared is not None else None
+    if result is None:
+        result = _compute(username, key)
+        if shared is not None:
+            shared.put_json("forecast", username, result, version, owner=username)
+    with _cache_lock:
+        _cache[username] = (version, result)
+    return result
+
+
+def warm(limit: int) -> int:
+    """Fill this process's cache with the most recently used shared forecasts. Returns entries loaded."""
+    shared = shared_cache()
+    if shared is None:
+        return 0
+    rows = shared.hottest("forecast", limit)
+    with _cache_lock:
+        for username, version, value in rows:
+            _cache.setdefault(username, (version, json.loads(value)))
+    return len(rows)
+
+
+# A fresh worker starts with the forecasts its siblings already computed.
+warm(SHARED_CACHE_WARM)
+
+
+def forecast_batch(usernames: List[str], today: datetime.date) -> List[Tuple[str, Tuple, Dict]]:
+    """Worker task: (username, cache key, forecast) for a batch of users."""
+    out = []
+    for username in usernames:
+        key = _key(username, today)
+        out.append((username, key, _compute(username, key)))
+    return out
+
+
+def forecast_all(today: Optional[datetime.date] = None, workers: int = FORECAST_WORKERS) -> Dict[str, Dict]:
+    """Recompute every user's forecast across `workers` processes; also refreshes this process's and the shared cache."""
+    today = today or datetime.date.today()
+    usernames = list_expense_users()
+    if workers <= 1 or len(usernames) < 2 * workers:
+        parts = forecast_batch(usernames, today)
+    else:
+        # A few batches per worker keeps every core busy to the end.
+        size = -(-len(usernames) // (workers * 4))
+        batches = [usernames[i:i + size] for i in range(0, len(usernames), size)]
+        # spawn: forking a threaded Streamlit server is not safe.
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            parts = [p for batch in pool.map(forecast_batch, batches, [today] * len(batches)) for p in batch]
+    with _cache_lock:
+        for username, key, result in parts:
+            _cache[username] = (_version(key), result)
+    shared = shared_cache()
+    if shared is not None:
+        shared.put_many("forecast", (
+            (username, json.dumps(result).encode("utf-8"), _version(key), username) for username, key, result in parts
+        ))
+    return {username: result for username, _, result in parts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute month-end forecasts for every user.")
+    parser.add_argument("--workers", type=int, default=FORECAST_WORKERS)
+    parser.add_argument("--out", help="write {username: forecast} JSON here")
+    args = parser.parse_args()
+    t0 = time.perf_counter()
+    results = forecast_all(workers=args.workers)
+    at_risk = sum(1 for r in results.values() if r["p_within_goal"] is not None and r["p_within_goal"] < 0.5)
+    print(f"{len(results)} forecasts in {time.perf_counter() - t0:.1f}s; {at_risk} users likely over goal")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# utils/importer.py
+import io
+import re
+import sys
+import argparse
+from collections import Counter
+from typing import Callable, Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from .categorizer import categorize_frame
+from .config import CATEGORIES, MAX_EXPENSE_AMOUNT
+from .data_utils import expenses_df, log_expenses_frame
+from .expense_schema import to_cents, to_dates
+
+CHUNK_ROWS = 50000
+
+_DATE_COLS = ("date", "transaction date", "posted date", "posting date", "booking date", "value date")
+_DESC_COLS = ("description", "memo", "payee", "name", "details", "narrative", "merchant")
+_AMOUNT_COLS = ("amount", "value", "transaction amount")
+_DEBIT_COLS = ("debit", "withdrawal", "withdrawals", "money out")
+_CATEGORY_COLS = ("category",)
+
+_CURRENCY = r"[$€£¥₹\s]"
+# Optional sign, digits with optional thousands commas, optional decimals.
+_AMOUNT = r"[-+]?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?"
+_OFX_TXN = re.compile(r"<STMTTRN>(.*?)</STMTTRN>", re.IGNORECASE | re.DOTALL)
+_OFX_FIELD = re.compile(r"<(DTPOSTED|TRNAMT|NAME|MEMO)>([^<\r\n]*)", re.IGNORECASE)
+
+
+def _pick(columns, candidates) -> Optional[str]:
+    lowered = {c.strip().lower(): c for c in columns}
+    for cand in candidates:
+        if cand in lowered:
+            return lowered[cand]
+    return None
+
+
+def parse_amounts(raw: pd.Series) -> pd.Series:
+    """
+    '$1,234.50', '-12.00', '(12.00)' -> float. Anything else ('1e12',
+    '1.234,50', '12 USD 3') -> NaN, so the row is rejected rather than
+    imported as some other amount.
+    """
+    s = raw.astype(str).str.strip()
+    negative = s.str.startswith("(") & s.str.endswith(")")
+    s = s.str.replace(r"^\((.*)\)$", r"\1", regex=True).str.replace(_CURRENCY, "", regex=True)
+    s = s.where(s.str.fullmatch(_AMOUNT)).str.replace(",", "", regex=False)
+    values = pd.to_numeric(s, errors="coerce")
+    return values.where(~negative, -values.abs())
+
+
+def iter_csv_chunks(fileobj, chunksize: int = CHUNK_ROWS, signed: bool = False, dayfirst: bool = False) -> Iterator[pd.DataFrame]:
+    """
+    Yield raw chunks of a bank CSV as frames with `date`, `amount`,
+    `description` and optional `category`. With `signed`, negative amounts
+    are spending and positive ones (credits) are dropped.
+    """
+    for chunk in pd.read_csv(fileobj, dtype=str, keep_default_na=False, chunksize=chunksize, skipinitialspace=True):
+        date_col = _pick(chunk.columns, _DATE_COLS)
+        desc_col = _pick(chunk.columns, _DESC_COLS)
+        debit_col = _pick(chunk.columns, _DEBIT_COLS)
+        amount_col = _pick(chunk.columns, _AMOUNT_COLS)
+        cat_col = _pick(chunk.columns, _CATEGORY_COLS)
+        if date_col is None or (amount_col is None and debit_col is None):
+            raise ValueError(f"Unrecognized statement columns: {list(chunk.columns)}")
+        if debit_col is not None:
+            amount = parse_amounts(chunk[debit_col]).abs()
+        else:
+            amount = parse_amounts(chunk[amount_col])
+            amount = (-amount).where(amount < 0) if signed else amount.abs()
+        yield pd.DataFrame({
+            "date": pd.to_datetime(chunk[date_col], errors="coerce", dayfirst=dayfirst),
+            "amount": amount,
+            "description": chunk[desc_col] if desc_col else "",
+            "category": chunk[cat_col] if cat_col else "",
+        })
+
+
+def iter_ofx_chunks(fileobj, chunksize: int = CHUNK_ROWS, block_chars: int = 1 << 20) -> Iterator[pd.DataFrame]:
+    """Stream <STMTTRN> records out of an OFX/QFX file without loading it whole. Debits only."""
+    if isinstance(fileobj, (io.RawIOBase, io.BufferedIOBase)) or hasattr(fileobj, "getbuffer"):
+        fileobj = io.TextIOWrapper(fileobj, encoding="utf-8", errors="replace")
+    rows = []
+    buf = ""
+    while True:
+        block = fileobj.read(block_chars)
+        buf += block
+        last = 0
+        for m in _OFX_TXN.finditer(buf):
+            fields = {k.upper(): v.strip() for k, v in _OFX_FIELD.findall(m.group(1))}
+            rows.append((fields.get("DTPOSTED", "")[:8], fields.get("TRNAMT", ""), fields.get("NAME") or fields.get("MEMO", "")))
+            last = m.end()
+        buf = buf[last:]
+        if len(rows) >= chunksize or (not block and rows):
+            raw = pd.DataFrame(rows, columns=["date", "amount", "description"])
+            rows = []
+            amount = parse_amounts(raw["amount"])
+            yield pd.DataFrame({
+                "date": pd.to_datetime(raw["date"], format="%Y%m%d", errors="coerce"),
+                "amount": (-amount).where(amount < 0),
+                "description": raw["description"],
+                "category": "",
+            })
+        if not block:
+            break
+
+
+def row_hashes(dates: pd.Series, cents: np.ndarray, descriptions: pd.Series) -> np.ndarray:
+    """Stable uint64 hash of (day, cents, normalized description) used for de-duplication."""
+    key = pd.DataFrame({
+        "d": to_dates(dates).view(np.int64),
+        "c": np.asarray(cents, dtype=np.int64),
+        "t": descriptions.astype(str).str.strip().str.lower().str.replace(r"\s+", " ", regex=True).to_numpy(),
+    })
+    return pd.util.hash_pandas_object(key, index=False).to_numpy()
+
+
+def import_statement(username: str, fileobj, fmt: str = "csv", chunksize: int = CHUNK_ROWS,
+                     signed: bool = False, dayfirst: bool = False,
+                     categorize: Optional[Callable[[str, pd.DataFrame], pd.Series]] = categorize_frame,
+                     progress: Optional[Callable[[Dict], None]] = None) -> Dict[str, int]:
+    """
+    Validate, de-duplicate and append a bank statement to a user's ledger,
+    one batched write per chunk. Rows without a valid category column are
+    auto-categorized. Returns counts of rows read, imported, skipped as
+    duplicates of rows already in the ledger and rejected as invalid.
+    """
+    existing = expenses_df(username)
+    # Ledger rows not yet matched by a statement row, per hash. Identical rows
+    # are real (two coffees on one day), so only as many repeats as the
+    # ledger already has count as duplicates.
+    unmatched = Counter(row_hashes(existing["date"], existing["cents"], existing["description"]).tolist()) \
+        if not existing.empty else Counter()
+    del existing
+
+    chunks = iter_ofx_chunks(fileobj, chunksize) if fmt in ("ofx", "qfx") else \
+        iter_csv_chunks(fileobj, chunksize, signed=signed, dayfirst=dayfirst)
+    report = {"read": 0, "imported": 0, "duplicates": 0, "rejected": 0}
+    for chunk in chunks:
+        report["read"] += len(chunk)
+        valid = chunk["date"].notna() & (chunk["amount"] > 0) & (chunk["amount"] <= MAX_EXPENSE_AMOUNT)
+        report["rejected"] += int((~valid).sum())
+        chunk = chunk[valid].reset_index(drop=True)
+        chunk["description"] = chunk["description"].astype(str).str.strip()
+
+        hashes = row_hashes(chunk["date"], to_cents(chunk["amount"]), chunk["description"])
+        fresh = np.ones(len(hashes), dtype=bool)
+        for i, h in enumerate(hashes.tolist()):
+            if unmatched[h] > 0:
+                unmatched[h] -= 1
+                fresh[i] = False
+        report["duplicates"] += int((~fresh).sum())
+        chunk = chunk[fresh].reset_index(drop=True)
+        if chunk.empty:
+            continue
+
+        category = chunk["category"].where(chunk["category"].isin(CATEGORIES), "")
+        if categorize is not None:
+            category = category.where(category != "", categorize(username, chunk))
+        chunk["category"] = category.where(category != "", "Other")
+        chunk["amount"] = chunk["amount"].round(2)
+        log_expenses_frame(username, chunk[["date", "category", "amount", "description"]])
+        report["imported"] += len(chunk)
+        if progress is not None:
+            progress(dict(report))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-import a bank statement into a user's expense ledger.")
+    parser.add_argument("username")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ofx", "qfx"], help="default: from file extension")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--signed", action="store_true", help="negative amounts are spending; drop credits")
+    parser.add_argument("--dayfirst", action="store_true", help="parse 03/04/2024 as 3 April")
+    args = parser.parse_args()
+    fmt = args.format or args.path.rsplit(".", 1)[-1].lower()
+    with open(args.path, "rb") as f:
+        report = import_statement(
+            args.username, f, fmt=fmt, chunksize=args.chunksize, signed=args.signed, dayfirst=args.dayfirst,
+            progress=lambda r: print(f"  {r['read']} read, {r['imported']} imported", file=sys.stderr),
+        )
+    print(f"read {report['read']}, imported {report['imported']}, "
+          f"duplicates {report['duplicates']}, rejected {report['rejected']}")
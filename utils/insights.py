@@ -0,0 +1,343 @@
+# utils/insights.py
+"""
+Recurring charges and unusual expenses, per user.
+
+Findings live next to the ledger as `<username>_insights.json` and follow the
+rollup protocol (see rollups.RollupStore): `log_expense` folds just the
+appended rows in and advances the stored ledger signature; if the ledger
+changed any other way the file is rebuilt from the whole ledger on next read.
+
+  recurring  descriptions are normalized to merchant keys (store numbers
+             collapse, see categorizer.merchant_keys) and the last TAIL
+             charges per merchant are kept. A merchant is recurring when the
+             gaps between its charges sit on a weekly, monthly, quarterly or
+             yearly cycle and the amount barely moves.
+  anomalies  each expense is scored against its category's history up to
+             that point (running count, sum and sum of squares); z of at
+             least INSIGHT_Z over INSIGHT_MIN_HISTORY earlier expenses is
+             flagged.
+
+A rebuild is a fold of the whole ledger, in date order, into empty state, so
+both paths share the same vectorized code. Scores depend on that order, so
+an append holding a row dated before the newest one already folded in (a
+backdated entry) is not folded; the file goes stale and is rebuilt instead.
+
+    python -m utils.insights      # refresh every user, e.g. nightly from cron
+"""
+import json
+import time
+import argparse
+import datetime
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from cachetools import LRUCache
+
+from .categorizer import merchant_keys
+from .config import INSIGHT_Z, INSIGHT_MIN_HISTORY, INSIGHT_WORKERS
+from .data_utils import list_expense_users, spending_insights
+from .expense_schema import NAT, date_keys, to_cents, to_dates
+from .file_io import atomic_write, file_lock
+from .perf import timed
+from .rollups import _file_version
+
+INSIGHTS_VERSION = 2
+TAIL = 12            # most recent charges kept per merchant
+MIN_CHARGES = 3
+MAX_AMOUNT_CV = 0.25
+# cycle: (mean gap in days, allowed drift of the mean gap and its spread)
+CYCLES = {"weekly": (7.0, 1.5), "monthly": (30.4, 3.5), "quarterly": (91.3, 8.0), "yearly": (365.25, 12.0)}
+MAX_ANOMALIES = 50
+RECENT_ANOMALY_DAYS = 60
+
+
+def _empty() -> Dict:
+    return {"version": INSIGHTS_VERSION, "signature": None, "last_date": None,
+            "categories": {}, "merchants": {}, "recurring": {}, "anomalies": []}
+
+
+def _day(ordinal: int) -> str:
+    return str(np.datetime64(int(ordinal), 'D'))
+
+
+def _group_starts(sorted_codes: np.ndarray) -> np.ndarray:
+    return np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+
+
+def _scores(codes: np.ndarray, cents: np.ndarray, prior: np.ndarray) -> np.ndarray:
+    """
+    z of each amount against the earlier rows of its category (in row order)
+    plus `prior`, a [count, sum, sum of squares] row per category code.
+    """
+    order = np.argsort(codes, kind='stable')
+    c, x = codes[order], cents[order].astype(np.float64)
+    idx = np.arange(len(c))
+    first = np.maximum.accumulate(np.where(np.r_[True, c[1:] != c[:-1]], idx, 0))
+
+    def before(v):
+        # Exclusive running sum within each category.
+        excl = np.cumsum(v) - v
+        return excl - excl[first]
+
+    n = idx - first + prior[c, 0]
+    mean = (before(x) + prior[c, 1]) / np.maximum(n, 1)
+    std = np.sqrt(np.maximum((before(x * x) + prior[c, 2]) / np.maximum(n, 1) - mean ** 2, 0))
+    ok = (n >= INSIGHT_MIN_HISTORY) & (std > 0)
+    z = np.zeros(len(c))
+    z[order[ok]] = (x[ok] - mean[ok]) / std[ok]
+    return z
+
+
+def _recurring(keys: np.ndarray, days: np.ndarray, cents: np.ndarray, labels: np.ndarray) -> Dict[str, Dict]:
+    """Recurring merchants among rows sorted by (merchant, day)."""
+    n = len(keys)
+    if not n:
+        return {}
+    starts = _group_starts(keys)
+    counts = np.diff(np.r_[starts, n])
+    ends = starts + counts - 1
+    gaps = np.zeros(n)
+    gaps[:-1] = np.diff(days)
+    gaps[ends] = 0.0  # no gap across merchants
+    k = np.maximum(counts - 1, 1)
+    gap_mean = np.add.reduceat(gaps, starts) / k
+    gap_std = np.sqrt(np.maximum(np.add.reduceat(gaps ** 2, starts) / k - gap_mean ** 2, 0))
+    x = cents.astype(np.float64)
+    amt_mean = np.add.reduceat(x, starts) / counts
+    amt_std = np.sqrt(np.maximum(np.add.reduceat(x ** 2, starts) / counts - amt_mean ** 2, 0))
+    steady = (counts >= MIN_CHARGES) & (amt_std <= MAX_AMOUNT_CV * np.maximum(amt_mean, 1))
+
+    found = {}
+    for cycle, (period, tol) in CYCLES.items():
+        for g in np.flatnonzero(steady & (np.abs(gap_mean - period) <= tol) & (gap_std <= tol)):
+            e = ends[g]
+            found[keys[e]] = {
+                "merchant": keys[e],
+                "label": labels[e],
+                "cycle": cycle,
+                "every_days": round(float(gap_mean[g]), 1),
+                "amount": int(cents[e]) / 100,
+                "charges": int(counts[g]),
+                "last": _day(days[e]),
+                "next": _day(days[e] + round(gap_mean[g])),
+            }
+    return found
+
+
+def _fold(state: Dict, dates, categories, cents: np.ndarray, descriptions) -> Dict:
+    """Fold rows, in order, into `state` (in place)."""
+    if not len(cents):
+        return state
+    stamps = to_dates(dates)
+    last = state["last_date"]
+    state["last_date"] = max(int(stamps.view(np.int64).max()), NAT if last is None else last)
+    days = stamps.astype('datetime64[D]').view(np.int64)
+    dated = days != NAT
+
+    # Anomalies: score against each category's running stats, then advance them.
+    codes, names = pd.factorize(pd.Series(categories))
+    names = [str(c) for c in names]
+    stats = state["categories"]
+    prior = np.array([stats.get(c, [0, 0, 0.0]) for c in names], dtype=np.float64)
+    z = _scores(codes, cents, prior)
+    x = cents.astype(np.float64)
+    counts = np.bincount(codes, minlength=len(names))
+    sums = np.bincount(codes, weights=x, minlength=len(names))
+    squares = np.bincount(codes, weights=x * x, minlength=len(names))
+    for i, c in enumerate(names):
+        n, s, sq = stats.get(c, [0, 0, 0.0])
+        stats[c] = [n + int(counts[i]), s + int(round(sums[i])), sq + float(squares[i])]
+
+    desc_codes, desc_uniq = pd.factorize(pd.Series(descriptions))
+    texts = np.asarray(desc_uniq, dtype=object)
+    flagged = np.flatnonzero(z >= INSIGHT_Z)
+    if len(flagged):
+        flagged = flagged[np.argsort(days[flagged], kind='stable')][-MAX_ANOMALIES:]
+        state["anomalies"].extend({
+            "date": _day(days[i]) if dated[i] else "",
+            "category": names[codes[i]],
+            "amount": int(cents[i]) / 100,
+            "description": texts[desc_codes[i]],
+            "z": round(float(z[i]), 1),
+        } for i in flagged)
+        state["anomalies"] = sorted(state["anomalies"], key=lambda a: a["date"])[-MAX_ANOMALIES:]
+
+    # Recurring: merge new charges into the touched merchants' tails and re-check those.
+    keys = merchant_keys(pd.Series(texts)).to_numpy(dtype=object)[desc_codes]
+    sel = dated & (keys != "")
+    if not sel.any():
+        return state
+    merchants = state["merchants"]
+    touched = pd.unique(keys[sel])
+    old = [(k, merchants[k]) for k in touched if k in merchants]
+    all_keys = np.concatenate([np.repeat(np.array([k for k, _ in old], dtype=object), [len(t["days"]) for _, t in old]),
+                               keys[sel]])
+    all_days = np.concatenate([np.array([d for _, t in old for d in t["days"]], dtype=np.int64), days[sel]])
+    all_cents = np.concatenate([np.array([a for _, t in old for a in t["cents"]], dtype=np.int64), cents[sel]])
+    all_labels = np.concatenate([np.repeat(np.array([t["label"] for _, t in old], dtype=object),
+                                           [len(t["days"]) for _, t in old]),
+                                 texts[desc_codes[sel]]])
+    key_codes, key_uniq = pd.factorize(all_keys)
+    order = np.lexsort((all_days, key_codes))
+    key_codes = key_codes[order]
+    starts = _group_starts(key_codes)
+    counts = np.diff(np.r_[starts, len(order)])
+    rank = np.arange(len(order)) - np.repeat(starts, counts)
+    tail = rank >= np.repeat(counts - TAIL, counts)
+    keep = order[tail]
+    all_keys, all_days, all_cents, all_labels = all_keys[keep], all_days[keep], all_cents[keep], all_labels[keep]
+
+    starts = _group_starts(key_codes[tail])
+    for lo, hi in zip(starts, np.r_[starts[1:], len(keep)]):
+        merchants[all_keys[lo]] = {
+            "days": all_days[lo:hi].tolist(),
+            "cents": all_cents[lo:hi].tolist(),
+            "label": all_labels[hi - 1],
+        }
+    recurring = state["recurring"]
+    for k in touched:
+        recurring.pop(k, None)
+    recurring.update(_recurring(all_keys, all_days, all_cents, all_labels))
+    return state
+
+
+def _in_order(state: Dict, dates) -> bool:
+    """Whether folding `dates` in after `state` matches the date order a rebuild folds in."""
+    keys = to_dates(dates).view(np.int64)
+    if not len(keys):
+        return True
+    last = state["last_date"]
+    return keys[0] >= (NAT if last is None else last) and not (np.diff(keys) < 0).any()
+
+
+def summary(state: Dict, today: datetime.date) -> Dict:
+    """Active recurring charges (largest monthly cost first) and recent anomalies (newest first)."""
+    today = np.datetime64(today, 'D')
+    recurring = []
+    for r in state["recurring"].values():
+        # Still active unless a charge is more than half a cycle overdue.
+        if np.datetime64(r["next"], 'D') + int(CYCLES[r["cycle"]][0] / 2) >= today:
+            recurring.append(dict(r, monthly=round(r["amount"] * 30.4 / max(r["every_days"], 1), 2)))
+    recurring.sort(key=lambda r: r["monthly"], reverse=True)
+    since = str(today - RECENT_ANOMALY_DAYS)
+    anomalies = [a for a in reversed(state["anomalies"]) if a["date"] >= since]
+    return {"recurring": recurring, "anomalies": anomalies}
+
+
+class InsightStore:
+    """Per-user detector state, kept in step with the ledger like RollupStore."""
+
+    def __init__(self, path_for: Callable[[str], str], expenses, maxsize: int = 4096):
+        self.path_for = path_for
+        self.expenses = expenses
+        self._mem = LRUCache(maxsize=maxsize)
+        self._lock = threading.RLock()
+
+    def _signature(self, username: str):
+        return json.loads(json.dumps(self.expenses.signature(username)))
+
+    def _save(self, username: str, state: Dict):
+        path = self.path_for(username)
+        with atomic_write(path, encoding="utf-8") as f:
+            json.dump(state, f)
+        self._mem[username] = (_file_version(path), state)
+
+    def _load(self, username: str) -> Optional[Dict]:
+        path = self.path_for(username)
+        try:
+            version = _file_version(path)
+        except FileNotFoundError:
+            return None
+        cached = self._mem.get(username)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        try:
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if state.get("version") != INSIGHTS_VERSION:
+            return None
+        self._mem[username] = (version, state)
+        return state
+
+    @timed("insights.rebuild")
+    def rebuild(self, username: str) -> Dict:
+        with self._lock:
+            for _ in range(3):
+                sig = self._signature(username)
+                df = self.expenses.frame(username)
+                stable = self._signature(username) == sig
+                if stable:
+                    break
+            df = df.iloc[np.argsort(date_keys(df), kind='stable')]
+            state = _fold(_empty(), df['date'], df['category'], df['cents'].to_numpy(), df['description'])
+            state["signature"] = sig
+            if stable:
+                with file_lock(self.path_for(username)):
+                    self._save(username, state)
+            return state
+
+    def get(self, username: str) -> Dict:
+        with self._lock:
+            state = self._load(username)
+            if state is None or state.get("signature") != self._signature(username):
+                state = self.rebuild(username)
+            return state
+
+    def record(self, username: str, rows, before_signature, after_signature):
+        """Fold rows just appended to the ledger in."""
+        self.record_frame(username, pd.DataFrame(list(rows), columns=['date', 'category', 'amount', 'description']),
+                          before_signature, after_signature)
+
+    def record_frame(self, username: str, df: pd.DataFrame, before_signature, after_signature):
+        before = json.loads(json.dumps(before_signature))
+        with self._lock, file_lock(self.path_for(username)):
+            state = self._load(username)
+            if state is None or state.get("signature") != before or not _in_order(state, df['date']):
+                # Missing, already stale or backdated: leave it for a lazy rebuild.
+                return
+            state = _fold(state, df['date'], df['category'].astype(str), to_cents(df['amount']),
+                          df['description'].fillna('').astype(str))
+            state["signature"] = json.loads(json.dumps(after_signature))
+            self._save(username, state)
+
+
+def refresh_batch(usernames: List[str]) -> List[Tuple[str, int, int]]:
+    """Worker task: bring each user's findings up to date; (username, recurring, anomalies)."""
+    out = []
+    for username in usernames:
+        found = spending_insights(username)
+        out.append((username, len(found["recurring"]), len(found["anomalies"])))
+    return out
+
+
+def refresh_all(workers: int = INSIGHT_WORKERS) -> List[Tuple[str, int, int]]:
+    """Refresh every user across `workers` processes; users already current only cost a stat."""
+    usernames = list_expense_users()
+    if workers <= 1 or len(usernames) < 2 * workers:
+        return refresh_batch(usernames)
+    size = -(-len(usernames) // (workers * 4))
+    batches = [usernames[i:i + size] for i in range(0, len(usernames), size)]
+    # spawn: forking a threaded Streamlit server is not safe.
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return [r for batch in pool.map(refresh_batch, batches) for r in batch]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh recurring-charge and anomaly findings for every user.")
+    parser.add_argument("--workers", type=int, default=INSIGHT_WORKERS)
+    args = parser.parse_args()
+    t0 = time.perf_counter()
+    results = refresh_all(args.workers)
+    print(f"{len(results)} users in {time.perf_counter() - t0:.1f}s: "
+          f"{sum(r for _, r, _ in results)} active recurring charges, "
+          f"{sum(a for _, _, a in results)} recent anomalies")
+
+
+if __name__ == "__main__":
+    main()
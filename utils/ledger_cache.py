@@ -0,0 +1,233 @@
+# utils/ledger_cache.py
+import io
+import os
+import zipfile
+import hashlib
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from cachetools import LRUCache
+
+from . import expense_schema as schema
+from .file_io import atomic_write
+from .perf import timed
+
+SNAPSHOT_VERSION = 1
+# A snapshot fingerprints the ledger bytes just before its checkpoint, so it
+# is never applied to a ledger that was since replaced or rewritten.
+FINGERPRINT_BYTES = 1 << 16
+
+
+def parse_rows(data: bytes, names: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Parse complete CSV lines into a canonical frame (see expense_schema).
+    With `names`, `data` carries no header line.
+    """
+    if not data.strip():
+        return schema.empty()
+    kwargs = dict(keep_default_na=False, encoding='utf-8', header=None if names is not None else 'infer', names=names)
+    try:
+        # Let the C parser read amounts straight to float; fall back to text
+        # (and coerce) only for ledgers with blank or malformed amounts.
+        df = pd.read_csv(io.BytesIO(data), dtype={'date': str, 'category': str, 'amount': 'float64', 'description': str}, **kwargs)
+    except ValueError:
+        df = pd.read_csv(io.BytesIO(data), dtype=str, **kwargs)
+    return schema.canonical(df['date'], df['category'], df['amount'], df['description'])
+
+
+def record_end(data: bytes) -> int:
+    """
+    Length of the longest prefix of `data`, which starts at a record
+    boundary, made of whole CSV records: up to its last newline outside
+    quotes. A quoted description may itself hold newlines, and a concurrent
+    append may be half-written.
+    """
+    end = data.rfind(b'\n')
+    quotes = data.count(b'"', 0, end) if end > 0 else 0
+    # An odd number of quotes before a newline puts it inside a quoted field.
+    while end >= 0 and quotes % 2:
+        prev = data.rfind(b'\n', 0, end)
+        quotes -= data.count(b'"', prev + 1, end)
+        end = prev
+    return end + 1
+
+
+def _fingerprint(f, offset: int) -> str:
+    start = max(0, offset - FINGERPRINT_BYTES)
+    f.seek(start)
+    return hashlib.blake2b(f.read(offset - start), digest_size=16).hexdigest()
+
+
+def write_snapshot(path: str, ledger_path: str, offset: int, columns: List[str], df: pd.DataFrame):
+    """
+    Store canonical `df`, parsed from the first `offset` bytes of the ledger,
+    as typed arrays. Swapped in atomically: readers see the old snapshot or
+    the new one, never a partial file.
+    """
+    with open(ledger_path, 'rb') as f:
+        check = _fingerprint(f, offset)
+    cats, descs = df['category'].cat, df['description'].cat
+    with atomic_write(path, 'wb') as out:
+        np.savez(
+            out, version=np.int64(SNAPSHOT_VERSION), offset=np.int64(offset), check=np.array(check),
+            columns=np.array(columns, dtype=str), date=df['date'].to_numpy(),
+            category=cats.codes.to_numpy(), categories=np.array(cats.categories, dtype=str),
+            cents=df['cents'].to_numpy(),
+            description=descs.codes.to_numpy(), descriptions=np.array(descs.categories, dtype=str),
+        )
+
+
+def read_snapshot(path: str, f) -> Optional[Tuple[int, List[str], pd.DataFrame]]:
+    """
+    (offset, columns, frame) from the snapshot at `path` if it still matches
+    the open ledger `f`; None if there is none or it does not apply.
+    """
+    try:
+        npz = np.load(path, allow_pickle=False)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, zipfile.BadZipFile):
+        return None  # not a snapshot we can read; a full parse still works
+    with npz:
+        if 'version' not in npz.files or int(npz['version']) != SNAPSHOT_VERSION:
+            return None
+        offset = int(npz['offset'])
+        if os.fstat(f.fileno()).st_size < offset or _fingerprint(f, offset) != str(npz['check']):
+            return None
+        df = pd.DataFrame({
+            'date': npz['date'],
+            'category': pd.Categorical.from_codes(npz['category'], dtype=pd.CategoricalDtype(npz['categories'])),
+            'cents': npz['cents'],
+            'description': pd.Categorical.from_codes(npz['description'], categories=npz['descriptions']),
+        })
+        return offset, npz['columns'].tolist(), df
+
+
+class _Entry:
+    __slots__ = ("size", "mtime_ns", "inode", "offset", "columns", "df")
+
+    def __init__(self, size, mtime_ns, inode, offset, columns, df):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+        self.offset = offset
+        self.columns = columns
+        self.df = df
+
+
+class LedgerCache:
+    """
+    Process-wide cache of parsed expense ledgers keyed on username.
+
+    Entries are validated against the file's size and mtime on every lookup.
+    When a ledger has only grown (the append-only pattern of `log_expense`),
+    just the bytes past the last parsed offset are read. Eviction is LRU,
+    bounded by the total number of cached rows rather than users so a few
+    heavy ledgers cannot crowd memory.
+
+    A miss with a `snapshot` path (see utils/compaction.py) loads the typed
+    snapshot and parses only the CSV appended after its checkpoint.
+    """
+
+    def __init__(self, max_rows: int):
+        self._entries = LRUCache(maxsize=max_rows, getsizeof=lambda e: max(len(e.df), 1))
+        self._lock = threading.RLock()
+        # Misses per key since its last compaction: how hot a ledger's cold path is.
+        self._misses = LRUCache(maxsize=100000)
+        self.hits = 0
+        self.tail_loads = 0
+        self.full_loads = 0
+        self.snapshot_loads = 0
+
+    def frame(self, key: str, path: str, snapshot: Optional[str] = None) -> pd.DataFrame:
+        """Return the cached frame for `path`. Callers must not mutate it."""
+        entry = self._entry(key, path, snapshot)
+        return entry.df if entry is not None else schema.empty()
+
+    def checkpoint(self, key: str, path: str, snapshot: Optional[str] = None) -> Optional[Tuple[int, List[str], pd.DataFrame]]:
+        """(offset, columns, frame) of the ledger parsed up to its last whole line, or None if it does not exist."""
+        entry = self._entry(key, path, snapshot)
+        return (entry.offset, entry.columns, entry.df) if entry is not None else None
+
+    def misses(self, key: str) -> int:
+        return self._misses.get(key, 0)
+
+    def cool(self, key: str):
+        self._misses.pop(key, None)
+
+    def _entry(self, key: str, path: str, snapshot: Optional[str]) -> Optional[_Entry]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self.invalidate(key)
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.inode == st.st_ino:
+                if entry.size == st.st_size and entry.mtime_ns == st.st_mtime_ns:
+                    self.hits += 1
+                    return entry
+                if st.st_size > entry.size:
+                    entry = self._load_tail(entry, path, st)
+                    self._store(key, entry)
+                    return entry
+            self._misses[key] = self._misses.get(key, 0) + 1
+            entry = self._load_snapshot(path, st, snapshot) if snapshot else None
+            if entry is None:
+                entry = self._load_full(path, st)
+            self._store(key, entry)
+            return entry
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key: str, entry: _Entry):
+        if len(entry.df) > self._entries.maxsize:
+            # A ledger larger than the whole budget is served but not kept.
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = entry
+
+    @timed("ledger.parse_full")
+    def _load_full(self, path: str, st) -> _Entry:
+        self.full_loads += 1
+        with open(path, 'rb') as f:
+            data = f.read()
+        # Only consume whole records; a concurrent append may be half-written.
+        end = record_end(data)
+        df = parse_rows(data[:end])
+        header = data[:data.find(b'\n') + 1].decode('utf-8').strip()
+        columns = header.split(',') if header else schema.EXPENSE_FIELDS
+        return _Entry(st.st_size, st.st_mtime_ns, st.st_ino, end, columns, df)
+
+    @timed("ledger.load_snapshot")
+    def _load_snapshot(self, path: str, st, snapshot: str) -> Optional[_Entry]:
+        with open(path, 'rb') as f:
+            snap = read_snapshot(snapshot, f)
+            if snap is None:
+                return None
+            offset, columns, df = snap
+            f.seek(offset)
+            data = f.read()
+        self.snapshot_loads += 1
+        end = record_end(data)
+        df = schema.concat(df, parse_rows(data[:end], names=columns))
+        return _Entry(st.st_size, st.st_mtime_ns, st.st_ino, offset + end, columns, df)
+
+    @timed("ledger.parse_tail")
+    def _load_tail(self, entry: _Entry, path: str, st) -> _Entry:
+        self.tail_loads += 1
+        with open(path, 'rb') as f:
+            f.seek(entry.offset)
+            data = f.read()
+        end = record_end(data)
+        tail = parse_rows(data[:end], names=entry.columns)
+        df = schema.concat(entry.df, tail)
+        return _Entry(st.st_size, st.st_mtime_ns, st.st_ino, entry.offset + end, entry.columns, df)
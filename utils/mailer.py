@@ -0,0 +1,312 @@
+# utils/mailer.py
+"""
+Background sender for the email outbox (utils/outbox.py).
+
+Registration only queues its activation email; a sender thread drains the
+outbox over SMTP connections that stay open and logged in between messages,
+so STARTTLS and AUTH are paid once per connection rather than once per email.
+Each round claims up to OUTBOX_BATCH due messages, spreads them over
+OUTBOX_CONNECTIONS connections and settles the whole batch in one
+transaction. Transient failures (connection drops, 4xx replies) are retried
+with exponential backoff; 5xx replies fail the message at once.
+
+    python -m utils.mailer run       # drain the outbox from this process until interrupted
+    python -m utils.mailer stats
+    python -m utils.mailer retry     # requeue failed messages
+"""
+import os
+import time
+import logging
+import smtplib
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .config import OUTBOX_CONNECTIONS, OUTBOX_BATCH, OUTBOX_POLL_S, OUTBOX_MESSAGES_PER_CONNECTION
+from .perf import incr, timer
+
+log = logging.getLogger(__name__)
+
+# NOOP a pooled connection before reuse once it has sat idle this long;
+# servers drop idle clients after a few minutes.
+IDLE_CHECK_S = 30.0
+KEEP_SENT_S = 7 * 24 * 3600
+PRUNE_EVERY_S = 3600.0
+# Replies after which the server closes the connection.
+CLOSING_CODES = (421,)
+
+
+class SmtpSettings(NamedTuple):
+    host: str = ""
+    port: int = 587
+    user: str = ""
+    password: str = ""
+    from_email: str = ""
+    starttls: bool = True
+    timeout: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> "SmtpSettings":
+        user = os.getenv("SMTP_USER", "")
+        return cls(
+            host=os.getenv("SMTP_HOST", ""),
+            port=int(os.getenv("SMTP_PORT", "587") or 587),
+            user=user,
+            password=os.getenv("SMTP_PASS", ""),
+            from_email=os.getenv("FROM_EMAIL", user),
+            starttls=os.getenv("SMTP_STARTTLS", "1") != "0",
+        )
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.host and self.user and self.password)
+
+
+def _permanent(e: Exception) -> bool:
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in e.recipients.values())
+    return isinstance(e, smtplib.SMTPResponseException) and e.smtp_code >= 500
+
+
+def _describe(e: Exception) -> str:
+    return f"{type(e).__name__}: {e}"
+
+
+class SmtpPool:
+    """
+    Up to `size` authenticated SMTP connections, kept open between sends.
+    A connection is closed after `max_messages` messages or any error that
+    leaves it unusable, and checked with NOOP before reuse if it sat idle.
+    """
+
+    def __init__(self, settings: SmtpSettings, size: int = OUTBOX_CONNECTIONS,
+                 max_messages: int = OUTBOX_MESSAGES_PER_CONNECTION):
+        self.settings = settings
+        self.max_messages = max_messages
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = deque()  # [smtp, messages sent, last used]
+        self._lock = threading.Lock()
+
+    def _open(self) -> List:
+        s = self.settings
+        with timer("mail.connect"):
+            smtp = smtplib.SMTP(s.host, s.port, timeout=s.timeout)
+            try:
+                if s.starttls:
+                    smtp.starttls()
+                if s.user:
+                    smtp.login(s.user, s.password)
+            except BaseException:
+                smtp.close()
+                raise
+        incr("mail.connections")
+        return [smtp, 0, time.monotonic()]
+
+    def _take(self) -> List:
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._open()
+            if time.monotonic() - conn[2] < IDLE_CHECK_S:
+                return conn
+            try:
+                if conn[0].noop()[0] == 250:
+                    return conn
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close(conn)
+
+    def _close(self, conn: List, polite: bool = False):
+        try:
+            if polite:
+                conn[0].quit()
+            else:
+                conn[0].close()
+        except (smtplib.SMTPException, OSError):
+            conn[0].close()
+
+    def send(self, messages: List[EmailMessage]) -> List[Optional[Tuple[str, bool]]]:
+        """
+        Send `messages` in order over one pooled connection. Per message:
+        None if sent, else (error, permanent). If the server can't be reached
+        or refuses the login, the rest of the batch fails as transient.
+        """
+        results = [None] * len(messages)
+        with self._slots:
+            conn = None
+            for i, msg in enumerate(messages):
+                try:
+                    if conn is None:
+                        conn = self._take()
+                except (smtplib.SMTPException, OSError) as e:
+                    results[i:] = [(_describe(e), False)] * (len(messages) - i)
+                    break
+                try:
+                    with timer("mail.send"):
+                        conn[0].send_message(msg)
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                    # Refused by the server: smtplib has already reset the
+                    # transaction and the connection stays usable.
+                    results[i] = (_describe(e), _permanent(e))
+                    if getattr(e, "smtp_code", None) in CLOSING_CODES:
+                        self._close(conn)
+                        conn = None
+                    continue
+                except (smtplib.SMTPException, OSError) as e:
+                    results[i] = (_describe(e), False)
+                    self._close(conn)
+                    conn = None
+                    continue
+                conn[1] += 1
+                conn[2] = time.monotonic()
+                if conn[1] >= self.max_messages:
+                    self._close(conn, polite=True)
+                    conn = None
+            if conn is not None:
+                with self._lock:
+                    self._idle.append(conn)
+        return results
+
+    def close(self):
+        with self._lock:
+            conns, self._idle = list(self._idle), deque()
+        for conn in conns:
+            self._close(conn, polite=True)
+
+
+class OutboxSender:
+    """Drains an Outbox through an SmtpPool, on a background thread or one round at a time."""
+
+    def __init__(self, outbox, settings: SmtpSettings, connections: int = OUTBOX_CONNECTIONS,
+                 batch: int = OUTBOX_BATCH, poll: float = OUTBOX_POLL_S):
+        self.outbox = outbox
+        self.settings = settings
+        self.connections = max(1, connections)
+        self.batch = batch
+        self.poll = poll
+        self.pool = SmtpPool(settings, self.connections)
+        self._executor = ThreadPoolExecutor(self.connections, thread_name_prefix="outbox-smtp")
+        self._stop = threading.Event()
+        self._thread = None
+        self._pruned = 0.0
+
+    def _message(self, row: Dict) -> EmailMessage:
+        msg = EmailMessage()
+        msg['Subject'] = row["subject"]
+        msg['From'] = self.settings.from_email
+        msg['To'] = row["to_addr"]
+        msg.set_content(row["body"])
+        return msg
+
+    def run_once(self) -> int:
+        """Claim one batch, send it and record the outcome. Returns messages claimed."""
+        rows = self.outbox.claim(self.batch)
+        if not rows:
+            return 0
+        with timer("mail.batch"):
+            # Contiguous chunks, one per connection.
+            n = min(self.connections, len(rows))
+            size = -(-len(rows) // n)
+            chunks = [rows[i:i + size] for i in range(0, len(rows), size)]
+            results = self._executor.map(lambda chunk: self.pool.send([self._message(r) for r in chunk]), chunks)
+            sent, failures = [], []
+            for chunk, outcome in zip(chunks, results):
+                for row, result in zip(chunk, outcome):
+                    if result is None:
+                        sent.append(row["id"])
+                    else:
+                        failures.append((row, result[0], result[1]))
+            failed = self.outbox.complete(sent, failures)
+        incr("mail.sent", len(sent))
+        if failures:
+            incr("mail.retried", len(failures) - failed)
+            incr("mail.failed", failed)
+            (log.warning if failed else log.info)(
+                "outbox: %d of %d messages not sent (%d for good), e.g. %s", len(failures), len(rows), failed, failures[0][1])
+        return len(rows)
+
+    def _wait(self):
+        due = self.outbox.next_due()
+        timeout = self.poll if due is None else min(self.poll, max(0.0, due - time.time()))
+        self.outbox.pending.wait(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Cleared before claiming, so a put() that misses this round
+            # still cuts the wait short.
+            self.outbox.pending.clear()
+            try:
+                claimed = self.run_once()
+                if time.monotonic() - self._pruned > PRUNE_EVERY_S:
+                    self._pruned = time.monotonic()
+                    self.outbox.prune(KEEP_SENT_S)
+            except Exception:
+                log.exception("outbox sender round failed")
+                claimed = 0
+                self._stop.wait(self.poll)
+            if claimed < self.batch:
+                self._wait()
+
+    def start(self) -> "OutboxSender":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="outbox-sender", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        self.outbox.pending.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._executor.shutdown(wait=True)
+        self.pool.close()
+
+
+_sender = None
+_sender_lock = threading.Lock()
+
+
+def start_sender(outbox, settings: SmtpSettings) -> Optional[OutboxSender]:
+    """This process's background sender, started on first call; None if SMTP is not configured."""
+    global _sender
+    if not settings.configured:
+        return None
+    with _sender_lock:
+        if _sender is None:
+            _sender = OutboxSender(outbox, settings).start()
+    return _sender
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send queued email and inspect the outbox.")
+    parser.add_argument("command", choices=["run", "stats", "retry"])
+    args = parser.parse_args()
+    from dotenv import load_dotenv
+    load_dotenv()
+    from .data_utils import mail_outbox
+    outbox = mail_outbox()
+
+    if args.command == "stats":
+        print(" · ".join(f"{k} {v}" for k, v in outbox.stats().items()))
+    elif args.command == "retry":
+        print(f"requeued {outbox.requeue_failed()} messages")
+    else:
+        settings = SmtpSettings.from_env()
+        if not settings.configured:
+            parser.error("set SMTP_HOST, SMTP_USER and SMTP_PASS")
+        logging.basicConfig(level=logging.INFO)
+        sender = start_sender(outbox, settings)
+        try:
+            while True:
+                time.sleep(60)
+                log.info("outbox %s", outbox.stats())
+        except KeyboardInterrupt:
+            sender.stop()
+
+
+if __name__ == "__main__":
+    main()
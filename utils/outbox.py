@@ -0,0 +1,149 @@
+# utils/outbox.py
+import time
+import random
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .config import OUTBOX_MAX_ATTEMPTS, OUTBOX_BACKOFF_S, OUTBOX_BACKOFF_MAX_S
+
+# A claimed message that is neither sent nor failed by then is claimed again
+# (its sender died mid-batch).
+LEASE_S = 300.0
+STATUSES = ("queued", "sending", "sent", "failed")
+
+
+def backoff(attempts: int, base: float = OUTBOX_BACKOFF_S, cap: float = OUTBOX_BACKOFF_MAX_S) -> float:
+    """Seconds before retry number `attempts` (1-based): exponential, capped, with jitter."""
+    return min(cap, base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+
+class Outbox:
+    """
+    Durable queue of outgoing mail in SQLite (`outbox.db`).
+
+    A message is `queued` until a sender claims it, which marks it `sending`
+    for LEASE_S seconds. It ends `sent`, or `failed` after a permanent SMTP
+    error or `max_attempts` tries; transient errors requeue it with backoff.
+    Claims run in an immediate transaction, so any number of senders, in any
+    number of processes, can drain the same outbox without sending twice.
+    `put` sets `pending`, which a sender in this process waits on.
+    """
+
+    def __init__(self, path: str, max_attempts: int = OUTBOX_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.pending = threading.Event()
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "id INTEGER PRIMARY KEY, tag TEXT, to_addr TEXT, subject TEXT, body TEXT, "
+                "status TEXT, attempts INTEGER, created REAL, next_at REAL, sent_at REAL, error TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS outbox_tag ON outbox (tag)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, as in SqliteUserStore.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def put(self, to_addr: str, subject: str, body: str, tag: str = "") -> int:
+        now = time.time()
+        with self._conn() as conn:
+            cur = conn.execute(
+                "INSERT INTO outbox (tag, to_addr, subject, body, status, attempts, created, next_at) "
+                "VALUES (?, ?, ?, ?, 'queued', 0, ?, ?)",
+                (tag, to_addr, subject, body, now, now),
+            )
+        self.pending.set()
+        return cur.lastrowid
+
+    def claim(self, limit: int, lease: float = LEASE_S) -> List[Dict]:
+        """Lease up to `limit` due messages, oldest due first."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = [dict(r) for r in conn.execute(
+                "SELECT * FROM outbox WHERE status IN ('queued', 'sending') AND next_at <= ? "
+                "ORDER BY next_at LIMIT ?", (now, limit),
+            )]
+            conn.executemany("UPDATE outbox SET status = 'sending', next_at = ? WHERE id = ?",
+                             [(now + lease, r["id"]) for r in rows])
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return rows
+
+    def complete(self, sent: List[int], failures: List[Tuple[Dict, str, bool]]) -> int:
+        """
+        Settle claimed messages: `sent` ids, and (row, error, permanent)
+        failures, which are retried later unless permanent or out of attempts.
+        Returns how many failed for good.
+        """
+        now = time.time()
+        retries = []
+        for row, error, permanent in failures:
+            attempts = row["attempts"] + 1
+            done = permanent or attempts >= self.max_attempts
+            retries.append(("failed" if done else "queued", attempts, now if done else now + backoff(attempts),
+                            error[:500], row["id"]))
+        with self._conn() as conn:
+            conn.executemany(
+                "UPDATE outbox SET status = 'sent', attempts = attempts + 1, sent_at = ?, error = NULL WHERE id = ?",
+                [(now, i) for i in sent],
+            )
+            conn.executemany("UPDATE outbox SET status = ?, attempts = ?, next_at = ?, error = ? WHERE id = ?", retries)
+        return sum(1 for r in retries if r[0] == "failed")
+
+    def next_due(self) -> Optional[float]:
+        """Epoch time the earliest unsent message becomes due, if any."""
+        row = self._conn().execute(
+            "SELECT MIN(next_at) FROM outbox WHERE status IN ('queued', 'sending')"
+        ).fetchone()
+        return row[0]
+
+    def status(self, tag: str) -> Optional[Dict]:
+        """The latest message with `tag`, without its body."""
+        row = self._conn().execute(
+            "SELECT id, tag, to_addr, status, attempts, created, sent_at, error FROM outbox "
+            "WHERE tag = ? ORDER BY id DESC LIMIT 1", (tag,),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def stats(self) -> Dict:
+        """Message counts by status, how many are due now, and the age of the oldest unsent one."""
+        now = time.time()
+        conn = self._conn()
+        out = {s: 0 for s in STATUSES}
+        out.update({r[0]: r[1] for r in conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status")})
+        due, oldest = conn.execute(
+            "SELECT SUM(next_at <= ?), MIN(created) FROM outbox WHERE status IN ('queued', 'sending')", (now,)
+        ).fetchone()
+        out["due"] = due or 0
+        out["oldest_s"] = round(now - oldest, 1) if oldest is not None else 0.0
+        return out
+
+    def requeue_failed(self) -> int:
+        with self._conn() as conn:
+            cur = conn.execute(
+                "UPDATE outbox SET status = 'queued', attempts = 0, next_at = ? WHERE status = 'failed'", (time.time(),)
+            )
+        if cur.rowcount:
+            self.pending.set()
+        return cur.rowcount
+
+    def prune(self, older_than_s: float) -> int:
+        """Drop messages sent more than `older_than_s` seconds ago."""
+        with self._conn() as conn:
+            cur = conn.execute("DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?", (time.time() - older_than_s,))
+        return cur.rowcount
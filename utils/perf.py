@@ -0,0 +1,192 @@
+# utils/perf.py
+import os
+import json
+import time
+import bisect
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Optional
+
+from cachetools import LRUCache
+
+from .config import PERF_ENABLED, PERF_SLOW_MS, PERF_EXPORT_PATH, PERF_EXPORT_INTERVAL_S
+
+# Upper bounds in ms, Prometheus style; the last bucket is +Inf.
+BUCKETS_MS = [1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, ms: float):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        if ms > self.max:
+            self.max = ms
+
+    def quantile(self, q: float) -> float:
+        """Bucket upper bound containing quantile `q` (capped at the observed max)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                return min(BUCKETS_MS[i], self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+
+_lock = threading.Lock()
+_hists: Dict[str, Histogram] = {}
+_counters: Dict[str, int] = {}
+# Per-user page time, bounded so a large user base can't grow it forever.
+_users = LRUCache(maxsize=10000)
+_slow = deque(maxlen=200)
+_last_export = 0.0
+
+
+def record(op: str, ms: float, user: Optional[str] = None):
+    with _lock:
+        h = _hists.get(op)
+        if h is None:
+            h = _hists[op] = Histogram()
+        h.observe(ms)
+        if user is not None:
+            agg = _users.get(user)
+            if agg is None:
+                agg = _users[user] = [0, 0.0, 0.0]
+            agg[0] += 1
+            agg[1] += ms
+            agg[2] = max(agg[2], ms)
+        if ms >= PERF_SLOW_MS:
+            _slow.append({"at": time.time(), "op": op, "user": user, "ms": round(ms, 1)})
+    if PERF_EXPORT_PATH:
+        _maybe_export()
+
+
+def incr(name: str, n: int = 1):
+    if not PERF_ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+@contextmanager
+def _timer(op: str, user: Optional[str]):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(op, (time.perf_counter() - t0) * 1000, user)
+
+
+_NOOP = nullcontext()
+
+
+def timer(op: str, user: Optional[str] = None):
+    """`with timer("page.home", user=username): ...`; a shared no-op when disabled."""
+    return _timer(op, user) if PERF_ENABLED else _NOOP
+
+
+def timed(op: str) -> Callable:
+    """Decorator form of `timer`. When disabled the function is returned unwrapped."""
+    def decorate(fn):
+        if not PERF_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(op, (time.perf_counter() - t0) * 1000)
+        return wrapper
+    return decorate
+
+
+def snapshot() -> Dict:
+    """Everything recorded by this process so far, as plain data."""
+    with _lock:
+        ops = {
+            op: {
+                "count": h.count,
+                "mean_ms": round(h.sum / h.count, 2) if h.count else 0.0,
+                "p50_ms": round(h.quantile(0.5), 2),
+                "p95_ms": round(h.quantile(0.95), 2),
+                "p99_ms": round(h.quantile(0.99), 2),
+                "max_ms": round(h.max, 2),
+            }
+            for op, h in sorted(_hists.items())
+        }
+        users = sorted(
+            ({"user": u, "renders": c, "mean_ms": round(t / c, 2), "max_ms": round(m, 2)} for u, (c, t, m) in _users.items()),
+            key=lambda r: r["mean_ms"], reverse=True,
+        )
+        return {
+            "pid": os.getpid(),
+            "enabled": PERF_ENABLED,
+            "operations": ops,
+            "counters": dict(sorted(_counters.items())),
+            "slow_users": users[:50],
+            "slow_events": list(_slow)[::-1],
+        }
+
+
+def prometheus_text() -> str:
+    """Histograms and counters in the Prometheus text exposition format."""
+    lines = [
+        "# HELP spendwise_op_duration_ms Duration of instrumented operations.",
+        "# TYPE spendwise_op_duration_ms histogram",
+    ]
+    with _lock:
+        for op, h in sorted(_hists.items()):
+            cumulative = 0
+            for bound, c in zip(BUCKETS_MS + ["+Inf"], h.counts):
+                cumulative += c
+                lines.append(f'spendwise_op_duration_ms_bucket{{op="{op}",le="{bound}"}} {cumulative}')
+            lines.append(f'spendwise_op_duration_ms_sum{{op="{op}"}} {h.sum:.3f}')
+            lines.append(f'spendwise_op_duration_ms_count{{op="{op}"}} {h.count}')
+        lines.append("# TYPE spendwise_events_total counter")
+        for name, n in sorted(_counters.items()):
+            lines.append(f'spendwise_events_total{{name="{name}"}} {n}')
+    return "\n".join(lines) + "\n"
+
+
+def export(path: str):
+    """Write a snapshot: Prometheus text if `path` ends in .prom, else JSON."""
+    from .file_io import atomic_write
+    body = prometheus_text() if path.endswith(".prom") else json.dumps(snapshot(), indent=2)
+    with atomic_write(path, encoding="utf-8") as f:
+        f.write(body)
+
+
+def _maybe_export():
+    global _last_export
+    now = time.monotonic()
+    if now - _last_export < PERF_EXPORT_INTERVAL_S:
+        return
+    _last_export = now
+    try:
+        export(PERF_EXPORT_PATH.format(pid=os.getpid()))
+    except OSError:
+        pass
+
+
+def reset():
+    with _lock:
+        _hists.clear()
+        _counters.clear()
+        _users.clear()
+        _slow.clear()
+
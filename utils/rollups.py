@@ -0,0 +1,195 @@
+# utils/rollups.py
+import os
+import json
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from cachetools import LRUCache
+
+from .expense_schema import to_cents
+from .file_io import atomic_write, file_lock
+from .perf import timed
+
+UNDATED = "undated"
+# Bumped when the cell format changes; older rollups are rebuilt on read.
+# 2: sums are integer cents.
+# 3: adds per-day totals.
+ROLLUP_VERSION = 3
+
+
+def period_keys(dates, unit: str = 'M') -> np.ndarray:
+    """Map raw or parsed dates to 'YYYY-MM' (unit 'M') or 'YYYY-MM-DD' (unit 'D') keys, 'undated' where unparseable."""
+    periods = pd.to_datetime(pd.Series(dates), errors='coerce').to_numpy(dtype=f'datetime64[{unit}]')
+    # Format each distinct period once rather than every row; NaT codes are -1.
+    codes, uniq = pd.factorize(periods)
+    labels = np.array([str(m) for m in np.asarray(uniq, dtype=f'datetime64[{unit}]')] + [UNDATED], dtype=object)
+    return labels[codes]
+
+
+def month_keys(dates) -> np.ndarray:
+    return period_keys(dates, 'M')
+
+
+def _file_version(path: str):
+    # Every save is a rename, so the inode changes even within one mtime tick.
+    st = os.stat(path)
+    return (st.st_ino, st.st_mtime_ns)
+
+
+def _month_aligned(since) -> bool:
+    return since is None or getattr(since, "day", None) == 1
+
+
+def _cells(months: np.ndarray, categories: np.ndarray, cents: np.ndarray) -> Dict[str, Dict[str, List[int]]]:
+    if not len(cents):
+        return {}
+    grouped = pd.Series(cents).groupby([months, categories]).agg(['sum', 'count'])
+    cells = {}
+    for (month, cat), total, count in zip(grouped.index, grouped['sum'].tolist(), grouped['count'].tolist()):
+        cells.setdefault(month, {})[cat] = [int(total), int(count)]
+    return cells
+
+
+def _days(dates, cents: np.ndarray) -> Dict[str, int]:
+    """{'YYYY-MM-DD': cents} over dated rows."""
+    if not len(cents):
+        return {}
+    sums = pd.Series(cents).groupby(period_keys(dates, 'D')).sum()
+    return {day: int(total) for day, total in zip(sums.index, sums.tolist()) if day != UNDATED}
+
+
+class RollupStore:
+    """
+    Per-user (month, category) -> [cents, count] tables and per-day spend,
+    persisted next to the ledger as `<username>_rollup.json`.
+
+    Each rollup records the ledger signature it was built from. `log_expense`
+    folds new rows in and advances the signature from the append's "before"
+    to its "after"; if the ledger changed any other way (including another
+    process appending in between) the signatures disagree and the rollup is
+    rebuilt on next read.
+    Queries that start on the first of a month (or are unbounded) are answered
+    from the rollup in O(months); anything else returns None so the caller can
+    fall back to scanning the ledger.
+    """
+
+    def __init__(self, path_for: Callable[[str], str], expenses, maxsize: int = 4096):
+        self.path_for = path_for
+        self.expenses = expenses
+        self._mem = LRUCache(maxsize=maxsize)
+        self._lock = threading.RLock()
+
+    def _signature(self, username: str) -> List:
+        # JSON round-trips tuples as lists; compare like with like.
+        return json.loads(json.dumps(self.expenses.signature(username)))
+
+    def _save(self, username: str, rollup: Dict):
+        path = self.path_for(username)
+        with atomic_write(path, encoding="utf-8") as f:
+            json.dump(rollup, f)
+        self._mem[username] = (_file_version(path), rollup)
+
+    def _load(self, username: str) -> Optional[Dict]:
+        # The file may have been replaced by another process since we cached it.
+        path = self.path_for(username)
+        try:
+            version = _file_version(path)
+        except FileNotFoundError:
+            return None
+        cached = self._mem.get(username)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        try:
+            with open(path, encoding="utf-8") as f:
+                rollup = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if rollup.get("version") != ROLLUP_VERSION:
+            return None
+        self._mem[username] = (version, rollup)
+        return rollup
+
+    @timed("rollup.rebuild")
+    def rebuild(self, username: str) -> Dict:
+        with self._lock:
+            for _ in range(3):
+                sig = self._signature(username)
+                df = self.expenses.frame(username)
+                stable = self._signature(username) == sig
+                if stable:
+                    break
+            cents = df['cents'].to_numpy()
+            cells = _cells(month_keys(df['date']), df['category'].astype(str).to_numpy(), cents)
+            rollup = {"version": ROLLUP_VERSION, "signature": sig, "cells": cells, "days": _days(df['date'], cents)}
+            if stable:
+                # Otherwise the ledger kept moving under us: answer from this
+                # read but don't persist rows that may not match `sig`.
+                with file_lock(self.path_for(username)):
+                    self._save(username, rollup)
+            return rollup
+
+    def get(self, username: str) -> Dict:
+        with self._lock:
+            rollup = self._load(username)
+            if rollup is None or rollup.get("signature") != self._signature(username):
+                rollup = self.rebuild(username)
+            return rollup
+
+    def record(self, username: str, rows: Iterable[Dict], before_signature, after_signature):
+        """Fold rows just appended to the ledger into the rollup."""
+        rows = list(rows)
+        self.record_frame(username, pd.DataFrame(rows, columns=['date', 'category', 'amount']),
+                          before_signature, after_signature)
+
+    def record_frame(self, username: str, df: pd.DataFrame, before_signature, after_signature):
+        """Vectorized `record` for bulk appends."""
+        before = json.loads(json.dumps(before_signature))
+        with self._lock, file_lock(self.path_for(username)):
+            rollup = self._load(username)
+            if rollup is None or rollup.get("signature") != before:
+                # Missing or already stale: leave it for a lazy rebuild.
+                return
+            cells, days = rollup["cells"], rollup["days"]
+            amounts = to_cents(df['amount'])
+            for month, cats in _cells(month_keys(df['date']), df['category'].astype(str).to_numpy(), amounts).items():
+                for cat, (cents, count) in cats.items():
+                    cell = cells.setdefault(month, {}).setdefault(cat, [0, 0])
+                    cell[0] += cents
+                    cell[1] += count
+            for day, cents in _days(df['date'], amounts).items():
+                days[day] = days.get(day, 0) + cents
+            rollup["signature"] = json.loads(json.dumps(after_signature))
+            self._save(username, rollup)
+
+    def _months(self, username: str, since) -> Iterable[Dict[str, List]]:
+        cells = self.get(username)["cells"]
+        if since is None:
+            return cells.values()
+        lo = f"{since:%Y-%m}"
+        return [cats for month, cats in cells.items() if month != UNDATED and month >= lo]
+
+    def totals_by_category(self, username: str, since=None) -> Optional[Dict[str, float]]:
+        if not _month_aligned(since):
+            return None
+        totals = {}
+        for cats in self._months(username, since):
+            for cat, (cents, _count) in cats.items():
+                totals[cat] = totals.get(cat, 0) + cents
+        return {cat: cents / 100 for cat, cents in totals.items()}
+
+    def total_since(self, username: str, since) -> Optional[float]:
+        if not _month_aligned(since):
+            return None
+        return sum(cents for cats in self._months(username, since) for cents, _ in cats.values()) / 100
+
+    def daily_totals(self, username: str) -> Dict[str, int]:
+        return self.get(username)["days"]
+
+    def monthly_totals(self, username: str) -> Dict[str, float]:
+        cells = self.get(username)["cells"]
+        return {
+            month: sum(cents for cents, _ in cats.values()) / 100
+            for month, cats in sorted(cells.items()) if month != UNDATED
+        }
@@ -0,0 +1,295 @@
+# utils/shards.py
+"""
+Sharded per-user layout and the ledger manifest.
+
+Per-user files (ledger, rollup, insights, category overrides) live under
+`DATA_DIR/shards/<xx>/`, xx being the first two hex digits of the md5 of the
+username: 256 directories of a few hundred users each at 100k users, rather
+than one directory holding every file.
+
+The manifest (`DATA_DIR/manifest.db`, SQLite) lists every ledger with its
+path, row count, byte size, mtime and date range and is updated after each
+append. Admin pages and batch jobs enumerate users from it instead of
+listing directories.
+
+Flat layouts migrate online: each user's files are moved into their shard
+under the ledger lock while the app keeps serving, and until a user is moved
+path lookups keep resolving to the flat files.
+
+    python -m utils.shards migrate     # move flat files into shards, then index them
+    python -m utils.shards reindex     # rebuild manifest stats from the ledgers
+"""
+import os
+import json
+import shutil
+import sqlite3
+import hashlib
+import argparse
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from cachetools import LRUCache
+
+from .file_io import atomic_write, file_lock
+
+SHARDS_DIR = "shards"
+# Per-user files, by suffix. The ledger is either a CSV file or a directory
+# of partitions depending on the expense backend.
+LEDGER_SUFFIXES = {"csv": "_expenses.csv", "partitioned": "_expenses"}
+SNAPSHOT_SUFFIX = "_expenses.snap"  # compacted CSV ledger, see utils/compaction.py
+USER_SUFFIXES = ["_expenses.csv", "_expenses", SNAPSHOT_SUFFIX, "_rollup.json", "_insights.json",
+                 "_category_overrides.json"]
+MANIFEST_FIELDS = ["username", "path", "rows", "bytes", "mtime_ns", "min_date", "max_date"]
+
+
+def shard_of(username: str) -> str:
+    return hashlib.md5(username.encode("utf-8")).hexdigest()[:2]
+
+
+class Layout:
+    """Where a user's files live: flat in `data_dir`, or in their shard."""
+
+    def __init__(self, data_dir: str, sharded: bool = True):
+        self.data_dir = data_dir
+        self.sharded = sharded
+        # (username, suffix) pairs already known to have no flat file left;
+        # a move is one-way, so they never need another stat.
+        self._moved = LRUCache(maxsize=200000)
+
+    def flat_path(self, username: str, suffix: str) -> str:
+        return os.path.join(self.data_dir, f"{username}{suffix}")
+
+    def shard_path(self, username: str, suffix: str) -> str:
+        return os.path.join(self.data_dir, SHARDS_DIR, shard_of(username), f"{username}{suffix}")
+
+    def path(self, username: str, suffix: str) -> str:
+        if not self.sharded:
+            return self.flat_path(username, suffix)
+        shard = self.shard_path(username, suffix)
+        if (username, suffix) in self._moved:
+            return shard
+        flat = self.flat_path(username, suffix)
+        if os.path.lexists(flat):
+            return flat  # not migrated yet
+        os.makedirs(os.path.dirname(shard), exist_ok=True)
+        self._moved[(username, suffix)] = True
+        return shard
+
+    def _dirs(self) -> Iterator[str]:
+        yield self.data_dir
+        root = os.path.join(self.data_dir, SHARDS_DIR)
+        if os.path.isdir(root):
+            for name in sorted(os.listdir(root)):
+                yield os.path.join(root, name)
+
+    def scan(self, suffix: str, flat_only: bool = False) -> List[str]:
+        """Usernames with a `suffix` file, flat or sharded. A full directory walk: migration and indexing only."""
+        users = set()
+        for d in self._dirs():
+            with os.scandir(d) as entries:
+                for e in entries:
+                    if e.name.endswith(suffix) and (e.is_dir() if suffix == "_expenses" else e.is_file()):
+                        users.add(e.name[:-len(suffix)])
+            if flat_only:
+                break
+        return sorted(users)
+
+
+class Manifest:
+    """
+    SQLite catalog of ledgers. Each append advances its entry from the
+    ledger's old (bytes, mtime_ns) to the new one; an entry that missed a
+    write (or raced a reindex) no longer matches and is recomputed from the
+    ledger by the caller, then stored with `put`. `compacted` is the byte
+    offset the ledger's snapshot covers, kept across `put`.
+
+    The catalog lists every ledger only once a full reindex for the active
+    backend has finished (`indexed`); until then callers scan directories.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ledgers ("
+                "username TEXT PRIMARY KEY, path TEXT, rows INTEGER, bytes INTEGER, "
+                "mtime_ns INTEGER, min_date TEXT, max_date TEXT, compacted INTEGER NOT NULL DEFAULT 0)"
+            )
+            if "compacted" not in {r[1] for r in conn.execute("PRAGMA table_info(ledgers)")}:
+                conn.execute("ALTER TABLE ledgers ADD COLUMN compacted INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, as in SqliteUserStore.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, username: str, path: str, before: Tuple[int, int], after: Tuple[int, int], rows: int,
+               min_date: Optional[str], max_date: Optional[str]) -> bool:
+        """
+        Fold an append of `rows` rows dated [min_date, max_date] that took the
+        ledger from `before` to `after` (bytes, mtime_ns). Applies only if the
+        entry is at `before`, like a rollup; returns False if it is missing
+        or stale so the caller can recompute it.
+        """
+        with self._conn() as conn:
+            cur = conn.execute(
+                "UPDATE ledgers SET path = ?, rows = rows + ?, bytes = ?, mtime_ns = ?, "
+                "min_date = MIN(COALESCE(min_date, ?), COALESCE(?, min_date)), "
+                "max_date = MAX(COALESCE(max_date, ?), COALESCE(?, max_date)) "
+                "WHERE username = ? AND bytes = ? AND mtime_ns = ?",
+                (path, rows, after[0], after[1], min_date, min_date, max_date, max_date, username, before[0], before[1]),
+            )
+            if cur.rowcount:
+                return True
+            if before != (0, 0):
+                return False
+            # A brand new ledger.
+            cur = conn.execute(
+                f"INSERT OR IGNORE INTO ledgers ({', '.join(MANIFEST_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (username, path, rows, after[0], after[1], min_date, max_date),
+            )
+            return cur.rowcount > 0
+
+    def put(self, entry: Dict):
+        updates = ", ".join(f"{k} = excluded.{k}" for k in MANIFEST_FIELDS[1:])
+        with self._conn() as conn:
+            conn.execute(
+                f"INSERT INTO ledgers ({', '.join(MANIFEST_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                f"ON CONFLICT(username) DO UPDATE SET {updates}",
+                tuple(entry[k] for k in MANIFEST_FIELDS),
+            )
+
+    def indexed(self) -> Optional[str]:
+        """The backend whose ledgers a completed reindex listed, or None if none has completed."""
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'indexed'").fetchone()
+        return row[0] if row else None
+
+    def set_indexed(self, backend: Optional[str]):
+        with self._conn() as conn:
+            if backend is None:
+                conn.execute("DELETE FROM meta WHERE key = 'indexed'")
+            else:
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('indexed', ?)", (backend,))
+
+    def set_compacted(self, username: str, offset: int):
+        with self._conn() as conn:
+            conn.execute("UPDATE ledgers SET compacted = ? WHERE username = ?", (offset, username))
+
+    def uncompacted(self, min_bytes: int, limit: int) -> List[Dict]:
+        """Ledgers with at least `min_bytes` past their snapshot, most first."""
+        # A ledger now shorter than its checkpoint was replaced: all of it is new.
+        rows = self._conn().execute(
+            "SELECT username, bytes, compacted, "
+            "CASE WHEN compacted > bytes THEN bytes ELSE bytes - compacted END AS delta "
+            "FROM ledgers WHERE delta >= ? ORDER BY delta DESC LIMIT ?", (min_bytes, limit),
+        )
+        return [dict(r) for r in rows]
+
+    def remove(self, usernames):
+        with self._conn() as conn:
+            conn.executemany("DELETE FROM ledgers WHERE username = ?", [(u,) for u in usernames])
+
+    def get(self, username: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT * FROM ledgers WHERE username = ?", (username,)).fetchone()
+        return dict(row) if row else None
+
+    def users(self) -> List[str]:
+        return [r[0] for r in self._conn().execute("SELECT username FROM ledgers ORDER BY username")]
+
+    def entries(self, limit: Optional[int] = None) -> List[Dict]:
+        """Largest ledgers first."""
+        sql = "SELECT * FROM ledgers ORDER BY bytes DESC"
+        rows = self._conn().execute(sql + " LIMIT ?", (limit,)) if limit else self._conn().execute(sql)
+        return [dict(r) for r in rows]
+
+    def totals(self) -> Dict:
+        row = self._conn().execute("SELECT COUNT(*), SUM(rows), SUM(bytes) FROM ledgers").fetchone()
+        return {"ledgers": row[0], "rows": row[1] or 0, "bytes": row[2] or 0}
+
+
+def _merge_overrides(src: str, dst: str):
+    with open(src, encoding="utf-8") as f:
+        table = json.load(f)
+    with open(dst, encoding="utf-8") as f:
+        table.update(json.load(f))  # the already-sharded file is the newer one
+    with atomic_write(dst, encoding="utf-8") as f:
+        json.dump(table, f)
+
+
+def migrate_user(layout: Layout, username: str, backend: str, merge_ledger) -> int:
+    """
+    Move one user's flat files into their shard. Runs under the flat
+    ledger's lock, so appends that resolved the flat path wait for it; paths
+    only resolve into the shard once the flat file is gone. A flat file that
+    reappears after the move (a write that raced it) is folded into the
+    shard copy: ledgers through `merge_ledger(src, dst)`, category overrides
+    by merging tables; derived files are dropped and rebuilt on read.
+    Returns the number of files moved or merged.
+    """
+    suffix = LEDGER_SUFFIXES[backend]
+    done = 0
+    with file_lock(layout.flat_path(username, suffix)):
+        for sfx in USER_SUFFIXES:
+            src, dst = layout.flat_path(username, sfx), layout.shard_path(username, sfx)
+            if not os.path.lexists(src):
+                continue
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            if not os.path.lexists(dst):
+                os.replace(src, dst)
+            elif sfx == suffix:
+                merge_ledger(src, dst)
+                if os.path.isdir(src):
+                    shutil.rmtree(src)
+                else:
+                    os.unlink(src)
+            elif sfx == "_category_overrides.json":
+                _merge_overrides(src, dst)
+                os.unlink(src)
+            elif sfx in LEDGER_SUFFIXES.values():
+                continue  # the other backend's ledger: not ours to move
+            else:
+                os.unlink(src)
+            done += 1
+    for sfx in USER_SUFFIXES:
+        try:
+            os.unlink(layout.flat_path(username, sfx) + ".lock")
+        except FileNotFoundError:
+            pass
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shard the data directory and maintain the ledger manifest.")
+    parser.add_argument("command", choices=["migrate", "reindex"])
+    parser.add_argument("--dry-run", action="store_true", help="migrate: only report what would move")
+    args = parser.parse_args()
+    from . import data_utils
+
+    if args.command == "migrate":
+        layout = data_utils._layout
+        if not layout.sharded:
+            parser.error("SPENDWISE_DATA_LAYOUT is 'flat'; set it to 'sharded' first")
+        # Repeat until a pass finds nothing: a later pass picks up files
+        # recreated by writes that raced an earlier one.
+        for attempt in range(3):
+            pending = sorted({u for sfx in USER_SUFFIXES for u in layout.scan(sfx, flat_only=True)})
+            if not pending or args.dry_run:
+                print(f"{len(pending)} users with flat files")
+                break
+            moved = sum(data_utils.migrate_user(u) for u in pending)
+            print(f"pass {attempt + 1}: moved {moved} files for {len(pending)} users")
+    if not args.dry_run:
+        n = data_utils.reindex_ledgers()
+        print(f"indexed {n} ledgers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# utils/shared_cache.py
+"""
+Cache shared by every server process on the host, for results that cost
+the same to rebuild whichever worker asks: rendered charts, month-end
+forecasts and, with the CSV user store, parsed user records.
+
+One SQLite file (`DATA_DIR/cache.db`) in WAL mode with mmap on, so lookups
+read the OS page cache all processes share, and it outlives restarts: a new
+worker starts with every entry its siblings built. The per-process LRUs stay
+in front of it; this is the second level.
+
+Each entry carries a `version`, the fingerprint of its inputs (a ledger
+signature, the users.csv signature, a totals hash) and a lookup hits only on
+the version the caller expects, so a stale entry is never served. Writes also
+drop their owner's entries (`invalidate`, from log_expense and write_user) so
+space goes to live results. Bounded at `max_bytes`, least recently used out
+first. Failures (a locked or unwritable file) degrade to misses.
+"""
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .perf import incr
+
+log = logging.getLogger(__name__)
+
+# Last-use times are buffered per process and written at most this often,
+# so a hit costs a read, not a write transaction.
+TOUCH_EVERY_S = 30.0
+# Check the size bound after this many bytes were written by this process.
+PRUNE_EVERY_BYTES = 4 << 20
+
+
+class SharedCache:
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._touched: Dict[Tuple[str, str], float] = {}
+        self._flushed = time.monotonic()
+        self._written = 0
+        self.hits = 0
+        self.misses = 0
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "ns TEXT, key TEXT, owner TEXT, version TEXT, value BLOB, bytes INTEGER, used REAL, "
+                "PRIMARY KEY (ns, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_owner ON entries (owner)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (ns, used)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, as in SqliteUserStore. A short busy
+        # timeout: a cache write is never worth stalling a page for.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=2)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={self.max_bytes * 2}")
+            self._local.conn = conn
+        return conn
+
+    def get(self, ns: str, key: str, version: str = "") -> Optional[bytes]:
+        try:
+            row = self._conn().execute(
+                "SELECT version, value FROM entries WHERE ns = ? AND key = ?", (ns, key),
+            ).fetchone()
+        except sqlite3.Error as e:
+            log.warning("shared cache read failed: %s", e)
+            row = None
+        if row is None or row[0] != version:
+            self.misses += 1
+            incr("shared_cache.miss")
+            return None
+        self.hits += 1
+        incr("shared_cache.hit")
+        self._touch([(ns, key)])
+        return row[1]
+
+    def put(self, ns: str, key: str, value: bytes, version: str = "", owner: str = ""):
+        self.put_many(ns, [(key, value, version, owner)])
+
+    def put_many(self, ns: str, items: Iterable[Tuple[str, bytes, str, str]]):
+        """Store (key, value, version, owner) tuples in one transaction."""
+        now = time.time()
+        rows = [(ns, key, owner, version, value, len(value), now) for key, value, version, owner in items]
+        try:
+            with self._conn() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO entries (ns, key, owner, version, value, bytes, used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", rows,
+                )
+        except sqlite3.Error as e:
+            log.warning("shared cache write failed: %s", e)
+            return
+        with self._lock:
+            self._written += sum(r[5] for r in rows)
+            due = self._written >= PRUNE_EVERY_BYTES
+            if due:
+                self._written = 0
+        if due:
+            self.prune()
+
+    def get_json(self, ns: str, key: str, version: str = ""):
+        value = self.get(ns, key, version)
+        return json.loads(value) if value is not None else None
+
+    def put_json(self, ns: str, key: str, value, version: str = "", owner: str = ""):
+        self.put(ns, key, json.dumps(value, separators=(",", ":")).encode("utf-8"), version, owner)
+
+    def invalidate(self, owner: str):
+        """Drop every entry owned by `owner` (a username)."""
+        try:
+            with self._conn() as conn:
+                conn.execute("DELETE FROM entries WHERE owner = ?", (owner,))
+        except sqlite3.Error as e:
+            log.warning("shared cache invalidation failed: %s", e)
+
+    def hottest(self, ns: str, limit: int) -> List[Tuple[str, str, bytes]]:
+        """(key, version, value) of the most recently used entries in `ns`, for warming a process cache."""
+        try:
+            return self._conn().execute(
+                "SELECT key, version, value FROM entries WHERE ns = ? ORDER BY used DESC LIMIT ?", (ns, limit),
+            ).fetchall()
+        except sqlite3.Error as e:
+            log.warning("shared cache read failed: %s", e)
+            return []
+
+    def _touch(self, keys: List[Tuple[str, str]]):
+        now = time.time()
+        with self._lock:
+            for k in keys:
+                self._touched[k] = now
+            if time.monotonic() - self._flushed < TOUCH_EVERY_S:
+                return
+            touched, self._touched = self._touched, {}
+            self._flushed = time.monotonic()
+        try:
+            with self._conn() as conn:
+                conn.executemany("UPDATE entries SET used = MAX(used, ?) WHERE ns = ? AND key = ?",
+                                 [(t, ns, key) for (ns, key), t in touched.items()])
+        except sqlite3.Error as e:
+            log.warning("shared cache touch failed: %s", e)
+
+    def prune(self) -> int:
+        """Evict least recently used entries until the cache fits `max_bytes`. Returns entries removed."""
+        try:
+            with self._conn() as conn:
+                cur = conn.execute(
+                    "DELETE FROM entries WHERE rowid IN (SELECT rowid FROM ("
+                    "SELECT rowid, SUM(bytes) OVER (ORDER BY used DESC, rowid DESC) AS kept FROM entries"
+                    ") WHERE kept > ?)", (self.max_bytes,),
+                )
+                return cur.rowcount
+        except sqlite3.Error as e:
+            log.warning("shared cache prune failed: %s", e)
+            return 0
+
+    def stats(self) -> Dict:
+        row = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM entries").fetchone()
+        lookups = self.hits + self.misses
+        return {"entries": row[0], "bytes": row[1], "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,158 @@
+# utils/tip_service.py
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, Tuple
+
+from cachetools import TTLCache
+
+
+def normalize_context(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; lets one trial call through after `reset_after` seconds."""
+
+    def __init__(self, threshold: int = 3, reset_after: float = 60.0):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class TipService:
+    """
+    Front door for chat completions used by the AI tip page.
+
+    - answers are cached (TTL + LRU) on the normalized message text
+    - identical requests already in flight share one upstream call
+    - callers wait at most `budget` seconds, then get `fallback()`; the call
+      keeps running and still fills the cache for the next click
+    - repeated failures of any kind (API errors, timeouts, transport and DNS
+      errors) open a circuit breaker so we stop waiting on a provider that
+      is down
+
+    `client` only needs a Cohere-style `chat(model=, message=, temperature=)`
+    returning an object with `.text`, so a local fake can stand in for tests.
+    """
+
+    def __init__(self, client, fallback: Callable[[], str], model: str = "command-r-08-2024",
+                 budget: float = 8.0, ttl: float = 3600.0, maxsize: int = 1024,
+                 breaker: CircuitBreaker = None, max_workers: int = 4):
+        self.client = client
+        self.fallback = fallback
+        self.model = model
+        self.budget = budget
+        self.breaker = breaker or CircuitBreaker()
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight: Dict[Tuple, object] = {}
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tip")
+        self._latencies = deque(maxlen=1000)
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.fallbacks = 0
+
+    def _call(self, message: str, temperature: float) -> str:
+        response = self.client.chat(model=self.model, message=message, temperature=temperature)
+        return response.text.strip()
+
+    def _settle(self, key: Tuple, fut):
+        with self._lock:
+            self._inflight.pop(key, None)
+            err = fut.exception()
+            if err is None:
+                self._cache[key] = fut.result()
+                self.breaker.record_success()
+            else:
+                # Every failure counts, and clears a half-open trial: a trial
+                # that died of a timeout must not leave the breaker stuck.
+                logging.error(f"AI tip call failed: {err!r}")
+                self.breaker.record_failure()
+
+    def _fallback(self) -> str:
+        self.fallbacks += 1
+        return self.fallback()
+
+    def suggest(self, message: str, temperature: float = 0.7) -> str:
+        key = (normalize_context(message), temperature)
+        t0 = time.perf_counter()
+        try:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self.hits += 1
+                    return cached
+                self.misses += 1
+                fut = self._inflight.get(key)
+                if fut is not None:
+                    self.coalesced += 1
+                elif not self.breaker.allow():
+                    return self._fallback()
+                else:
+                    fut = self._executor.submit(self._call, message, temperature)
+                    self._inflight[key] = fut
+                    fut.add_done_callback(lambda f, key=key: self._settle(key, f))
+            try:
+                return fut.result(timeout=self.budget)
+            except FutureTimeout:
+                self.timeouts += 1
+                return self._fallback()
+            except Exception:
+                return self._fallback()
+        finally:
+            self._latencies.append(time.perf_counter() - t0)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        lat = sorted(self._latencies)
+        p95 = lat[min(len(lat) - 1, int(0.95 * len(lat)))] if lat else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "fallbacks": self.fallbacks,
+            "p95_ms": p95 * 1000,
+            "breaker": self.breaker.state,
+            "cached": len(self._cache),
+        }
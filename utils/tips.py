@@ -1,24 +1,31 @@
 # utils/tips.py
+import datetime
 from .ai_helper import get_ai_suggestion
-import pandas as pd
-from .data_utils import expenses_df
+from .data_utils import spending_insights, totals_by_category
+
+def tip_context(username: str) -> str:
+    """Top-3 categories of the last 30 days plus recurring and unusual charges, as sent to the AI."""
+    if not totals_by_category(username):
+        return "No expenses logged yet."
+    since = datetime.date.today() - datetime.timedelta(days=30)
+    recent = totals_by_category(username, since_date=since)
+    if not recent:
+        return "No recent expenses recorded."
+    top = sorted(recent.items(), key=lambda kv: kv[1], reverse=True)[:3]
+    context = ", ".join([f"{cat}: ${val:.0f}" for cat, val in top])
+    found = spending_insights(username)
+    if found["recurring"]:
+        context += "; recurring: " + ", ".join(
+            f"{r['label']} ${r['amount']:.2f} {r['cycle']}" for r in found["recurring"][:3])
+    if found["anomalies"]:
+        context += "; unusual: " + ", ".join(
+            f"${a['amount']:.0f} {a['category']} ({a['description']}) on {a['date']}" for a in found["anomalies"][:3])
+    return context
 
 def get_ai_tip(username: str) -> str:
     """Generate AI-based financial tip based on user's recent expenses."""
-    df = expenses_df(username)
     prompt = "You are a friendly personal finance coach. Give one short, actionable money-saving tip."
-
-    if not df.empty:
-        last_30 = df[df['date'] >= (pd.Timestamp.today().date() - pd.Timedelta(days=30))]
-        if not last_30.empty:
-            top = last_30.groupby('category')['amount'].sum().sort_values(ascending=False).head(3)
-            context = ", ".join([f"{cat}: ${val:.0f}" for cat, val in top.items()])
-        else:
-            context = "No recent expenses recorded."
-    else:
-        context = "No expenses logged yet."
-
-    return get_ai_suggestion(prompt, context=context)
+    return get_ai_suggestion(prompt, context=tip_context(username))
 
 def generate_tip() -> str:
     """Fallback tip when AI is unavailable."""
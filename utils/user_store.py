@@ -0,0 +1,271 @@
+# utils/user_store.py
+import os
+import csv
+import sqlite3
+import threading
+import argparse
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .file_io import atomic_write, file_lock
+
+USER_FIELDS = [
+    "username","password_hash","salt","purpose","goal","role","activated","activation_code","email"
+]
+
+def normalize_user(row: Dict) -> Dict:
+    """Coerce a raw CSV/SQLite row into the user dict shape the app expects."""
+    activated = row.get("activated", False)
+    if isinstance(activated, str):
+        activated = activated == "True"
+    return {
+        "username": row["username"],
+        "password_hash": row.get("password_hash","") or "",
+        "salt": row.get("salt","") or "",
+        "purpose": row.get("purpose","") or "",
+        "goal": float(row.get("goal","0") or 0),
+        "role": row.get("role","user") or "user",
+        "activated": bool(activated),
+        "activation_code": row.get("activation_code","") or "",
+        "email": row.get("email","") or ""
+    }
+
+
+class CsvUserStore:
+    """
+    Original flat-file backend: every write rewrites the whole users.csv,
+    under a file lock so concurrent read-modify-writes cannot lose updates.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _ensure(self):
+        if not os.path.exists(self.path):
+            try:
+                # "x": never clobber a file another process just created.
+                with open(self.path, "x", newline="", encoding="utf-8") as f:
+                    csv.DictWriter(f, fieldnames=USER_FIELDS).writeheader()
+            except FileExistsError:
+                pass
+
+    def read_all(self) -> Dict[str, Dict]:
+        self._ensure()
+        users = {}
+        with open(self.path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                users[row["username"]] = normalize_user(row)
+        return users
+
+    def get(self, username: str) -> Optional[Dict]:
+        return self.read_all().get(username)
+
+    def iter_chunks(self, size: int) -> Iterator[List[Dict]]:
+        """Every user, `size` at a time, streamed from the file."""
+        self._ensure()
+        with open(self.path, newline="", encoding="utf-8") as f:
+            chunk = []
+            for row in csv.DictReader(f):
+                chunk.append(normalize_user(row))
+                if len(chunk) >= size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+    def exists(self, username: str) -> bool:
+        return self.get(username) is not None
+
+    def count(self) -> int:
+        return len(self.read_all())
+
+    def has_any(self) -> bool:
+        self._ensure()
+        with open(self.path, newline="", encoding="utf-8") as f:
+            return next(csv.DictReader(f), None) is not None
+
+    def _write_all(self, users: Dict[str, Dict]):
+        with atomic_write(self.path, newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=USER_FIELDS)
+            writer.writeheader()
+            for u in users.values():
+                writer.writerow({**u, "activated": str(u["activated"])})
+
+    def put(self, user: Dict):
+        with file_lock(self.path):
+            users = self.read_all()
+            users[user["username"]] = normalize_user(user)
+            self._write_all(users)
+
+    def set_activation(self, username: str, activated: bool) -> bool:
+        # Read, modify and write under one lock, so a registration landing in
+        # between is not overwritten.
+        with file_lock(self.path):
+            users = self.read_all()
+            u = users.get(username)
+            if u is None:
+                return False
+            u["activated"] = activated
+            u["activation_code"] = ""
+            self._write_all(users)
+        return True
+
+
+class SqliteUserStore:
+    """
+    SQLite backend keyed on username. Lookups and updates touch a single row
+    and each write is its own transaction, so concurrent sessions can no
+    longer overwrite each other's changes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        # Serialized across processes: workers creating the same new database
+        # together would otherwise race switching it to WAL ("database is locked").
+        with file_lock(path), self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "username TEXT PRIMARY KEY, password_hash TEXT, salt TEXT, purpose TEXT, "
+                "goal REAL, role TEXT, activated INTEGER, activation_code TEXT, email TEXT)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # Streamlit runs each session's script in its own thread; sqlite
+        # connections must not be shared across threads.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def read_all(self) -> Dict[str, Dict]:
+        rows = self._conn().execute("SELECT * FROM users ORDER BY rowid")
+        return {r["username"]: normalize_user(dict(r)) for r in rows}
+
+    def iter_chunks(self, size: int) -> Iterator[List[Dict]]:
+        """Every user, `size` at a time, from a cursor of its own (the consumer may hop threads)."""
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            cur = conn.execute("SELECT * FROM users ORDER BY rowid")
+            while True:
+                rows = cur.fetchmany(size)
+                if not rows:
+                    break
+                yield [normalize_user(dict(r)) for r in rows]
+        finally:
+            conn.close()
+
+    def get(self, username: str) -> Optional[Dict]:
+        row = self._conn().execute(
+            "SELECT * FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        return normalize_user(dict(row)) if row else None
+
+    def exists(self, username: str) -> bool:
+        return self._conn().execute(
+            "SELECT 1 FROM users WHERE username = ?", (username,)
+        ).fetchone() is not None
+
+    def count(self) -> int:
+        """Full table scan: for the admin view, not per request (see has_any)."""
+        return self._conn().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def has_any(self) -> bool:
+        return self._conn().execute("SELECT 1 FROM users LIMIT 1").fetchone() is not None
+
+    def migrated(self) -> bool:
+        return self._conn().execute("SELECT 1 FROM meta WHERE key = 'migrated'").fetchone() is not None
+
+    def set_migrated(self):
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated', '1')")
+
+    def put(self, user: Dict):
+        self.put_many([user])
+
+    @staticmethod
+    def _rows(users: Iterable[Dict]) -> List[tuple]:
+        rows = []
+        for u in users:
+            u = normalize_user(u)
+            rows.append(tuple(int(u[k]) if k == "activated" else u[k] for k in USER_FIELDS))
+        return rows
+
+    def put_many(self, users: Iterable[Dict]):
+        sets = ", ".join(f"{k} = excluded.{k}" for k in USER_FIELDS[1:])
+        with self._conn() as conn:
+            conn.executemany(
+                f"INSERT INTO users ({', '.join(USER_FIELDS)}) VALUES ({', '.join('?' * len(USER_FIELDS))}) "
+                f"ON CONFLICT(username) DO UPDATE SET {sets}",
+                self._rows(users),
+            )
+
+    def add_many(self, users: Iterable[Dict]):
+        """Insert users not already present; existing rows are left as they are."""
+        with self._conn() as conn:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO users ({', '.join(USER_FIELDS)}) VALUES ({', '.join('?' * len(USER_FIELDS))})",
+                self._rows(users),
+            )
+
+    def set_activation(self, username: str, activated: bool) -> bool:
+        with self._conn() as conn:
+            cur = conn.execute(
+                "UPDATE users SET activated = ?, activation_code = '' WHERE username = ?",
+                (int(activated), username),
+            )
+        return cur.rowcount > 0
+
+
+def migrate_csv_to_sqlite(csv_path: str, store: SqliteUserStore, batch_size: int = 10000) -> int:
+    """
+    Copy every row of a legacy users.csv into the SQLite store. Users already
+    in the store (registered or changed since) are kept, not overwritten.
+    Returns rows read.
+    """
+    if not os.path.exists(csv_path):
+        return 0
+    copied = 0
+    batch = []
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                store.add_many(batch)
+                copied += len(batch)
+                batch = []
+    if batch:
+        store.add_many(batch)
+        copied += len(batch)
+    return copied
+
+
+def open_user_store(backend: str, csv_path: str, db_path: str):
+    if backend == "csv":
+        return CsvUserStore(csv_path)
+    if backend == "sqlite":
+        store = SqliteUserStore(db_path)
+        # One-time migration, recorded only once complete: a crash part way
+        # redoes it on next start, and workers starting meanwhile wait for it
+        # rather than serve (and register into) a partial store.
+        if not store.migrated():
+            with file_lock(db_path + ".migrate"):
+                if not store.migrated():
+                    migrate_csv_to_sqlite(csv_path, store)
+                    store.set_migrated()
+        return store
+    raise ValueError(f"Unknown user store backend: {backend}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate users.csv into the SQLite user store.")
+    parser.add_argument("csv_path")
+    parser.add_argument("db_path")
+    args = parser.parse_args()
+    n = migrate_csv_to_sqlite(args.csv_path, SqliteUserStore(args.db_path))
+    print(f"Migrated {n} users into {args.db_path}")